@@ -0,0 +1,100 @@
+"""
+Đo bộ nhớ đỉnh (peak RSS) của process_batch_anomalies ở chế độ thường và low_memory.
+Mỗi chế độ (và cả bước tạo dữ liệu) chạy trong một process riêng để số đo không ảnh hưởng nhau
+(đỉnh RSS của process cha được process con kế thừa). Chỉ chạy trên Linux/macOS.
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.du_lieu_gia_lap import make_synthetic_listings
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / 1024 if sys.platform != 'darwin' else peak / 1024 / 1024
+
+
+def _run_one(input_path, output_path, low_memory, chunksize):
+    """Chạy trong process con, trả về số đo"""
+    from du_bao_bat_thuong import process_batch_anomalies, _load_batch_resources
+
+    # Mốc: sau khi import thư viện và load model
+    _load_batch_resources()['model']
+    baseline = _peak_rss_mb()
+
+    start = time.perf_counter()
+    process_batch_anomalies(input_path, output_path, chunksize=chunksize, low_memory=low_memory)
+    seconds = time.perf_counter() - start
+
+    return {'low_memory': low_memory, 'chunksize': chunksize, 'seconds': round(seconds, 2),
+            'baseline_mb': round(baseline), 'peak_rss_mb': round(_peak_rss_mb())}
+
+
+def bench_memory(n_rows, chunksize=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'tin_dang.csv')
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--make-input', input_path,
+                        '--rows', str(n_rows)], check=True)
+
+        outputs = {}
+        for low_memory in [False, True]:
+            output_path = os.path.join(tmp, f'ket_qua_{int(low_memory)}.csv')
+            cmd = [sys.executable, '-m', 'benchmarks.bench_memory', '--run-one', input_path, output_path]
+            if low_memory:
+                cmd.append('--low-memory')
+            if chunksize:
+                cmd += ['--chunksize', str(chunksize)]
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            outputs[low_memory] = output_path
+            print(f"low_memory={str(low_memory):<5}: đỉnh {result['peak_rss_mb']:>6} MB "
+                  f"(sau khi load model {result['baseline_mb']} MB)  {result['seconds']:7.2f}s")
+
+        # low_memory phải cho file kết quả giống hệt chế độ thường (đọc sau cùng để không tăng RSS process cha)
+        low, normal = (pd.read_csv(outputs[mode]).drop(columns='Thời gian ghi nhận') for mode in [True, False])
+        pd.testing.assert_frame_equal(low, normal)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, help='Đo cả chế độ streaming')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--run-one', nargs=2, metavar=('INPUT', 'OUTPUT'), help=argparse.SUPPRESS)
+    parser.add_argument('--low-memory', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--make-input', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.make_input:
+        make_synthetic_listings(args.rows).to_csv(args.make_input, index=False)
+        sys.exit(0)
+
+    if args.run_one:
+        # In log của batch ra stderr, stdout chỉ còn dòng JSON số đo
+        sys.stdout, real_stdout = sys.stderr, sys.stdout
+        try:
+            measurement = _run_one(*args.run_one, args.low_memory, args.chunksize)
+        finally:
+            sys.stdout = real_stdout
+        print(json.dumps(measurement))
+        sys.exit(0)
+
+    print(f"Số dòng: {args.rows:,}")
+    report = {'rows': args.rows, 'results': bench_memory(args.rows, args.chunksize)}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,77 @@
+"""
+So sánh dự đoán 1 tin/lần (predict_price_value) với gom lô (MicroBatcher) khi nhiều luồng gọi cùng lúc.
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_micro_batch --requests 5000 --clients 16 --batch-sizes 8 32 64 --max-wait-ms 2
+"""
+import argparse
+import json
+import threading
+import time
+
+from du_bao_gia import predict_price_value
+from du_bao_bat_thuong import _load_batch_resources, build_model_input_frame
+from gom_lo_du_doan import MicroBatcher
+from benchmarks.du_lieu_gia_lap import make_synthetic_listings
+
+
+def _run_clients(predict, inputs, n_clients):
+    """n_clients luồng chia nhau gọi predict cho từng input, trả về (kết quả, số giây)"""
+    results = [None] * len(inputs)
+
+    def client(k):
+        for i in range(k, len(inputs), n_clients):
+            results[i] = predict(inputs[i])
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def bench_micro_batch(n_requests, n_clients, batch_sizes, max_wait_ms):
+    resources = _load_batch_resources()
+    frame = build_model_input_frame(make_synthetic_listings(n_requests))
+    # predict_price_value cần năm đăng ký là số
+    inputs = [row for row in frame.to_dict('records') if row['nam'] == row['nam']]
+
+    reference, seconds = _run_clients(lambda d: predict_price_value(d, resources), inputs, n_clients)
+    results = [{'mode': 'single', 'seconds': round(seconds, 4), 'req_per_sec': round(len(inputs) / seconds)}]
+    print(f"{'1 tin/lần':>14}: {seconds:8.3f}s  {len(inputs) / seconds:10,.0f} req/giây")
+
+    for batch_size in batch_sizes:
+        batcher = MicroBatcher(resources, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+        try:
+            prices, seconds = _run_clients(batcher.predict, inputs, n_clients)
+            stats = batcher.stats()
+        finally:
+            batcher.close()
+        # Gom lô phải cho kết quả giống hệt gọi từng tin
+        assert prices == reference, "Kết quả gom lô khác dự đoán từng tin"
+
+        results.append({'mode': 'micro_batch', 'max_batch_size': batch_size, 'seconds': round(seconds, 4),
+                        'req_per_sec': round(len(inputs) / seconds), **stats})
+        print(f"{'lô ' + str(batch_size):>14}: {seconds:8.3f}s  {len(inputs) / seconds:10,.0f} req/giây"
+              f"  p50 {stats['latency_ms_p50']:.2f}ms  p99 {stats['latency_ms_p99']:.2f}ms"
+              f"  lấp đầy {stats['fill_rate']:.0%}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    print(f"Số request: {args.requests:,} - Số luồng gọi: {args.clients}")
+    report = {'requests': args.requests, 'clients': args.clients, 'max_wait_ms': args.max_wait_ms,
+              'results': bench_micro_batch(args.requests, args.clients, args.batch_sizes, args.max_wait_ms)}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,247 @@
+"""
+Bộ benchmark các đường nóng của dự đoán giá / phát hiện bất thường, ghi kết quả JSON
+và so sánh với baseline đã lưu (báo các chỉ số chậm đi quá --tolerance).
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_suite                              # so với benchmarks/baseline.json
+    python -m benchmarks.bench_suite --sizes 1000 100000 --json ket_qua.json
+    python -m benchmarks.bench_suite --save-baseline              # ghi kết quả làm baseline mới
+Baseline phụ thuộc máy đo: nên tạo lại baseline trên chính máy chạy so sánh.
+Mã thoát 1 nếu có chỉ số bị chậm đi (dùng được trong CI).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from du_bao_gia import predict_price_value, preprocess_price_data, read_listings
+from du_bao_bat_thuong import _load_batch_resources, build_model_input_frame, detect_anomaly, \
+    detect_anomaly_batch, process_batch_anomalies, save_abnormal_to_csv
+from kho_ket_qua import append_results
+from benchmarks.du_lieu_gia_lap import make_synthetic_listings
+
+BASELINE_FILE = os.path.join('benchmarks', 'baseline.json')
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.25
+TRAINING_DATA_FILE = 'data_motobikes.xlsx'
+
+
+def _metric(value, unit, better):
+    """better: 'lower' (thời gian) hoặc 'higher' (thông lượng)"""
+    return {'value': round(float(value), 4), 'unit': unit, 'better': better}
+
+
+def _percentiles_ms(seconds):
+    p50, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 99])
+    return p50, p99
+
+
+def _best_of(fn, repeat):
+    """Thời gian (giây) nhanh nhất trong repeat lần gọi fn()"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _sample_inputs(n):
+    """n input_dict giống GUI (năm đăng ký là số) từ dữ liệu giả lập"""
+    frame = build_model_input_frame(make_synthetic_listings(n * 2))
+    return [row for row in frame.to_dict('records') if row['nam'] == row['nam']][:n]
+
+
+# =============================================================================
+# CÁC BENCHMARK (mỗi hàm trả về {tên chỉ số: _metric(...)})
+# =============================================================================
+
+def bench_predict_latency(resources, n_calls=2000):
+    """Độ trễ một lần gọi predict_price_value"""
+    inputs = _sample_inputs(n_calls)
+    predict_price_value(inputs[0], resources)  # load model trước khi đo
+
+    timings = []
+    for input_dict in inputs:
+        start = time.perf_counter()
+        predict_price_value(input_dict, resources)
+        timings.append(time.perf_counter() - start)
+    p50, p99 = _percentiles_ms(timings)
+    return {'predict_price_value.latency_p50': _metric(p50, 'ms', 'lower'),
+            'predict_price_value.latency_p99': _metric(p99, 'ms', 'lower')}
+
+
+def bench_detect_anomaly(n_pairs=200_000, seed=0):
+    """Thông lượng detect_anomaly (từng cặp) và detect_anomaly_batch (cả mảng)"""
+    rng = np.random.default_rng(seed)
+    predicted = rng.uniform(5, 100, n_pairs)
+    user = predicted * rng.uniform(0.5, 1.5, n_pairs)
+
+    single = _best_of(lambda: [detect_anomaly(u, p) for u, p in zip(user.tolist(), predicted.tolist())], 1)
+    batch = _best_of(lambda: detect_anomaly_batch(user, predicted), 3)
+    return {'detect_anomaly.rows_per_sec': _metric(n_pairs / single, 'rows/s', 'higher'),
+            'detect_anomaly_batch.rows_per_sec': _metric(n_pairs / batch, 'rows/s', 'higher')}
+
+
+def bench_preprocess(data_path=TRAINING_DATA_FILE, repeat=3):
+    """Thời gian preprocess_price_data trên file dữ liệu train (không tính thời gian đọc file)"""
+    raw = read_listings(data_path)
+    seconds = _best_of(lambda: preprocess_price_data(raw), repeat)
+    return {'preprocess_price_data.seconds': _metric(seconds, 's', 'lower'),
+            'preprocess_price_data.rows_per_sec': _metric(len(raw) / seconds, 'rows/s', 'higher')}
+
+
+def bench_batch(sizes, work_dir, max_repeat=3):
+    """
+    Thông lượng process_batch_anomalies (đọc CSV -> chấm điểm -> ghi CSV + kho kết quả).
+    File nhỏ (<= 100k dòng) chạy max_repeat lần, lấy lần nhanh nhất để giảm nhiễu.
+    """
+    metrics = {}
+    for n_rows in sizes:
+        input_path = os.path.join(work_dir, f'tin_dang_{n_rows}.csv')
+        output_path = os.path.join(work_dir, f'ket_qua_{n_rows}.csv')
+        make_synthetic_listings(n_rows).to_csv(input_path, index=False)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = _best_of(lambda: process_batch_anomalies(input_path, output_path),
+                               max_repeat if n_rows <= 100_000 else 1)
+        metrics[f'process_batch_anomalies.{n_rows}.rows_per_sec'] = _metric(n_rows / seconds, 'rows/s', 'higher')
+        os.remove(input_path)
+    return metrics
+
+
+def bench_save_abnormal(work_dir, levels=(0, 10_000, 100_000), n_calls=200):
+    """Độ trễ save_abnormal_to_csv (1 tin từ GUI) khi kho kết quả đã có sẵn levels dòng"""
+    file_path = os.path.join(work_dir, 'ket_qua_gui.csv')
+    input_dict = _sample_inputs(1)[0]
+    row = {'Tiêu đề': 'Cảnh báo GUI', 'Giá': '10.00 tr', 'Gia_Thuc_Te_Trieu': 10.0,
+           'Gia_AI_Du_Doan_Trieu': 20.0, 'Co_Bat_Thuong': 1, 'Ly_Do_Chi_Tiet': 'Giá RẺ bất thường',
+           **{k: v for k, v in input_dict.items() if k != 'nam'}, 'Năm đăng ký': input_dict['nam'],
+           'Thời gian ghi nhận': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+    metrics, n_stored = {}, 0
+    for level in levels:
+        if level > n_stored:
+            append_results(file_path, pd.DataFrame([row] * (level - n_stored)))
+            n_stored = level
+
+        timings = []
+        for _ in range(n_calls):
+            start = time.perf_counter()
+            ok, message = save_abnormal_to_csv(input_dict, 10.0, 20.0, 'Giá RẺ bất thường', file_path)
+            timings.append(time.perf_counter() - start)
+            if not ok:
+                raise RuntimeError(message)
+        n_stored += n_calls
+        metrics[f'save_abnormal_to_csv.{level}.latency_p50'] = _metric(_percentiles_ms(timings)[0], 'ms', 'lower')
+    return metrics
+
+
+# =============================================================================
+# CHẠY + SO SÁNH BASELINE
+# =============================================================================
+
+def _environment(resources):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'git_commit': commit,
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'model_version': resources.get('model_version')}
+
+
+def run_suite(sizes=DEFAULT_SIZES):
+    """Chạy tất cả benchmark, trả về báo cáo {'environment', 'metrics'}"""
+    resources = _load_batch_resources()
+    if resources is None:
+        raise RuntimeError("Không load được model, không chạy benchmark")
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        steps = [
+            ('predict_price_value', lambda: bench_predict_latency(resources)),
+            ('detect_anomaly', bench_detect_anomaly),
+            ('preprocess_price_data', bench_preprocess),
+            ('process_batch_anomalies', lambda: bench_batch(sizes, work_dir)),
+            ('save_abnormal_to_csv', lambda: bench_save_abnormal(work_dir)),
+        ]
+        for name, step in steps:
+            start = time.perf_counter()
+            metrics.update(step())
+            print(f"  ✓ {name} ({time.perf_counter() - start:.1f}s)")
+    return {'environment': _environment(resources), 'metrics': metrics}
+
+
+def compare_to_baseline(metrics, baseline_metrics, tolerance=DEFAULT_TOLERANCE):
+    """
+    So sánh từng chỉ số có trong cả hai: chậm đi hơn tolerance (vd 0.25 = 25%) là bị hồi quy.
+    Trả về danh sách {'metric', 'value', 'baseline', 'change', 'regression'}; change > 0 là chậm đi.
+    """
+    rows = []
+    for name, metric in metrics.items():
+        base = baseline_metrics.get(name)
+        if base is None or not base['value'] or not metric['value']:
+            continue
+        if metric['better'] == 'lower':
+            change = metric['value'] / base['value'] - 1
+        else:
+            change = base['value'] / metric['value'] - 1
+        rows.append({'metric': name, 'value': metric['value'], 'baseline': base['value'],
+                     'change': round(change, 4), 'regression': change > tolerance})
+    return rows
+
+
+def print_report(metrics, comparison=None):
+    compared = {row['metric']: row for row in (comparison or [])}
+    for name, metric in metrics.items():
+        line = f"{name:<50} {metric['value']:>14,.3f} {metric['unit']:<7}"
+        if name in compared:
+            row = compared[name]
+            status = '⚠️ CHẬM ĐI' if row['regression'] else 'OK'
+            line += f" baseline {row['baseline']:>14,.3f}  {-row['change']:+7.1%}  {status}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Số dòng giả lập cho process_batch_anomalies')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Mức chậm đi cho phép so với baseline (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='Ghi kết quả lần này làm baseline')
+    args = parser.parse_args()
+
+    print(f"Số CPU: {os.cpu_count()} - process_batch_anomalies trên {args.sizes} dòng")
+    report = run_suite(sorted(set(args.sizes)))
+
+    comparison = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare_to_baseline(report['metrics'], baseline['metrics'], args.tolerance)
+        report['baseline'] = {'file': args.baseline, 'environment': baseline.get('environment'),
+                              'tolerance': args.tolerance, 'comparison': comparison}
+    print_report(report['metrics'], comparison)
+
+    for path in [args.json, args.baseline if args.save_baseline else None]:
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressions = [row['metric'] for row in comparison or [] if row['regression']]
+    if regressions:
+        print(f"⚠️ {len(regressions)} chỉ số chậm đi quá {args.tolerance:.0%} so với baseline: {regressions}")
+        sys.exit(1)
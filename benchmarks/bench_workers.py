@@ -0,0 +1,69 @@
+"""
+Đo thông lượng chấm điểm batch (dòng/giây) theo số process.
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_workers --rows 200000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from du_bao_bat_thuong import _load_batch_resources, create_scoring_pool, score_listings, \
+    score_listings_parallel, RESULT_COLUMNS
+from benchmarks.du_lieu_gia_lap import make_synthetic_listings
+
+
+def bench_worker_counts(n_rows, worker_counts, repeat=3):
+    """Trả về danh sách {'workers', 'seconds', 'rows_per_sec'} (lấy lần chạy nhanh nhất)"""
+    df = make_synthetic_listings(n_rows)
+    resources = _load_batch_resources()
+
+    reference = score_listings(df.copy(), resources)[RESULT_COLUMNS]
+    results = []
+
+    for n_workers in worker_counts:
+        pool = create_scoring_pool(n_workers) if n_workers > 1 else None
+        try:
+            if pool is None:
+                score = lambda d: score_listings(d, resources)
+            else:
+                score = lambda d: score_listings_parallel(d, pool, n_workers)
+                # Khởi động worker (load model) trước khi đo
+                score(df.head(n_workers * 10).copy())
+
+            timings = []
+            for _ in range(repeat):
+                work = df.copy()
+                start = time.perf_counter()
+                score(work)
+                timings.append(time.perf_counter() - start)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Ghép song song phải cho kết quả giống hệt chạy 1 process
+        pd.testing.assert_frame_equal(work[RESULT_COLUMNS], reference)
+
+        best = min(timings)
+        results.append({'workers': n_workers, 'seconds': round(best, 4), 'rows_per_sec': round(n_rows / best)})
+        print(f"{n_workers:>3} worker(s): {best:8.3f}s  {n_rows / best:12,.0f} dòng/giây")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    print(f"Số CPU: {os.cpu_count()} - Số dòng: {args.rows:,}")
+    report = {'rows': args.rows, 'cpu_count': os.cpu_count(),
+              'results': bench_worker_counts(args.rows, sorted(set(args.workers)), args.repeat)}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+# File mẫu dùng để nhân bản dữ liệu giả lập (cùng schema với data_motobikes.xlsx)
+SAMPLE_DATA_FILE = 'subset_100motobikes.csv'
+
+
+def make_synthetic_listings(n_rows, sample_path=SAMPLE_DATA_FILE, seed=42):
+    """
+    Tạo n_rows tin đăng giả lập bằng cách lấy mẫu có hoàn lại từ file mẫu,
+    rồi làm nhiễu Số Km đã đi và gán id/Href mới để mỗi dòng là một tin riêng.
+    """
+    if sample_path.endswith('.csv'):
+        sample = pd.read_csv(sample_path)
+    else:
+        sample = pd.read_excel(sample_path)
+
+    rng = np.random.default_rng(seed)
+    df = sample.iloc[rng.integers(0, len(sample), n_rows)].reset_index(drop=True)
+
+    km = pd.to_numeric(df['Số Km đã đi'], errors='coerce').fillna(5000).to_numpy()
+    df['Số Km đã đi'] = np.maximum(0, km * rng.uniform(0.8, 1.2, n_rows)).astype(int)
+    df['id'] = np.arange(1, n_rows + 1)
+    df['Href'] = 'https://xe.chotot.com/gia-lap/' + df['id'].astype(str) + '.htm'
+    return df
@@ -0,0 +1,70 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+# =============================================================================
+# CACHE ĐẶC TRƯNG TRAIN (theo mã băm nội dung file dữ liệu)
+#
+# .feature_cache/
+# └── <key>/             # key = sha256(nội dung file dữ liệu + cấu hình tiền xử lý)
+#     ├── X.npy          # ma trận feature đã encode (đọc bằng mmap, không copy vào RAM)
+#     ├── y.npy          # nhãn log giá
+#     └── meta.json      # danh sách feature, bảng mã, cặp hãng -> dòng xe, ...
+#
+# Cùng file dữ liệu + cùng cấu hình -> bỏ qua đọc Excel và toàn bộ bước tiền xử lý.
+# Đổi file (dù chỉ 1 byte) hoặc đổi cấu hình -> key mới, tự tính lại.
+# =============================================================================
+
+FEATURE_CACHE_DIR = '.feature_cache'
+META_FILE = 'meta.json'
+
+
+def source_hash(path, salt=''):
+    """sha256 của nội dung file + chuỗi cấu hình (salt)"""
+    h = hashlib.sha256(salt.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def load_cached(key, cache_dir=FEATURE_CACHE_DIR):
+    """Trả về (dict mảng numpy dạng mmap, meta) nếu có cache, ngược lại None"""
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r')
+                  for name in meta['arrays']}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Cache đặc trưng '{key}' bị lỗi ({e}), sẽ tính lại.")
+        return None
+    return arrays, meta
+
+
+def save_cached(key, arrays, meta, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Ghi các mảng numpy + meta vào cache. Ghi vào thư mục tạm rồi đổi tên,
+    nên tiến trình khác không bao giờ đọc phải cache ghi dở.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({**meta, 'arrays': list(arrays)}, f, ensure_ascii=False)
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Tiến trình khác vừa ghi xong cùng key (nội dung giống hệt) -> bỏ bản tạm
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(entry_dir, META_FILE)):
+            raise
+    return entry_dir
@@ -0,0 +1,138 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+# =============================================================================
+# CHUẨN HÓA VĂN BẢN TIẾNG VIỆT (Tiêu đề + Mô tả) bằng các bộ từ điển trong files/
+# - teencode.txt         : viết tắt / teencode -> từ đầy đủ ('ko' -> 'không')
+# - vietnamese-stopwords : từ dừng (chỉ dùng các từ một âm tiết), bị bỏ đi
+# - english-vnmese.txt   : từ tiếng Anh -> tiếng Việt
+# - wrong-word.txt       : từ viết sai / thiếu dấu ('chinh', 'chu', 'key', ...): KHÔNG dịch như tiếng Anh,
+#                          được nhận ra nhờ so khớp không dấu
+# Các từ điển được gộp MỘT lần thành một bảng tra {từ: kết quả}; mỗi văn bản chỉ chuẩn hóa một lần (lru_cache),
+# cả cột thì chỉ xử lý các giá trị khác nhau.
+# =============================================================================
+
+# Tăng khi đổi từ điển/quy tắc: model train với phiên bản khác sẽ cho cờ khác
+TEXT_NORMALIZATION_VERSION = 1
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'files')
+TEENCODE_FILE = 'teencode.txt'
+STOPWORDS_FILE = 'vietnamese-stopwords.txt'
+ENGLISH_FILE = 'english-vnmese.txt'
+WRONG_WORDS_FILE = 'wrong-word.txt'
+
+# Viết tắt hay gặp trong tin rao xe (bổ sung cho teencode.txt)
+DOMAIN_TEENCODE = {
+    'tm': 'thông minh',
+    'smk': 'smartkey',
+}
+
+# Từ = dãy chữ cái hoặc dãy số ('sh150abs' -> 'sh', '150', 'abs'; '_' cũng là dấu tách)
+_TOKEN_PATTERN = re.compile(r'[^\W\d_]+|\d+')
+
+
+def _build_accent_table():
+    """Bảng str.translate: ký tự có dấu -> ký tự gốc, dấu rời (tổ hợp) -> bỏ"""
+    table = {code: None for code in range(0x0300, 0x0370)}
+    for code in range(0x00C0, 0x1F00):
+        base = ''.join(ch for ch in unicodedata.normalize('NFD', chr(code)) if not unicodedata.combining(ch))
+        if len(base) == 1 and base != chr(code):
+            table[code] = base
+    table.update({ord('đ'): 'd', ord('Đ'): 'D'})
+    return table
+
+
+_ACCENT_TABLE = _build_accent_table()
+
+
+def strip_accents(text):
+    """Bỏ dấu tiếng Việt: 'Đà Nẵng' -> 'Da Nang'"""
+    return text.translate(_ACCENT_TABLE)
+
+
+def _read_lines(file_name):
+    with open(os.path.join(FILES_DIR, file_name), encoding='utf-8') as f:
+        return [unicodedata.normalize('NFC', line.strip()) for line in f if line.strip()]
+
+
+def _read_pairs(file_name):
+    pairs = {}
+    for line in _read_lines(file_name):
+        key, sep, value = line.partition('\t')
+        if sep:
+            pairs[key.strip().lower()] = value.strip().lower()
+    return pairs
+
+
+@lru_cache(maxsize=1)
+def load_lexicons():
+    """Đọc các từ điển trong files/ (một lần cho cả process)"""
+    return {
+        'teencode': {**_read_pairs(TEENCODE_FILE), **DOMAIN_TEENCODE},
+        'stopwords': {w.lower() for w in _read_lines(STOPWORDS_FILE) if '_' not in w and ' ' not in w},
+        'english': _read_pairs(ENGLISH_FILE),
+        'wrong_words': {w.lower() for w in _read_lines(WRONG_WORDS_FILE)},
+    }
+
+
+def build_token_map(protected_words=()):
+    """
+    Gộp các từ điển thành bảng tra {từ: kết quả} ('' = bỏ từ).
+    protected_words: các từ không bao giờ bị bỏ/dịch (vd: từ khóa cần nhận diện).
+    """
+    lexicons = load_lexicons()
+    protected = {w.lower() for w in protected_words}
+    protected |= {strip_accents(w) for w in protected}
+
+    def convert_word(word):
+        if word in protected:
+            return word
+        if word in lexicons['stopwords']:
+            return ''
+        if word.isascii() and word not in lexicons['wrong_words'] and word in lexicons['english']:
+            return lexicons['english'][word]
+        return word
+
+    token_map = {}
+    for token in set(lexicons['teencode']) | lexicons['stopwords'] | set(lexicons['english']):
+        expanded = lexicons['teencode'].get(token, token) if token not in protected else token
+        converted = ' '.join(w for w in map(convert_word, expanded.split()) if w)
+        if converted != token:
+            token_map[token] = converted
+    return token_map
+
+
+class TextNormalizer:
+    """
+    Chuẩn hóa văn bản: chữ thường -> tách từ -> teencode -> bỏ từ dừng -> dịch tiếng Anh.
+    match_form(): thêm bước bỏ dấu để so khớp không dấu ('chinh chu' khớp 'chính chủ').
+    Kết quả theo từng văn bản được cache (lru_cache, tối đa cache_size văn bản).
+    """
+
+    def __init__(self, protected_words=(), cache_size=65536):
+        self.token_map = build_token_map(protected_words)
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+        self.match_form = lru_cache(maxsize=cache_size)(self._match_form)
+
+    def _normalize(self, text):
+        tokens = _TOKEN_PATTERN.findall(unicodedata.normalize('NFC', str(text)).lower())
+        token_map = self.token_map
+        return ' '.join(w for w in (token_map.get(t, t) for t in tokens) if w)
+
+    def _match_form(self, text):
+        return strip_accents(self.normalize(text))
+
+    def keyword_pattern(self, keywords):
+        """Regex (đã compile) tìm một trong các từ khóa trên match_form, khớp trọn từ"""
+        forms = sorted({self.match_form(k) for k in keywords} - {''}, key=len, reverse=True)
+        return re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(f) for f in forms) + r')(?!\w)')
+
+    def match_form_column(self, series):
+        """match_form cho cả cột (Series chuỗi, ô trống -> ''), mỗi giá trị khác nhau chỉ xử lý một lần"""
+        codes, uniques = pd.factorize(series)
+        forms = pd.Index([self.match_form(v) for v in uniques] + [''], dtype=object)
+        return pd.Series(forms.take(codes), index=series.index, dtype=object)
@@ -0,0 +1,113 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chuan_hoa_van_ban import strip_accents
+
+# =============================================================================
+# PHÂN LOẠI ĐỊA CHỈ -> KHU VỰC / TỈNH THÀNH
+# - khu_vuc: 5 nhóm vùng miền model đang dùng (giữ nguyên quy tắc cũ của extract_location)
+# - tinh_thanh: 1 trong 63 tỉnh/thành, tra bằng MỘT regex gộp tất cả tên + cách viết tắt,
+#   so khớp không dấu (địa chỉ gõ thiếu dấu vẫn nhận ra)
+# Cả cột địa chỉ được xử lý theo các giá trị khác nhau (mỗi địa chỉ chỉ tính một lần).
+# =============================================================================
+
+OTHER_REGION = 'Tỉnh thành khác'
+UNKNOWN_PROVINCE = 'Không xác định'
+
+# Quy tắc khu vực (theo thứ tự ưu tiên): chứa một trong các chuỗi (chữ thường, có dấu) -> khu vực
+REGION_RULES = [
+    ('TP.HCM', ['hồ chí minh', 'hcm']),
+    ('Hà Nội', ['hà nội']),
+    ('Đà Nẵng', ['đà nẵng']),
+    ('Miền Nam (Lân cận)', ['bình dương', 'đồng nai']),
+]
+
+# 63 tỉnh/thành -> các cách viết thêm (ngoài tên không dấu), viết thường không dấu
+PROVINCE_ALIASES = {
+    'An Giang': [], 'Bà Rịa - Vũng Tàu': ['ba ria vung tau', 'vung tau', 'brvt', 'ba ria'],
+    'Bắc Giang': [], 'Bắc Kạn': ['bac can'], 'Bạc Liêu': [], 'Bắc Ninh': [], 'Bến Tre': [],
+    'Bình Định': ['quy nhon'], 'Bình Dương': [], 'Bình Phước': [], 'Bình Thuận': ['phan thiet'],
+    'Cà Mau': [], 'Cần Thơ': [], 'Cao Bằng': [], 'Đà Nẵng': ['danang'], 'Đắk Lắk': ['dak lak', 'daklak', 'dac lac',
+                                                                                  'buon ma thuot'],
+    'Đắk Nông': ['dak nong', 'daknong'], 'Điện Biên': [], 'Đồng Nai': ['bien hoa'], 'Đồng Tháp': [],
+    'Gia Lai': ['pleiku'], 'Hà Giang': [], 'Hà Nam': [], 'Hà Nội': ['hanoi', 'hn'], 'Hà Tĩnh': [],
+    'Hải Dương': [], 'Hải Phòng': ['hp'], 'Hậu Giang': [], 'Hòa Bình': [], 'Hưng Yên': [],
+    'Khánh Hòa': ['nha trang'], 'Kiên Giang': ['phu quoc'], 'Kon Tum': ['kontum'], 'Lai Châu': [],
+    'Lâm Đồng': ['da lat', 'dalat'], 'Lạng Sơn': [], 'Lào Cai': [], 'Long An': [], 'Nam Định': [],
+    'Nghệ An': ['vinh nghe an'], 'Ninh Bình': [], 'Ninh Thuận': [], 'Phú Thọ': [], 'Phú Yên': [],
+    'Quảng Bình': [], 'Quảng Nam': [], 'Quảng Ngãi': [], 'Quảng Ninh': ['ha long'], 'Quảng Trị': [],
+    'Sóc Trăng': [], 'Sơn La': [], 'Tây Ninh': [], 'Thái Bình': [], 'Thái Nguyên': [], 'Thanh Hóa': [],
+    'Thừa Thiên Huế': ['thua thien hue', 'hue'], 'Tiền Giang': ['my tho'],
+    'TP Hồ Chí Minh': ['ho chi minh', 'hcm', 'tphcm', 'sai gon', 'saigon', 'sg'], 'Trà Vinh': [],
+    'Tuyên Quang': [], 'Vĩnh Long': [], 'Vĩnh Phúc': [], 'Yên Bái': [],
+}
+
+
+def _normalize_address(text):
+    """Chữ thường, không dấu, chỉ giữ chữ và số (các ký tự khác -> một khoảng trắng)"""
+    return re.sub(r'[^a-z0-9]+', ' ', strip_accents(text.lower())).strip()
+
+
+def _build_province_index():
+    """Một regex gộp mọi cách viết (dài trước để 'ba ria vung tau' thắng 'ba ria') + bảng cách viết -> tỉnh"""
+    alias_to_province = {}
+    for province, aliases in PROVINCE_ALIASES.items():
+        for alias in [_normalize_address(province.replace('TP ', ''))] + aliases:
+            alias_to_province[alias] = province
+    alternation = '|'.join(re.escape(a) for a in sorted(alias_to_province, key=len, reverse=True))
+    return re.compile(rf'(?<![a-z0-9])(?:{alternation})(?![a-z0-9])'), alias_to_province
+
+
+_PROVINCE_PATTERN, _ALIAS_TO_PROVINCE = _build_province_index()
+
+
+@lru_cache(maxsize=65536)
+def _region_of(text):
+    for region, keys in REGION_RULES:
+        if any(key in text for key in keys):
+            return region
+    return OTHER_REGION
+
+
+@lru_cache(maxsize=65536)
+def _province_of(text):
+    matches = _PROVINCE_PATTERN.findall(_normalize_address(text))
+    # Địa chỉ dạng 'Phường, Quận, Tỉnh': lấy tên tỉnh xuất hiện CUỐI cùng
+    return _ALIAS_TO_PROVINCE[matches[-1]] if matches else UNKNOWN_PROVINCE
+
+
+def extract_location(address):
+    """Phân nhóm vùng miền từ địa chỉ"""
+    return _region_of(str(address).lower())
+
+
+def extract_province(address):
+    """Tỉnh/thành của địa chỉ (UNKNOWN_PROVINCE nếu không nhận ra)"""
+    return _province_of(str(address))
+
+
+def _expand(values, codes, index):
+    """Kết quả theo từng giá trị khác nhau -> cột category theo mã của từng dòng"""
+    value_codes, categories = pd.factorize(np.array(values, dtype=object))
+    return pd.Series(pd.Categorical.from_codes(value_codes[codes], categories), index=index)
+
+
+def resolve_locations(addresses):
+    """
+    Khu vực và tỉnh/thành cho cả cột địa chỉ (Series).
+    Chỉ tính trên các địa chỉ khác nhau rồi lấy theo mã; trả về (khu_vuc, tinh_thanh) dạng category.
+    """
+    if isinstance(addresses.dtype, pd.CategoricalDtype):
+        codes, uniques = addresses.cat.codes.to_numpy(), list(addresses.cat.categories)
+    else:
+        codes, uniques = pd.factorize(addresses)
+        uniques = list(uniques)
+    # Mã -1 (ô trống) lấy phần tử cuối: NaN, giống str(NaN) khi xử lý từng dòng
+    uniques.append(np.nan)
+
+    regions = [extract_location(v) for v in uniques]
+    provinces = [extract_province(v) for v in uniques]
+    return _expand(regions, codes, addresses.index), _expand(provinces, codes, addresses.index)
@@ -0,0 +1,346 @@
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from du_bao_gia import predict_price_batch, load_price_model, REQUIRED_INPUT_FIELDS, PRICE_MODEL_PATH
+from du_bao_bat_thuong import detect_anomaly, detect_anomaly_batch, listing_thresholds, listing_thresholds_batch
+from gom_lo_du_doan import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+
+# =============================================================================
+# DỊCH VỤ HTTP CHẤM ĐIỂM TIN ĐĂNG (chạy cục bộ, chỉ dùng thư viện chuẩn asyncio)
+#
+# Model được load MỘT lần khi khởi động và giữ trong bộ nhớ.
+#   POST /predict          1 tin (JSON object)        -> {"gia_du_doan": ...}
+#   POST /predict/batch    nhiều tin (JSON lines)     -> JSON lines, cùng thứ tự
+#   POST /anomaly          1 tin + "gia_ban" (triệu)  -> {"gia_du_doan", "isAbnormal", "reason"}
+#   POST /anomaly/batch    nhiều tin (JSON lines)     -> JSON lines, cùng thứ tự
+#   GET  /metrics          số request, lỗi, độ trễ p50/p99, số tin/giây theo từng endpoint + thống kê gom lô
+#   GET  /health           phiên bản model đang dùng
+#
+# Mỗi tin có các trường giống input_dict của predict_price_value:
+#   Thương hiệu, Dòng xe, Loại xe, Dung tích xe, Xuất xứ, nam, Số Km đã đi, Tình trạng, Địa chỉ (tùy chọn)
+# nam, Số Km đã đi, gia_ban phải là số (hoặc chuỗi số): sai kiểu -> 400 kèm tên trường, ở cả 1 tin và batch.
+# Batch được dự đoán bằng MỘT lần gọi model (predict_price_batch), chạy trong thread riêng
+# để vòng lặp sự kiện vẫn nhận request khác. Các request 1 tin đồng thời được gom lô (MicroBatcher).
+#
+# Chạy: python dich_vu_cham_diem.py --port 8000
+# =============================================================================
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+PRICE_FIELD = 'gia_ban'
+# Trường phải là số (số hoặc chuỗi số); các cờ tùy chọn chỉ kiểm tra khi có
+NUMERIC_FIELDS = ['nam', 'Số Km đã đi']
+OPTIONAL_NUMERIC_FIELDS = ['has_abs', 'has_smartkey', 'is_chinh_chu']
+
+# Giới hạn kích thước body (byte) để một request lỗi không chiếm hết bộ nhớ
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Số độ trễ gần nhất giữ lại để tính p50/p99
+LATENCY_WINDOW = 2048
+
+REASON_PHRASES = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """Lỗi do dữ liệu request (trả về cho client kèm mã HTTP)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# =============================================================================
+# 1. THỐNG KÊ THEO ENDPOINT
+# =============================================================================
+
+class EndpointMetrics:
+    """Đếm request/lỗi/số tin và giữ cửa sổ độ trễ gần nhất của một endpoint"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds, rows, ok):
+        self.requests += 1
+        self.rows += rows
+        self.busy_seconds += seconds
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def snapshot(self, uptime):
+        lat_ms = np.array(self.latencies) * 1000
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rows': self.rows,
+            'latency_ms_p50': round(float(np.percentile(lat_ms, 50)), 3) if len(lat_ms) else None,
+            'latency_ms_p99': round(float(np.percentile(lat_ms, 99)), 3) if len(lat_ms) else None,
+            # Số tin/giây khi đang xử lý và trung bình trên cả thời gian chạy
+            'rows_per_busy_second': round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+            'rows_per_second': round(self.rows / uptime, 3) if uptime else None,
+        }
+
+
+# =============================================================================
+# 2. XỬ LÝ DỮ LIỆU TIN ĐĂNG
+# =============================================================================
+
+def _to_number(value):
+    """Số hữu hạn (float) từ số hoặc chuỗi số, None nếu không phải"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _check_listing(listing, where='', need_price=False):
+    """
+    Kiểm tra một tin (dùng chung cho endpoint 1 tin và batch): đủ trường bắt buộc, các trường số
+    là số hữu hạn. Trường số được chuyển sang float ngay trong listing để hai đường xử lý giống nhau.
+    """
+    if not isinstance(listing, dict):
+        raise RequestError(f"{where}Mỗi tin phải là một JSON object")
+    fields = REQUIRED_INPUT_FIELDS + [PRICE_FIELD] if need_price else REQUIRED_INPUT_FIELDS
+    missing = [f for f in fields if f not in listing]
+    if missing:
+        raise RequestError(f"{where}Thiếu trường: {', '.join(missing)}")
+
+    numeric = NUMERIC_FIELDS + [PRICE_FIELD] if need_price else NUMERIC_FIELDS
+    for field in numeric + [f for f in OPTIONAL_NUMERIC_FIELDS if f in listing]:
+        number = _to_number(listing[field])
+        if number is None:
+            unit = ' (triệu đồng)' if field == PRICE_FIELD else ''
+            raise RequestError(f"{where}Trường '{field}' phải là số{unit}, nhận được: {listing[field]!r}")
+        listing[field] = number
+
+
+def parse_json_object(body, need_price=False):
+    try:
+        listing = json.loads(body)
+    except ValueError as e:
+        raise RequestError(f"JSON không hợp lệ: {e}")
+    _check_listing(listing, need_price=need_price)
+    return listing
+
+
+def parse_json_lines(body, need_price=False):
+    """Body JSON lines (mỗi dòng một tin) -> list dict; bỏ qua dòng trống"""
+    listings = []
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            listing = json.loads(line)
+        except ValueError as e:
+            raise RequestError(f"Dòng {line_no}: JSON không hợp lệ: {e}")
+        _check_listing(listing, f"Dòng {line_no}: ", need_price)
+        listings.append(listing)
+    return listings
+
+
+def score_many(listings, resources, with_anomaly):
+    if not listings:
+        return []
+    input_df = pd.DataFrame(listings)
+    predictions = predict_price_batch(input_df, resources)
+    results = [{'gia_du_doan': float(p)} for p in predictions]
+    if with_anomaly:
+        user_prices = np.array([listing[PRICE_FIELD] for listing in listings], dtype=float)
+        is_abnormal, reasons = detect_anomaly_batch(user_prices, predictions,
+                                                    thresholds=listing_thresholds_batch(resources, input_df))
+        for result, flag, reason in zip(results, is_abnormal, reasons):
+            result['isAbnormal'] = int(flag)
+            result['reason'] = reason
+    return results
+
+
+# =============================================================================
+# 3. DỊCH VỤ HTTP
+# =============================================================================
+
+class ScoringService:
+    """Giữ model, thread chạy model và thống kê; định tuyến request tới hàm xử lý"""
+
+    def __init__(self, resources, n_threads=1, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.resources = resources
+        self.executor = ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix='cham_diem')
+        self.batcher = MicroBatcher(resources, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.started_at = time.monotonic()
+        self.routes = {
+            ('POST', '/predict'): self.handle_predict,
+            ('POST', '/predict/batch'): self.handle_predict_batch,
+            ('POST', '/anomaly'): self.handle_anomaly,
+            ('POST', '/anomaly/batch'): self.handle_anomaly_batch,
+            ('GET', '/metrics'): self.handle_metrics,
+            ('GET', '/health'): self.handle_health,
+        }
+        self.metrics = {path: EndpointMetrics() for _, path in self.routes}
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # --- Các endpoint: trả về (status, content_type, body, số tin) ---
+    async def _single(self, body, with_anomaly):
+        listing = parse_json_object(body, need_price=with_anomaly)
+        user_price = listing[PRICE_FIELD] if with_anomaly else None
+        predicted = await asyncio.wrap_future(self.batcher.submit(listing))
+        result = {'gia_du_doan': float(predicted)}
+        if with_anomaly:
+            result.update(detect_anomaly(user_price, predicted, listing_thresholds(self.resources, listing)))
+        return 200, 'application/json', json.dumps(result, ensure_ascii=False), 1
+
+    async def handle_predict(self, body):
+        return await self._single(body, False)
+
+    async def handle_anomaly(self, body):
+        return await self._single(body, True)
+
+    async def _batch(self, body, with_anomaly):
+        listings = parse_json_lines(body, need_price=with_anomaly)
+        results = await self._run(score_many, listings, self.resources, with_anomaly)
+        lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in results)
+        return 200, 'application/x-ndjson', lines, len(results)
+
+    async def handle_predict_batch(self, body):
+        return await self._batch(body, False)
+
+    async def handle_anomaly_batch(self, body):
+        return await self._batch(body, True)
+
+    async def handle_metrics(self, body):
+        uptime = time.monotonic() - self.started_at
+        data = {
+            'uptime_seconds': round(uptime, 1),
+            'endpoints': {path: m.snapshot(uptime) for path, m in self.metrics.items()},
+            'micro_batch': self.batcher.stats(),
+        }
+        return 200, 'application/json', json.dumps(data), 0
+
+    async def handle_health(self, body):
+        data = {'status': 'ok', 'model_version': self.resources.get('model_version')}
+        return 200, 'application/json', json.dumps(data), 0
+
+    async def dispatch(self, method, path, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in self.routes):
+                raise RequestError(f"Phương thức {method} không hỗ trợ cho {path}", 405)
+            raise RequestError(f"Không có endpoint {path}", 404)
+
+        start = time.perf_counter()
+        ok, rows = False, 0
+        try:
+            status, content_type, payload, rows = await handler(body)
+            ok = True
+            return status, content_type, payload
+        finally:
+            self.metrics[path].record(time.perf_counter() - start, rows, ok)
+
+    # --- Giao thức HTTP/1.1 tối giản (keep-alive, Content-Length) ---
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    method, target, _ = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise RequestError("Body quá lớn", 413)
+                    body = (await reader.readexactly(length)).decode('utf-8') if length else ''
+                    status, content_type, payload = await self.dispatch(method.upper(), urlsplit(target).path, body)
+                except RequestError as e:
+                    status, content_type = e.status, 'application/json'
+                    payload = json.dumps({'error': str(e)}, ensure_ascii=False)
+                except ValueError:
+                    status, content_type, keep_alive = 400, 'application/json', False
+                    payload = json.dumps({'error': 'Request không hợp lệ'})
+                except Exception as e:
+                    status, content_type = 500, 'application/json'
+                    payload = json.dumps({'error': f"Lỗi xử lý: {e}"}, ensure_ascii=False)
+
+                data = payload.encode('utf-8')
+                head = (f"HTTP/1.1 {status} {REASON_PHRASES.get(status, '')}\r\n"
+                        f"Content-Type: {content_type}; charset=utf-8\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🚀 Dịch vụ chấm điểm chạy tại http://{host}:{port} (model {self.resources.get('model_version')})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.batcher.close()
+            self.executor.shutdown()
+
+
+def create_service(model_path=PRICE_MODEL_PATH, n_threads=1, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                   max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    """Load model (kể cả booster) ngay khi khởi động để request đầu tiên không phải chờ"""
+    resources = load_price_model(model_path)
+    # LazyResources chỉ load booster khi truy cập 'model' lần đầu: truy cập ngay để load lúc khởi động
+    resources['model']
+    return ScoringService(resources, n_threads=n_threads, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP dự đoán giá và phát hiện bất thường (cục bộ)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model', default=PRICE_MODEL_PATH, help="Thư mục artifact hoặc file .pkl")
+    parser.add_argument('--threads', type=int, default=1, help="Số thread chạy model cho các endpoint batch")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Số tin tối đa mỗi lô khi gom các request 1 tin")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Thời gian chờ tối đa (ms) để gom lô")
+    args = parser.parse_args()
+
+    try:
+        service = create_service(args.model, args.threads, args.batch_size, args.max_wait_ms)
+    except Exception as e:
+        print(f"❌ Lỗi load model: {e}")
+        sys.exit(1)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("⏹️ Đã dừng dịch vụ")
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: không đo được đỉnh RSS
+    resource = None
+
+# =============================================================================
+# ĐO HIỆU NĂNG THEO TỪNG BƯỚC (batch chấm điểm và train)
+# - stage(tên, rows): đo thời gian một bước; bước lồng nhau có tên dạng 'cha/con'
+# - count(...) / count_errors(...): đếm số dòng, số dòng lỗi (vd: dự đoán lỗi -> giá 0)
+# - profile_run(...): bật đo cho một lần chạy, ghi báo cáo JSON (+ file cProfile/pyinstrument nếu cần)
+# Khi không có profile_run nào đang chạy, stage/count/count_errors không làm gì (gần như không tốn thời gian).
+# Lưu ý: chấm điểm song song (n_workers > 1) chỉ đo được tổng thời gian ở process chính.
+#
+# Chạy: python do_hieu_nang.py batch --input data_motobikes.xlsx --report bao_cao.json --profile batch.prof
+#       python do_hieu_nang.py train --input data_motobikes.xlsx --report bao_cao_train.json
+# =============================================================================
+
+# Báo cáo của lần chạy đang được đo (None: không đo)
+_ACTIVE_REPORT = None
+
+
+def peak_rss_mb():
+    """Đỉnh bộ nhớ (RSS) của process tính đến hiện tại, None nếu hệ điều hành không hỗ trợ"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return round(peak / 1024 if sys.platform != 'darwin' else peak / 1024 / 1024, 1)
+
+
+class RunReport:
+    """Số đo của một lần chạy: thời gian/số dòng theo bước, bộ đếm, số lỗi, đỉnh bộ nhớ"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.stages = {}
+        self.counters = {}
+        self.errors = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def open_stage(self, name):
+        """Ghi nhận bước khi bắt đầu (báo cáo liệt kê các bước theo thứ tự bắt đầu, bước cha trước)"""
+        with self._lock:
+            self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0, 'peak_rss_mb': None})
+
+    def add_stage(self, name, seconds, rows=None):
+        with self._lock:
+            entry = self.stages[name]
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+            entry['rows'] += rows or 0
+            entry['peak_rss_mb'] = peak_rss_mb()
+
+    def add_count(self, table, name, n):
+        with self._lock:
+            table[name] = table.get(name, 0) + int(n)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def to_dict(self):
+        total = self.seconds if self.seconds is not None else time.perf_counter() - self.start
+        stages = {}
+        for name, entry in self.stages.items():
+            stages[name] = {
+                'seconds': round(entry['seconds'], 4),
+                'share': round(entry['seconds'] / total, 4) if total else None,
+                'calls': entry['calls'],
+                'rows': entry['rows'],
+                'rows_per_sec': round(entry['rows'] / entry['seconds']) if entry['rows'] and entry['seconds'] else None,
+                'peak_rss_mb': entry['peak_rss_mb'],
+            }
+        return {'run': self.name, 'started_at': self.started_at, 'seconds': round(total, 4),
+                'peak_rss_mb': peak_rss_mb(), 'stages': stages, 'counters': dict(self.counters),
+                'errors': dict(self.errors)}
+
+    def summary(self):
+        """Bảng tóm tắt các bước (theo thứ tự bắt đầu) để in ra màn hình"""
+        data = self.to_dict()
+        lines = [f"--- [ĐO] {self.name}: {data['seconds']:.2f}s, đỉnh RSS {data['peak_rss_mb']} MB ---"]
+        for name, s in data['stages'].items():
+            indent = '  ' * name.count('/')
+            speed = f"{s['rows_per_sec']:>12,} dòng/s" if s['rows_per_sec'] else ''
+            lines.append(f"  {indent}{name.split('/')[-1]:<{28 - len(indent)}} {s['seconds']:9.3f}s "
+                         f"{s['share']:6.1%} {speed}")
+        if data['errors']:
+            lines.append(f"  Lỗi: {data['errors']}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Đo thời gian một bước của lần chạy đang được đo (không làm gì nếu không có)"""
+    report = _ACTIVE_REPORT
+    if report is None:
+        yield
+        return
+    stack = report._stack()
+    stack.append(name)
+    full_name = '/'.join(stack)
+    report.open_stage(full_name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack.pop()
+        report.add_stage(full_name, time.perf_counter() - start, rows)
+
+
+def count(name, n=1):
+    """Cộng bộ đếm (vd: số dòng bất thường)"""
+    if _ACTIVE_REPORT is not None:
+        _ACTIVE_REPORT.add_count(_ACTIVE_REPORT.counters, name, n)
+
+
+def count_errors(name, n=1):
+    """Cộng số dòng lỗi (vd: dự đoán lỗi nên giá dự đoán = 0)"""
+    if _ACTIVE_REPORT is not None and n:
+        _ACTIVE_REPORT.add_count(_ACTIVE_REPORT.errors, name, n)
+
+
+def _start_profiler(profiler):
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("Cần cài pyinstrument (pip install pyinstrument) để dùng profiler='pyinstrument'")
+        p = Profiler()
+        p.start()
+        return p
+    import cProfile
+    p = cProfile.Profile()
+    p.enable()
+    return p
+
+
+def _stop_profiler(p, profiler, profile_path):
+    if profiler == 'pyinstrument':
+        p.stop()
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            f.write(p.output_html() if profile_path.endswith('.html') else p.output_text())
+    else:
+        p.disable()
+        p.dump_stats(profile_path)  # xem bằng: python -m pstats <file> hoặc snakeviz
+
+
+@contextmanager
+def profile_run(name, report_path=None, profile_path=None, profiler='cprofile', verbose=True):
+    """
+    Đo một lần chạy: mọi stage/count/count_errors bên trong được ghi vào RunReport.
+    report_path: ghi báo cáo JSON; profile_path: thêm profile cả lần chạy
+    (profiler='cprofile' -> file .prof, 'pyinstrument' -> file .html/.txt).
+    """
+    global _ACTIVE_REPORT
+    report = RunReport(name)
+    previous, _ACTIVE_REPORT = _ACTIVE_REPORT, report
+    p = _start_profiler(profiler) if profile_path else None
+    try:
+        yield report
+    finally:
+        if p is not None:
+            _stop_profiler(p, profiler, profile_path)
+        _ACTIVE_REPORT = previous
+        report.finish()
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        if verbose:
+            print(report.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đo thời gian từng bước của batch chấm điểm hoặc train")
+    parser.add_argument('run', choices=['batch', 'train'])
+    parser.add_argument('--input', default='data_motobikes.xlsx')
+    parser.add_argument('--output', help="File kết quả batch (mặc định OUTPUT_RESULT_FILE)")
+    parser.add_argument('--chunksize', type=int)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--low-memory', action='store_true')
+    parser.add_argument('--incremental', action='store_true', help="batch: chỉ chấm tin mới/đã sửa")
+    parser.add_argument('--report', default='bao_cao_hieu_nang.json', help="File báo cáo JSON")
+    parser.add_argument('--profile', help="Ghi thêm profile (.prof cho cProfile, .html/.txt cho pyinstrument)")
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+    args = parser.parse_args()
+
+    # Chạy file này trực tiếp thì module là __main__: phải dùng bản do_hieu_nang mà các module khác import
+    import do_hieu_nang
+
+    with do_hieu_nang.profile_run(args.run, args.report, args.profile, args.profiler):
+        if args.run == 'batch':
+            from du_bao_bat_thuong import process_batch_anomalies, OUTPUT_RESULT_FILE
+            process_batch_anomalies(args.input, args.output or OUTPUT_RESULT_FILE, chunksize=args.chunksize,
+                                    n_workers=args.workers, low_memory=args.low_memory,
+                                    incremental=args.incremental)
+        else:
+            from du_bao_gia import train_price_model
+            train_price_model(args.input, low_memory=args.low_memory)
@@ -1,12 +1,22 @@
 import pandas as pd
 import numpy as np
-import pickle
 import re
 import os
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # --- IMPORT ĐỒNG BỘ TỪ FILE DỰ BÁO GIÁ ---
-from du_bao_gia import predict_price_value, PRICE_MODEL_PATH, extract_tech_features
+from du_bao_gia import predict_price_batch, load_price_model, extract_tech_features_batch, PRICE_MODEL_PATH, \
+    CURRENT_YEAR
+from nguong_bat_thuong import resolve_threshold, resolve_thresholds_batch, MIN_SEGMENT_ROWS, SEGMENT_SEP
+from luu_mo_hinh import save_detectors
+from nap_du_lieu import load_listings, fresh_dataset, iter_dataset_chunks
+from do_hieu_nang import stage, count, count_errors
+from kho_ket_qua import append_result, append_results, replace_results, last_result_id, truncate_results, \
+    get_store_path, read_fingerprints, write_fingerprints, FINGERPRINT_INDEX
 
 # --- CẤU HÌNH FILE ---
 # 1. File dữ liệu gốc (để đọc và xử lý hàng loạt)
@@ -16,9 +26,17 @@ OUTPUT_RESULT_FILE = 'ket_qua_bat_thuong.csv'
 # 3. HẰNG SỐ MỚI: File lưu các trường hợp BÌNH THƯỜNG (cho tab mới)
 OUTPUT_NORMAL_FILE = 'ket_qua_binh_thuong.csv'
 
-# Ngưỡng lệch 25%
+# Ngưỡng lệch 25% (dùng khi model không có bảng ngưỡng theo phân khúc, xem nguong_bat_thuong)
 THRESHOLD_PERCENT = 0.25
 
+# Các cột kết quả batch thêm vào dữ liệu gốc
+RESULT_COLUMNS = ['Gia_Thuc_Te_Trieu', 'Gia_AI_Du_Doan_Trieu', 'Co_Bat_Thuong', 'Ly_Do_Chi_Tiet']
+
+# Chế độ tiết kiệm bộ nhớ (low_memory): các cột lặp lại nhiều giá trị được đọc dạng category
+LOW_MEMORY_CATEGORY_COLUMNS = ['Thương hiệu', 'Dòng xe', 'Loại xe', 'Dung tích xe', 'Xuất xứ', 'Tình trạng',
+                               'Địa chỉ', 'Giá', 'Khoảng giá min', 'Khoảng giá max', 'Chính sách bảo hành',
+                               'Trọng lượng']
+
 
 # =============================================================================
 # HÀM HỖ TRỢ
@@ -39,15 +57,58 @@ def clean_price_to_million(price_str):
         return 0
 
 
+def clean_price_to_million_batch(price_series):
+    """Phiên bản vector hóa của clean_price_to_million cho cả cột Giá"""
+    if isinstance(price_series.dtype, pd.CategoricalDtype):
+        # Cột category: chỉ xử lý các giá khác nhau, mã -1 (ô trống) lấy phần tử cuối = 0
+        category_prices = clean_price_to_million_batch(pd.Series(price_series.cat.categories, dtype=object))
+        category_prices = np.append(category_prices.to_numpy(), 0.0)
+        return pd.Series(category_prices[price_series.cat.codes.to_numpy()], index=price_series.index)
+
+    text = price_series.astype(object).where(price_series.notna(), '').astype(str).str.lower()
+
+    # Dạng '23.5 tr' -> giữ nguyên đơn vị triệu
+    tr_val = pd.to_numeric(text.str.replace(r'[^\d\.,]', '', regex=True).str.replace(',', '.', regex=False),
+                           errors='coerce')
+    # Dạng '66.000.000 đ' -> đổi ra triệu
+    vnd_val = pd.to_numeric(text.str.replace(r'[^\d]', '', regex=True), errors='coerce') / 1_000_000
+
+    result = vnd_val.where(~text.str.contains('tr', regex=False), tr_val)
+    return result.fillna(0).astype(float)
+
+
 # =============================================================================
 # 1. HÀM DỰ ĐOÁN & KIỂM TRA
 # =============================================================================
 
-def detect_anomaly(user_price, predicted_price):
+def listing_thresholds(resources, input_dict):
+    """
+    Ngưỡng (thấp hơn, cao hơn) cho phép của một tin theo phân khúc hãng x dòng xe x tuổi xe,
+    None nếu model không có bảng ngưỡng (dùng THRESHOLD_PERCENT).
+    """
+    table = resources.get('anomaly_thresholds')
+    if not table:
+        return None
+    tuoi_xe = np.fmax(0, CURRENT_YEAR - float(input_dict.get('nam', np.nan)))
+    return resolve_threshold(table, input_dict.get('Thương hiệu'), input_dict.get('Dòng xe'), tuoi_xe)
+
+
+def listing_thresholds_batch(resources, input_df):
+    """listing_thresholds cho cả DataFrame input (build_model_input_frame): (mảng thấp hơn, mảng cao hơn) hoặc None"""
+    table = resources.get('anomaly_thresholds')
+    if not table:
+        return None
+    tuoi_xe = np.fmax(0, CURRENT_YEAR - input_df['nam'].to_numpy(dtype=float))
+    return resolve_thresholds_batch(table, input_df['Thương hiệu'], input_df['Dòng xe'], tuoi_xe)
+
+
+def detect_anomaly(user_price, predicted_price, thresholds=None):
     """
     So sánh giá người dùng nhập và giá AI dự đoán.
+    thresholds: (tỉ lệ thấp hơn, tỉ lệ cao hơn) cho phép (xem listing_thresholds), mặc định THRESHOLD_PERCENT.
     Trả về dictionary kết quả.
     """
+    low, high = thresholds if thresholds is not None else (THRESHOLD_PERCENT, THRESHOLD_PERCENT)
     try:
         if predicted_price == 0:
             return {'isAbnormal': 1, 'reason': "Không thể định giá (Lỗi Model/Dữ liệu)"}
@@ -59,12 +120,12 @@ def detect_anomaly(user_price, predicted_price):
         diff_percent = (user_price - predicted_price) / predicted_price
 
         # Kiểm tra ngưỡng
-        if diff_percent < -THRESHOLD_PERCENT:
+        if diff_percent < -low:
             return {
                 'isAbnormal': 1,
                 'reason': f"Giá RẺ bất thường. AI dự đoán: {predicted_price:,.2f} tr. (Thấp hơn {abs(diff_percent):.0%})"
             }
-        elif diff_percent > THRESHOLD_PERCENT:
+        elif diff_percent > high:
             return {
                 'isAbnormal': 1,
                 'reason': f"Giá CAO bất thường. AI dự đoán: {predicted_price:,.2f} tr. (Cao hơn {diff_percent:.0%})"
@@ -76,111 +137,812 @@ def detect_anomaly(user_price, predicted_price):
         return {'isAbnormal': 0, 'reason': f"Lỗi kiểm tra: {str(e)}"}
 
 
+def detect_anomaly_batch(user_prices, predicted_prices, abnormal_only=False, thresholds=None):
+    """
+    Phiên bản vector hóa của detect_anomaly cho cả mảng giá.
+    Trả về (mảng isAbnormal 0/1, danh sách reason) cùng nội dung với gọi từng dòng.
+    abnormal_only=True: không tạo reason cho dòng bình thường (để chuỗi rỗng).
+    thresholds: (mảng thấp hơn, mảng cao hơn) theo từng dòng (xem listing_thresholds_batch),
+    mặc định THRESHOLD_PERCENT cho mọi dòng.
+    """
+    low, high = thresholds if thresholds is not None else (THRESHOLD_PERCENT, THRESHOLD_PERCENT)
+    predicted = np.asarray(predicted_prices)
+    if predicted.dtype.kind != 'f':
+        predicted = predicted.astype(float)
+    # Tính cùng kiểu dữ liệu với giá dự đoán (như phép tính float - np.float32 khi gọi từng dòng)
+    user = np.asarray(user_prices).astype(predicted.dtype)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff_percent = (user - predicted) / predicted
+
+    no_pred = predicted == 0
+    bad_input = ~no_pred & (user <= 0)
+    valid = ~no_pred & ~bad_input
+    too_low = valid & (diff_percent < -np.asarray(low))
+    too_high = valid & (diff_percent > np.asarray(high))
+
+    is_abnormal = (no_pred | bad_input | too_low | too_high).astype(int)
+
+    reasons = np.empty(len(predicted), dtype=object)
+    reasons[no_pred] = "Không thể định giá (Lỗi Model/Dữ liệu)"
+    reasons[bad_input] = "Giá nhập vào không hợp lệ"
+    reasons[too_low] = [f"Giá RẺ bất thường. AI dự đoán: {p:,.2f} tr. (Thấp hơn {abs(d):.0%})"
+                        for p, d in zip(predicted[too_low], diff_percent[too_low])]
+    reasons[too_high] = [f"Giá CAO bất thường. AI dự đoán: {p:,.2f} tr. (Cao hơn {d:.0%})"
+                         for p, d in zip(predicted[too_high], diff_percent[too_high])]
+    normal = is_abnormal == 0
+    if abnormal_only:
+        reasons[normal] = ""
+    else:
+        reasons[normal] = [f"Giá hợp lý (Chênh lệch {d:.0%})" for d in diff_percent[normal]]
+
+    return is_abnormal, reasons.tolist()
+
+
+def build_model_input_frame(df):
+    """
+    Tạo DataFrame input cho predict_price_batch từ dữ liệu gốc (Đồng bộ cột với GUI).
+    Giá trị mặc định giống như khi xử lý từng dòng.
+    """
+    def get_col(name, default):
+        if name in df.columns:
+            return df[name]
+        return pd.Series(default, index=df.index)
+
+    # Năm đăng ký: không đọc được (vd: 'trước năm 1980') -> 2019, ô trống giữ NaN
+    nam_raw = get_col('Năm đăng ký', 2019)
+    nam = pd.to_numeric(nam_raw, errors='coerce')
+    nam = nam.where(nam.notna() | nam_raw.isna(), 2019)
+
+    km = pd.to_numeric(get_col('Số Km đã đi', 5000), errors='coerce').fillna(5000)
+
+    return pd.DataFrame({
+        'Thương hiệu': get_col('Thương hiệu', 'Unknown'),
+        'Dòng xe': get_col('Dòng xe', 'Unknown'),
+        'Loại xe': get_col('Loại xe', 'Tay ga'),
+        'Dung tích xe': get_col('Dung tích xe', '100 - 175 cc'),
+        'Xuất xứ': get_col('Xuất xứ', 'Việt Nam'),
+        'nam': nam.astype(float),
+        'Số Km đã đi': km.astype(float),
+        'Tình trạng': get_col('Tình trạng', 'Đã sử dụng'),
+        'Địa chỉ': get_col('Địa chỉ', ''),
+    }, index=df.index)
+
+
 # =============================================================================
-# 2. HÀM ĐỌC FILE ĐẦU VÀO VÀ DỰ ĐOÁN CẢ FILE
+# 1b. BỘ PHÁT HIỆN BẤT THƯỜNG KẾT HỢP (ensemble, vector hóa trên cả khối)
+# - residual  : lệch so với giá AI dự đoán (detect_anomaly_batch, ngưỡng theo phân khúc nếu có)
+# - iqr       : log giá ngoài [Q1 - 1.5 IQR, Q3 + 1.5 IQR] của dòng xe (-> hãng -> toàn bộ)
+# - khoang_gia: giá ngoài Khoảng giá min/max của tin (nới theo phân phối lúc fit),
+#               tin không có khoảng giá dùng min/max của cả dữ liệu
+# - iforest   : Isolation Forest trên (log giá, tuổi xe, log số km, log giá thực/giá dự đoán)
+# Điểm = trung bình có trọng số các bộ có kết luận được cho dòng đó; bất thường nếu điểm >= min_score.
+# Trạng thái đã fit lưu cùng artifact model (luu_mo_hinh.save_detectors): batch không bao giờ fit lại.
+# Fit: python du_bao_bat_thuong.py --fit-detectors
 # =============================================================================
 
-def process_batch_anomalies(input_path=INPUT_DATA_FILE, output_path=OUTPUT_RESULT_FILE):
+DETECTOR_NAMES = ['residual', 'iqr', 'khoang_gia', 'iforest']
+DETECTOR_WEIGHTS = [0.4, 0.2, 0.2, 0.2]
+ENSEMBLE_MIN_SCORE = 0.5
+# Cột điểm bất thường (chỉ có khi model có bộ phát hiện kết hợp)
+SCORE_COLUMN = 'Diem_Bat_Thuong'
+
+IQR_FACTOR = 1.5
+# Phân vị của log(giá / Khoảng giá min) và log(giá / Khoảng giá max) làm biên nới của khoảng giá
+RANGE_QUANTILES = (0.01, 0.99)
+IFOREST_PARAMS = {'n_estimators': 100, 'max_samples': 256, 'random_state': 42}
+# Tỉ lệ tin train bị Isolation Forest coi là bất thường (đặt ngưỡng điểm)
+IFOREST_CONTAMINATION = 0.05
+
+DETECTOR_REASONS = {
+    'iqr': "Giá ngoài khoảng IQR của dòng xe",
+    'khoang_gia': "Giá ngoài khoảng giá tham khảo",
+    'iforest': "Isolation Forest: tổ hợp giá / tuổi xe / số km hiếm gặp",
+}
+
+
+def build_scoring_input(df, resources):
+    """DataFrame input cho predict_price_batch (thêm cờ từ Tiêu đề + Mô tả nếu model train trên văn bản đã chuẩn hóa)"""
+    input_df = build_model_input_frame(df)
+    if resources.get('text_normalization'):
+        # Model train trên văn bản đã chuẩn hóa: lấy cờ ABS/Smartkey/Chính chủ từ Tiêu đề + Mô tả như lúc train
+        input_df = input_df.join(extract_tech_features_batch(df, normalize_text=True))
+    return input_df
+
+
+def _segment_columns(input_df):
+    brands = input_df['Thương hiệu'].astype(object).fillna('Unknown').astype(str)
+    models = input_df['Dòng xe'].astype(object).fillna('Unknown').astype(str)
+    return brands.to_numpy(), (brands + SEGMENT_SEP + models).to_numpy()
+
+
+def _iforest_features(user, predicted, input_df):
+    """Ma trận feature của Isolation Forest (float32 như cây sklearn), dòng không tính được -> NaN"""
+    tuoi_xe = np.fmax(0, CURRENT_YEAR - input_df['nam'].to_numpy(dtype=float))
+    km = np.fmax(0, input_df['Số Km đã đi'].to_numpy(dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = np.column_stack([np.log(user), tuoi_xe, np.log1p(km), np.log(user / predicted)])
+    features[~((user > 0) & (predicted > 0))] = np.nan
+    return features.astype(np.float32)
+
+
+def _average_path_length(n):
+    """Độ dài đường đi trung bình của cây nhị phân n mẫu (chuẩn hóa điểm Isolation Forest)"""
+    n = np.asarray(n, dtype=float)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    big = n > 2
+    result[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return result
+
+
+def _export_isolation_forest(forest):
     """
-    Đọc file CSV gốc, dự đoán từng dòng và lưu ra file kết quả.
-    Lưu ý: Hàm này GHI ĐÈ file output_path.
+    Các cây của IsolationForest đã fit -> mảng dạng cây nhị phân đầy đủ (nút i có con 2i+1, 2i+2),
+    mỗi cây một hàng: duyệt cây chỉ còn phép so sánh + tính chỉ số, không phải tra nút con.
+    Lá nông hơn đáy được kéo xuống đáy theo nhánh trái (ngưỡng +inf).
     """
-    print(f"📂 Đang đọc dữ liệu từ: {input_path}...")
+    depth = max(tree.tree_.max_depth for tree in forest.estimators_)
+    size = 2 ** (depth + 1) - 1
+    n_trees = len(forest.estimators_)
+    feature = np.zeros((n_trees, size), dtype=np.int32)
+    threshold = np.full((n_trees, size), np.inf)
+    leaf_path = np.zeros((n_trees, size))
+    for i, (tree, tree_features) in enumerate(zip(forest.estimators_, forest.estimators_features_)):
+        t = tree.tree_
+        stack = [(0, 0, 0)]  # (nút sklearn, nút cây đầy đủ, độ sâu)
+        while stack:
+            node, dense, level = stack.pop()
+            if t.children_left[node] == -1:
+                bottom = (dense + 1) * 2 ** (depth - level) - 1  # đi trái tới đáy
+                leaf_path[i, bottom] = level + _average_path_length([t.n_node_samples[node]])[0]
+            else:
+                feature[i, dense] = tree_features[t.feature[node]]
+                threshold[i, dense] = t.threshold[node]
+                stack += [(t.children_left[node], 2 * dense + 1, level + 1),
+                          (t.children_right[node], 2 * dense + 2, level + 1)]
+    return {
+        'if_feature': feature,
+        'if_threshold': threshold,
+        'if_leaf_path': leaf_path,
+        'if_norm': np.array(_average_path_length([forest.max_samples_])[0]),
+    }
 
-    # Load Model
-    if not os.path.exists(PRICE_MODEL_PATH):
+
+def isolation_scores(state, features, block_size=4096):
+    """
+    Điểm Isolation Forest (0..1, cao = bất thường) tính từ mảng cây đã lưu, không cần sklearn.
+    Mỗi khối block_size dòng duyệt mọi cây cùng lúc (ma trận dòng x cây), số bước = độ sâu cây.
+    """
+    n_trees, size = state['if_feature'].shape
+    depth = int(np.log2(size + 1)) - 1
+    offsets = np.arange(n_trees) * size
+    feature, threshold = state['if_feature'].ravel(), state['if_threshold'].ravel()
+    leaf_path = state['if_leaf_path'].ravel()
+    n_features = features.shape[1]
+
+    total = np.zeros(len(features))
+    for start in range(0, len(features), block_size):
+        block = features[start:start + block_size].astype(np.float64)
+        values = block.ravel()
+        row_starts = np.arange(len(block))[:, None] * n_features
+        node = np.zeros((len(block), n_trees), dtype=np.int64)
+        for _ in range(depth):
+            at = node + offsets
+            node = 2 * node + 1 + (values[row_starts + feature[at]] > threshold[at])
+        total[start:start + block_size] = leaf_path[node + offsets].sum(axis=1)
+    return 2.0 ** (-(total / n_trees) / float(state['if_norm']))
+
+
+def _segment_bounds(state, brands, segments):
+    """Biên log giá (thấp, cao) của detector iqr cho từng dòng: dòng xe -> hãng -> toàn bộ"""
+    lookup = dict(zip(state['iqr_keys'].tolist(), zip(state['iqr_low'].tolist(), state['iqr_high'].tolist())))
+    fallback = tuple(state['iqr_global'].tolist())
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([segments, brands]))
+    bounds = np.array([lookup.get(segment, lookup.get(brand, fallback)) for segment, brand in uniques],
+                      dtype=float).reshape(-1, 2)
+    return bounds[codes, 0], bounds[codes, 1]
+
+
+def _price_range(df):
+    """(Khoảng giá min, Khoảng giá max) của từng tin theo triệu đồng, 0 nếu không có"""
+    def column(name):
+        if name not in df.columns:
+            return np.zeros(len(df))
+        # Chỉ đọc các giá trị khác nhau (khoảng giá lặp lại nhiều giữa các tin cùng dòng xe)
+        codes, uniques = pd.factorize(df[name])
+        parsed = clean_price_to_million_batch(pd.Series(uniques, dtype=object)).to_numpy()
+        return np.append(parsed, 0.0)[codes]
+    return column('Khoảng giá min'), column('Khoảng giá max')
+
+
+def fit_anomaly_detectors(df, resources, contamination=IFOREST_CONTAMINATION):
+    """
+    Fit các bộ iqr / khoang_gia / iforest trên dữ liệu tin đăng gốc, dùng giá dự đoán của model resources.
+    Trả về dict mảng numpy (lưu bằng luu_mo_hinh.save_detectors).
+    """
+    from sklearn.ensemble import IsolationForest
+
+    user = clean_price_to_million_batch(df['Giá']).to_numpy()
+    input_df = build_scoring_input(df, resources)
+    predicted = np.asarray(predict_price_batch(input_df, resources), dtype=float)
+    valid = user > 0
+    log_price = np.log(np.where(valid, user, 1.0))
+
+    # iqr: theo dòng xe và hãng (đủ MIN_SEGMENT_ROWS tin), cùng khoảng của toàn bộ
+    brands, segments = _segment_columns(input_df)
+    prices = pd.Series(log_price[valid])
+    keys, lows, highs = [], [], []
+    for level in [brands[valid], segments[valid]]:
+        grouped = prices.groupby(level)
+        stats = pd.DataFrame({'count': grouped.size(), 'q1': grouped.quantile(0.25), 'q3': grouped.quantile(0.75)})
+        stats = stats[stats['count'] >= MIN_SEGMENT_ROWS]
+        iqr = stats['q3'] - stats['q1']
+        keys += stats.index.astype(str).tolist()
+        lows += (stats['q1'] - IQR_FACTOR * iqr).tolist()
+        highs += (stats['q3'] + IQR_FACTOR * iqr).tolist()
+    q1, q3 = np.quantile(prices, [0.25, 0.75])
+
+    # khoang_gia: mức lệch (log) thường gặp so với khoảng giá của chính tin.
+    # Không tin nào có khoảng giá: bỏ bộ này (NaN -> không kết luận, điểm tính trên các bộ còn lại)
+    range_min, range_max = _price_range(df)
+    has_range = valid & (range_min > 0) & (range_max > 0)
+    if has_range.any():
+        range_log_low = np.quantile(np.log(user[has_range] / range_min[has_range]), RANGE_QUANTILES[0])
+        range_log_high = np.quantile(np.log(user[has_range] / range_max[has_range]), RANGE_QUANTILES[1])
+        range_global = [range_min[has_range].min(), range_max[has_range].max()]
+    else:
+        print("⚠️ Không có tin nào có khoảng giá, bỏ bộ phát hiện 'khoang_gia'.")
+        range_log_low = range_log_high = np.nan
+        range_global = [np.nan, np.nan]
+
+    # iforest
+    features = _iforest_features(user, predicted, input_df)
+    features = features[np.isfinite(features).all(axis=1)]
+    forest = IsolationForest(**IFOREST_PARAMS).fit(features)
+    state = _export_isolation_forest(forest)
+    state['if_score_threshold'] = np.array(np.quantile(isolation_scores(state, features), 1 - contamination))
+
+    state.update({
+        'detector_names': np.array(DETECTOR_NAMES),
+        'weights': np.array(DETECTOR_WEIGHTS, dtype=float),
+        'min_score': np.array(ENSEMBLE_MIN_SCORE),
+        'iqr_keys': np.array(keys, dtype=str),
+        'iqr_low': np.array(lows, dtype=float),
+        'iqr_high': np.array(highs, dtype=float),
+        'iqr_global': np.array([q1 - IQR_FACTOR * (q3 - q1), q3 + IQR_FACTOR * (q3 - q1)]),
+        'range_log_bounds': np.array([range_log_low, range_log_high]),
+        'range_global': np.array(range_global, dtype=float),
+    })
+    return state
+
+
+def detect_anomaly_ensemble(df, input_df, user_prices, predicted_prices, state, thresholds=None,
+                            abnormal_only=False):
+    """
+    Chạy cả 4 bộ phát hiện trên khối df và kết hợp thành một điểm.
+    Trả về (mảng isAbnormal 0/1, danh sách reason, mảng điểm 0..1).
+    Giá dự đoán 0 / giá nhập không hợp lệ luôn là bất thường (điểm 1) với lý do như detect_anomaly_batch.
+    """
+    user = np.asarray(user_prices, dtype=float)
+    predicted = np.asarray(predicted_prices, dtype=float)
+    n = len(user)
+    residual_abnormal, residual_reasons = detect_anomaly_batch(user_prices, predicted_prices, abnormal_only=True,
+                                                               thresholds=thresholds)
+    hard = (predicted == 0) | (user <= 0)
+    valid = ~hard
+    log_price = np.log(np.where(valid, user, 1.0))
+
+    # Mỗi detector: cờ 1.0/0.0, NaN = không kết luận được cho dòng đó
+    flags = np.full((n, len(DETECTOR_NAMES)), np.nan)
+    flags[valid, 0] = residual_abnormal[valid]
+
+    brands, segments = _segment_columns(input_df)
+    iqr_low, iqr_high = _segment_bounds(state, brands, segments)
+    flags[valid, 1] = ((log_price < iqr_low) | (log_price > iqr_high))[valid]
+
+    range_min, range_max = _price_range(df)
+    has_range = (range_min > 0) & (range_max > 0)
+    log_low, log_high = state['range_log_bounds']
+    global_min, global_max = state['range_global']
+    allowed_min = np.where(has_range, range_min * np.exp(log_low), global_min)
+    allowed_max = np.where(has_range, range_max * np.exp(log_high), global_max)
+    # Bộ khoang_gia được fit không có khoảng giá nào (ngưỡng NaN): không kết luận
+    if np.isfinite(log_low):
+        flags[valid, 2] = ((user < allowed_min) | (user > allowed_max))[valid]
+
+    features = _iforest_features(user, predicted, input_df)
+    computable = np.isfinite(features).all(axis=1)
+    flags[computable, 3] = isolation_scores(state, features[computable]) > state['if_score_threshold']
+
+    weights = state['weights']
+    available = ~np.isnan(flags)
+    with np.errstate(invalid='ignore'):
+        scores = (np.nan_to_num(flags) @ weights) / (available @ weights)
+    scores = np.where(hard, 1.0, np.nan_to_num(scores))
+    is_abnormal = (hard | (scores >= state['min_score'])).astype(int)
+
+    reasons = np.full(n, "", dtype=object)
+    for i in np.flatnonzero(is_abnormal):
+        parts = [residual_reasons[i]] if residual_abnormal[i] else []
+        if flags[i, 1] == 1:
+            parts.append(f"{DETECTOR_REASONS['iqr']} ({np.exp(iqr_low[i]):,.2f} - {np.exp(iqr_high[i]):,.2f} tr)")
+        if flags[i, 2] == 1:
+            parts.append(f"{DETECTOR_REASONS['khoang_gia']} ({allowed_min[i]:,.2f} - {allowed_max[i]:,.2f} tr)")
+        if flags[i, 3] == 1:
+            parts.append(DETECTOR_REASONS['iforest'])
+        reasons[i] = '; '.join(parts)
+    if not abnormal_only:
+        normal = is_abnormal == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diff_percent = (user[normal] - predicted[normal]) / predicted[normal]
+        reasons[normal] = [f"Giá hợp lý (Chênh lệch {d:.0%})" for d in diff_percent]
+
+    return is_abnormal, reasons.tolist(), np.round(scores, 4)
+
+
+def train_anomaly_detectors(data_path=INPUT_DATA_FILE, root=PRICE_MODEL_PATH):
+    """Fit bộ phát hiện kết hợp trên file dữ liệu với model LATEST và lưu vào artifact đó"""
+    print("--- [ANOMALY] Đang fit các bộ phát hiện bất thường... ---")
+    resources = load_price_model(root)
+    df = read_input_file(data_path)
+    path = save_detectors(root, fit_anomaly_detectors(df, resources), resources.get('artifact_version'))
+    print(f"--- [ANOMALY] Đã lưu bộ phát hiện tại {path} ---")
+    return path
+
+
+# =============================================================================
+# 2. HÀM ĐỌC FILE ĐẦU VÀO VÀ DỰ ĐOÁN CẢ FILE
+# =============================================================================
+
+def _load_batch_resources():
+    """Load model cho batch, trả về None nếu lỗi"""
+    try:
+        return load_price_model(PRICE_MODEL_PATH)
+    except FileNotFoundError:
         print(f"❌ Lỗi: Không tìm thấy model '{PRICE_MODEL_PATH}'")
+        return None
+    except Exception as e:
+        print(f"❌ Lỗi load model: {e}")
+        return None
+
+
+def score_listings(df, resources):
+    """
+    Chấm điểm một DataFrame tin đăng (vector hóa).
+    Thêm các cột kết quả Gia_Thuc_Te_Trieu, Gia_AI_Du_Doan_Trieu, Co_Bat_Thuong, Ly_Do_Chi_Tiet vào df
+    (thêm SCORE_COLUMN nếu model có bộ phát hiện kết hợp).
+    """
+    # Lấy giá thực tế (cả cột)
+    with stage('gia_thuc_te', rows=len(df)):
+        if 'Giá' in df.columns:
+            prices_million = clean_price_to_million_batch(df['Giá'])
+        else:
+            prices_million = pd.Series(0.0, index=df.index)
+    # Giá không đọc được -> 0 (bị báo 'Giá nhập vào không hợp lệ')
+    count_errors('gia_khong_hop_le', int((prices_million <= 0).sum()))
+
+    # Dự đoán cả khối bằng một lần gọi model
+    with stage('dac_trung', rows=len(df)):
+        input_df = build_scoring_input(df, resources)
+    try:
+        with stage('du_doan', rows=len(df)):
+            predictions = predict_price_batch(input_df, resources)
+    except Exception as e:
+        print(f"❌ Lỗi dự đoán: {e}")
+        # Cả khối nhận giá dự đoán 0 (bị báo 'Không thể định giá')
+        count_errors('du_doan', len(df))
+        predictions = np.zeros(len(df), dtype=np.float32)
+
+    # Kiểm tra bất thường (chỉ lưu lý do của dòng bất thường)
+    with stage('kiem_tra', rows=len(df)):
+        thresholds = listing_thresholds_batch(resources, input_df)
+        scores = None
+        if resources.get('anomaly_detectors'):
+            is_abnormal_list, reasons, scores = detect_anomaly_ensemble(
+                df, input_df, prices_million.to_numpy(), predictions, resources['anomaly_detectors'],
+                thresholds=thresholds, abnormal_only=True)
+        else:
+            is_abnormal_list, reasons = detect_anomaly_batch(prices_million.to_numpy(), predictions,
+                                                             abnormal_only=True, thresholds=thresholds)
+    count('dong_bat_thuong', int(np.sum(is_abnormal_list)))
+
+    # Thêm cột kết quả vào DataFrame
+    df['Gia_Thuc_Te_Trieu'] = prices_million.to_numpy()
+    df['Gia_AI_Du_Doan_Trieu'] = predictions
+    df['Co_Bat_Thuong'] = is_abnormal_list
+    df['Ly_Do_Chi_Tiet'] = reasons
+    if scores is not None:
+        df[SCORE_COLUMN] = scores
+    return df
+
+
+# --- Chấm điểm song song (nhiều process) ---
+# Model của mỗi worker, load MỘT lần trong initializer
+_WORKER_RESOURCES = None
+
+
+def _init_scoring_worker(model_path):
+    global _WORKER_RESOURCES
+    _WORKER_RESOURCES = load_price_model(model_path)
+    # Mỗi worker dùng 1 luồng XGBoost để các process không tranh CPU của nhau
+    _WORKER_RESOURCES['model'].set_params(n_jobs=1)
+
+
+def _score_shard(df_shard):
+    """Chạy trong worker: chỉ trả về các cột kết quả để giảm dữ liệu truyền giữa process"""
+    scored = score_listings(df_shard, _WORKER_RESOURCES)
+    return scored[[col for col in RESULT_COLUMNS + [SCORE_COLUMN] if col in scored.columns]]
+
+
+def create_scoring_pool(n_workers, model_path=PRICE_MODEL_PATH):
+    """Tạo process pool chấm điểm, mỗi worker load model một lần"""
+    return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_scoring_worker,
+                               initargs=(model_path,))
+
+
+def score_listings_parallel(df, pool, n_workers):
+    """
+    Chia df thành n_workers phần liên tiếp, chấm điểm song song trên pool rồi ghép lại.
+    pool.map giữ đúng thứ tự các phần nên kết quả giống hệt score_listings.
+    """
+    shards = [df.iloc[idx] for idx in np.array_split(np.arange(len(df)), n_workers) if len(idx)]
+    if not shards:
+        for col in RESULT_COLUMNS:
+            df[col] = []
+        return df
+
+    results = pd.concat(list(pool.map(_score_shard, shards)))
+    for col in results.columns:
+        df[col] = results[col].to_numpy()
+    return df
+
+
+# --- Chấm điểm tăng dần: chỉ chấm tin mới/đã sửa, dùng lại kết quả cũ cho các tin khác ---
+# Cột mã tin (ưu tiên theo thứ tự)
+FINGERPRINT_KEY_COLUMNS = ['id', 'Href']
+# Tăng khi đổi cách chấm điểm mà model không đổi: các chỉ mục cũ bị bỏ qua
+FINGERPRINT_FORMAT = 1
+
+
+def scoring_model_key(resources):
+    """Khóa của model + bộ phát hiện + cách chấm; đổi khóa -> chấm lại tất cả"""
+    return json.dumps({'model_version': resources.get('model_version'),
+                       'detectors_version': resources.get('detectors_version'),
+                       'format': FINGERPRINT_FORMAT})
+
+
+def listing_fingerprints(df):
+    """
+    (mã tin, vân tay nội dung) của từng dòng, dạng MultiIndex; None nếu df không có cột mã tin.
+    Vân tay = hash_pandas_object trên mọi cột dữ liệu gốc (không tính các cột do batch thêm vào).
+    """
+    key_col = next((col for col in FINGERPRINT_KEY_COLUMNS if col in df.columns), None)
+    if key_col is None:
+        return None
+    added = set(RESULT_COLUMNS + [SCORE_COLUMN, 'Thời gian ghi nhận'])
+    content = df[sorted(col for col in df.columns if col not in added)]
+    hashes = pd.util.hash_pandas_object(content, index=False).to_numpy().view(np.int64)
+    keys = df[key_col].astype(object).astype(str).to_numpy()
+    return pd.MultiIndex.from_arrays([keys, hashes], names=FINGERPRINT_INDEX)
+
+
+class IncrementalScorer:
+    """
+    Bọc hàm score(df): dòng có (mã tin, vân tay) đã có trong chỉ mục của output_path (cùng model)
+    nhận lại kết quả cũ, chỉ các dòng còn lại được chấm. save() ghi chỉ mục mới:
+    các tin gặp trong lần chạy này + tin cũ không gặp lại (vd: chạy tiếp sau lỗi).
+    """
+
+    def __init__(self, score, output_path, model_key):
+        self.score = score
+        self.output_path = output_path
+        self.model_key = model_key
+        self.index = read_fingerprints(output_path, model_key)
+        self.entries = []
+        self.reused = 0
+        self.scored = 0
+
+    def __call__(self, df):
+        fingerprints = listing_fingerprints(df)
+        if fingerprints is None:
+            print(f"⚠️ Không có cột mã tin ({FINGERPRINT_KEY_COLUMNS}), chấm lại tất cả.")
+            self.scored += len(df)
+            return self.score(df)
+
+        if self.index is not None and len(self.index):
+            known = self.index.reindex(fingerprints)
+            reuse = known['Co_Bat_Thuong'].notna().to_numpy()
+        else:
+            known, reuse = None, np.zeros(len(df), dtype=bool)
+        todo = ~reuse
+
+        parts, order = [], []
+        if reuse.any():
+            # reindex đổi cột số nguyên sang float (vì có NaN): trả lại kiểu lúc ghi
+            parts.append(known[reuse].astype(self.index.dtypes.to_dict()).reset_index(drop=True))
+            order.append(np.flatnonzero(reuse))
+        if todo.any():
+            scored = self.score(df[todo].copy())
+            parts.append(scored[[c for c in RESULT_COLUMNS + [SCORE_COLUMN] if c in scored.columns]]
+                         .reset_index(drop=True))
+            order.append(np.flatnonzero(todo))
+        if not parts:
+            for col in RESULT_COLUMNS:
+                df[col] = []
+            return df
+
+        # Ghép về đúng thứ tự dòng của df, giữ kiểu dữ liệu của phần vừa chấm (nếu có)
+        results = pd.concat(parts, ignore_index=True).iloc[np.argsort(np.concatenate(order), kind='stable')]
+        dtypes = parts[-1].dtypes
+        for col in results.columns:
+            df[col] = results[col].astype(dtypes[col]).to_numpy()
+
+        self.entries.append(results.set_axis(fingerprints, axis=0))
+        self.reused += int(reuse.sum())
+        self.scored += int(todo.sum())
+        count('tin_dung_lai', int(reuse.sum()))
+        count('tin_cham_moi', int(todo.sum()))
+        return df
+
+    def save(self):
+        if not self.entries:
+            return 0
+        new_index = pd.concat(self.entries)
+        if self.index is not None and len(self.index):
+            unseen = ~self.index.index.get_level_values(0).isin(new_index.index.get_level_values(0))
+            new_index = pd.concat([self.index[unseen], new_index])
+        return write_fingerprints(self.output_path, self.model_key, new_index)
+
+
+def compact_listing_frame(df):
+    """Chuyển các cột lặp lại nhiều (LOW_MEMORY_CATEGORY_COLUMNS) sang category, tại chỗ"""
+    for col in LOW_MEMORY_CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def read_input_file(input_path, low_memory=False):
+    """
+    Đọc cả file đầu vào (qua file Parquet nếu có, file Excel được chuyển sang Parquet ở lần đọc đầu,
+    xem nap_du_lieu); low_memory: các cột lặp lại thành category.
+    """
+    if input_path.endswith('.csv') and fresh_dataset(input_path) is None:
+        dtype = {col: 'category' for col in LOW_MEMORY_CATEGORY_COLUMNS} if low_memory else None
+        return pd.read_csv(input_path, dtype=dtype)
+    df = load_listings(input_path)
+    return compact_listing_frame(df) if low_memory else df
+
+
+def add_batch_time(df, batch_time, low_memory=False):
+    """Cột 'Thời gian ghi nhận' (cùng một giá trị cho cả batch); low_memory: category 1 byte/dòng"""
+    if low_memory:
+        df['Thời gian ghi nhận'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8),
+                                                             categories=[batch_time])
+    else:
+        df['Thời gian ghi nhận'] = batch_time
+
+
+def iter_input_chunks(input_path, chunksize, skip_rows=0, low_memory=False):
+    """
+    Đọc file đầu vào theo từng khối chunksize dòng (bỏ qua skip_rows dòng dữ liệu đầu).
+    File Parquet (hoặc file gốc đã có Parquet còn hạn) đọc theo từng khối cột, CSV dùng pandas chunksize,
+    Excel dùng openpyxl chế độ read_only để không nạp cả file.
+    low_memory: các cột lặp lại nhiều được chuyển sang category.
+    """
+    dataset = fresh_dataset(input_path)
+    if dataset is not None:
+        for chunk in iter_dataset_chunks(dataset, chunksize, skip_rows):
+            yield compact_listing_frame(chunk) if low_memory else chunk
+        return
+
+    if input_path.endswith('.csv'):
+        dtype = {col: 'category' for col in LOW_MEMORY_CATEGORY_COLUMNS} if low_memory else None
+        yield from pd.read_csv(input_path, chunksize=chunksize, skiprows=range(1, skip_rows + 1), dtype=dtype)
         return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(input_path, read_only=True, data_only=True)
     try:
-        with open(PRICE_MODEL_PATH, 'rb') as f:
-            resources = pickle.load(f)
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows)
+        # Bỏ các cột trống cuối sheet
+        n_cols = max(i for i, name in enumerate(header) if name is not None) + 1
+        header = list(header[:n_cols])
+        for _ in itertools.islice(rows, skip_rows):
+            pass
+        while True:
+            block = [row[:n_cols] for row in itertools.islice(rows, chunksize)]
+            if not block:
+                break
+            chunk = pd.DataFrame(block, columns=header)
+            yield compact_listing_frame(chunk) if low_memory else chunk
+    finally:
+        wb.close()
+
+
+def _checkpoint_path(output_path):
+    return output_path + '.checkpoint.json'
+
+
+def _save_checkpoint(output_path, state):
+    """Ghi checkpoint nguyên tử (ghi file tạm rồi đổi tên)"""
+    tmp_path = _checkpoint_path(output_path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, _checkpoint_path(output_path))
+
+
+def _load_checkpoint(output_path, input_path, chunksize):
+    """Đọc checkpoint của lần chạy trước, None nếu không có hoặc không khớp tham số"""
+    try:
+        with open(_checkpoint_path(output_path), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('input_path') != input_path or state.get('chunksize') != chunksize:
+        print("⚠️ Checkpoint không khớp input/chunksize, chạy lại từ đầu.")
+        return None
+    # File output bị xóa/di chuyển hoặc ngắn hơn phần đã ghi lúc checkpoint: không chạy tiếp được
+    output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else None
+    if output_bytes is None or output_bytes < state.get('output_bytes', 0):
+        print(f"⚠️ File output '{output_path}' không còn khớp checkpoint "
+              f"({'không tồn tại' if output_bytes is None else f'{output_bytes} byte'}, "
+              f"checkpoint {state.get('output_bytes', 0)} byte), chạy lại từ đầu.")
+        return None
+    return state
+
+
+def _process_batch_streaming(input_path, output_path, score, chunksize, resume, low_memory=False):
+    """
+    Chế độ streaming: đọc - chấm điểm - ghi nối kết quả bất thường theo từng khối.
+    Sau mỗi khối, checkpoint lưu số khối đã xong cùng kích thước file output và
+    ma_ban_ghi cuối trong kho, để chạy tiếp (resume) cắt bỏ phần ghi dở của khối lỗi.
+    """
+    state = _load_checkpoint(output_path, input_path, chunksize) if resume else None
+
+    if state is not None:
+        print(f"↩️ Chạy tiếp từ khối {state['chunks_done']} ({state['rows_done']} dòng đã xử lý)")
+        # Bỏ phần đã ghi sau checkpoint cuối
+        with open(output_path, 'r+b') as f:
+            f.truncate(state['output_bytes'])
+        truncate_results(output_path, state['store_last_id'])
+    else:
+        state = {
+            'input_path': input_path,
+            'chunksize': chunksize,
+            'batch_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'chunks_done': 0,
+            'rows_done': 0,
+            'abnormal_rows': 0,
+            'output_bytes': 0,
+        }
+        # Ghi đè kho kết quả như chế độ thường
+        replace_results(output_path, pd.DataFrame())
+        state['store_last_id'] = last_result_id(output_path)
+
+    try:
+        chunks = iter_input_chunks(input_path, chunksize, skip_rows=state['rows_done'], low_memory=low_memory)
+        while True:
+            with stage('doc_file'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            add_batch_time(chunk, state['batch_time'], low_memory)
+            with stage('cham_diem', rows=len(chunk)):
+                score(chunk)
+            chunk_abnormal = chunk[chunk['Co_Bat_Thuong'] == 1]
+
+            # Khối đầu tiên ghi header (kể cả khi không có dòng bất thường)
+            first_chunk = state['output_bytes'] == 0
+            with stage('ghi_csv', rows=len(chunk_abnormal)):
+                chunk_abnormal.to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk,
+                                      index=False, encoding='utf-8-sig')
+            # Dòng xử lý sau là dòng mới hơn
+            with stage('ghi_kho', rows=len(chunk_abnormal)):
+                append_results(output_path, chunk_abnormal, newest_first=False)
+
+            state['chunks_done'] += 1
+            state['rows_done'] += len(chunk)
+            state['abnormal_rows'] += len(chunk_abnormal)
+            state['output_bytes'] = os.path.getsize(output_path)
+            state['store_last_id'] = last_result_id(output_path)
+            _save_checkpoint(output_path, state)
+            print(f"   ... khối {state['chunks_done']}: {state['rows_done']} dòng, "
+                  f"{state['abnormal_rows']} bất thường")
     except Exception as e:
-        print(f"❌ Lỗi load model: {e}")
+        print(f"❌ Lỗi ở khối {state['chunks_done'] + 1}: {e}. Có thể chạy tiếp với resume=True.")
+        count_errors('khoi_loi')
         return
 
-    # Đọc File
+    os.remove(_checkpoint_path(output_path))
+    print(f"✅ HOÀN TẤT BATCH! Đã lưu {state['abnormal_rows']} trường hợp bất thường "
+          f"(trên {state['rows_done']} dòng) tại: {output_path}")
+
+
+def process_batch_anomalies(input_path=INPUT_DATA_FILE, output_path=OUTPUT_RESULT_FILE, chunksize=None,
+                            resume=False, n_workers=1, low_memory=False, incremental=False):
+    """
+    Đọc file CSV gốc, dự đoán cả file (vector hóa) và lưu ra file kết quả.
+    Lưu ý: Hàm này GHI ĐÈ file output_path và kho kết quả tương ứng.
+
+    chunksize: nếu có, đọc và xử lý theo từng khối chunksize dòng (bộ nhớ cố định),
+               các dòng bất thường được ghi nối dần vào output sau mỗi khối.
+    resume: (chỉ dùng với chunksize) chạy tiếp từ khối cuối cùng đã hoàn tất của lần chạy trước.
+    n_workers: số process chấm điểm song song (mỗi process load model một lần).
+               Dữ liệu (hoặc mỗi khối) được chia đều rồi ghép lại đúng thứ tự ban đầu.
+    low_memory: các cột lặp lại nhiều (hãng, dòng xe, địa chỉ, giá...) và cột thời gian dạng category,
+                giá/mã phân loại chỉ tính trên các giá trị khác nhau. File kết quả giống hệt chế độ thường.
+    incremental: chỉ chấm tin mới hoặc đã sửa (theo mã tin 'id'/'Href' + vân tay nội dung), các tin khác
+                 dùng lại kết quả lần chạy trước (chỉ mục .van_tay.db cạnh output). Model/bộ phát hiện đổi
+                 -> chấm lại tất cả. File kết quả vẫn chứa đủ các tin bất thường của cả file đầu vào.
+    """
+    print(f"📂 Đang đọc dữ liệu từ: {input_path}...")
+
+    # Load Model
+    resources = _load_batch_resources()
+    if resources is None:
+        return
+
+    pool = create_scoring_pool(n_workers) if n_workers > 1 else None
     try:
-        if input_path.endswith('.csv'):
-            df = pd.read_csv(input_path)
+        if pool is None:
+            score = lambda df: score_listings(df, resources)
+        else:
+            print(f"⚙️ Chấm điểm song song với {n_workers} process")
+            score = lambda df: score_listings_parallel(df, pool, n_workers)
+        if incremental:
+            score = IncrementalScorer(score, output_path, scoring_model_key(resources))
+
+        if chunksize:
+            _process_batch_streaming(input_path, output_path, score, chunksize, resume, low_memory)
         else:
-            df = pd.read_excel(input_path)
+            _process_batch_in_memory(input_path, output_path, score, low_memory)
+        if incremental:
+            score.save()
+            print(f"♻️ Dùng lại kết quả của {score.reused} tin, chấm mới {score.scored} tin")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _process_batch_in_memory(input_path, output_path, score, low_memory=False):
+    """Chế độ thường: đọc cả file, chấm điểm và ghi đè kết quả một lần"""
+    # Đọc File
+    try:
+        with stage('doc_file'):
+            df = read_input_file(input_path, low_memory)
     except Exception as e:
         print(f"❌ Lỗi đọc file: {e}")
+        count_errors('doc_file')
         return
 
     print(f"✅ Đã tải {len(df)} dòng. Đang xử lý...")
 
-    predictions = []
-    reasons = []
-    is_abnormal_list = []
-    prices_million = []
-
     # Thêm cột thời gian (batch)
-    df['Thời gian ghi nhận'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Loop xử lý từng dòng
-    for index, row in df.iterrows():
-        # Lấy giá thực tế
-        actual_price_million = clean_price_to_million(row.get('Giá', 0))
-        prices_million.append(actual_price_million)
-
-        # Trích xuất feature text (Dùng hàm import từ du_bao_gia)
-        tech_features = extract_tech_features(row)
-
-        # Chuẩn bị input cho model (Đồng bộ cột với GUI)
-        try:
-            nam_dk = float(row.get('Năm đăng ký', 2019))
-        except:
-            nam_dk = 2019
-
-        input_dict = {
-            'Thương hiệu': row.get('Thương hiệu', 'Unknown'),
-            'Dòng xe': row.get('Dòng xe', 'Unknown'),
-            'Loại xe': row.get('Loại xe', 'Tay ga'),
-            'Dung tích xe': row.get('Dung tích xe', '100 - 175 cc'),
-            'Xuất xứ': row.get('Xuất xứ', 'Việt Nam'),
-            'nam': nam_dk,
-            'Số Km đã đi': float(row.get('Số Km đã đi', 5000) if pd.notnull(row.get('Số Km đã đi')) else 5000),
-            'Tình trạng': row.get('Tình trạng', 'Đã sử dụng'),
-            'Địa chỉ': row.get('Địa chỉ', '')#,
-            # 'has_abs': tech_features['has_abs'],
-            # 'has_smartkey': tech_features['has_smartkey'],
-            # 'is_chinh_chu': tech_features['is_chinh_chu']
-        }
-
-        # Dự đoán
-        try:
-            pred_price = predict_price_value(input_dict, resources)
-        except:
-            pred_price = 0
-        predictions.append(pred_price)
+    add_batch_time(df, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), low_memory)
 
-        # Kiểm tra bất thường
-        res = detect_anomaly(actual_price_million, pred_price)
-        is_abnormal_list.append(res['isAbnormal'])
-
-        # Chỉ lưu lý do bất thường nếu có
-        reason_text = res['reason'] if res['isAbnormal'] == 1 else ""
-        reasons.append(reason_text)
-
-    # Thêm cột kết quả vào DataFrame
-    df['Gia_Thuc_Te_Trieu'] = prices_million
-    df['Gia_AI_Du_Doan_Trieu'] = predictions
-    df['Co_Bat_Thuong'] = is_abnormal_list
-    df['Ly_Do_Chi_Tiet'] = reasons
+    with stage('cham_diem', rows=len(df)):
+        score(df)
 
     # Chỉ giữ lại các dòng bất thường
-    df_abnormal_batch = df[df['Co_Bat_Thuong'] == 1].copy()
+    df_abnormal_batch = df[df['Co_Bat_Thuong'] == 1]
 
     # Lưu ra file (Ghi đè để tạo file chuẩn)
-    if not df_abnormal_batch.empty:
-        df_abnormal_batch.to_csv(output_path, index=False, encoding='utf-8-sig')
-        print(f"✅ HOÀN TẤT BATCH! Đã lưu {len(df_abnormal_batch)} trường hợp bất thường tại: {output_path}")
-    else:
-        print(f"✅ HOÀN TẤT BATCH! Không tìm thấy bất thường nào.")
-        # Tạo file rỗng với header nếu không có bất thường
-        df_empty = pd.DataFrame(columns=df.columns)
-        df_empty.to_csv(output_path, index=False, encoding='utf-8-sig')
+    with stage('ghi_csv', rows=len(df_abnormal_batch)):
+        if not df_abnormal_batch.empty:
+            df_abnormal_batch.to_csv(output_path, index=False, encoding='utf-8-sig')
+            print(f"✅ HOÀN TẤT BATCH! Đã lưu {len(df_abnormal_batch)} trường hợp bất thường tại: {output_path}")
+        else:
+            print(f"✅ HOÀN TẤT BATCH! Không tìm thấy bất thường nào.")
+            # Tạo file rỗng với header nếu không có bất thường
+            df_empty = pd.DataFrame(columns=df.columns)
+            df_empty.to_csv(output_path, index=False, encoding='utf-8-sig')
+
+    # Đồng bộ kho kết quả mà GUI đọc (cũng ghi đè)
+    with stage('ghi_kho', rows=len(df_abnormal_batch)):
+        replace_results(output_path, df_abnormal_batch)
 
 
 # =============================================================================
@@ -190,11 +952,13 @@ def process_batch_anomalies(input_path=INPUT_DATA_FILE, output_path=OUTPUT_RESUL
 # CẬP NHẬT: Thêm tham số predicted_price và reason
 def save_abnormal_to_csv(input_dict, check_price, predicted_price, reason, file_path=OUTPUT_RESULT_FILE):
     """
-    Nhận các thông tin từ GUI và lưu các trường hợp BẤT THƯỜNG vào file CSV.
+    Nhận các thông tin từ GUI và lưu các trường hợp BẤT THƯỜNG vào kho kết quả (xem kho_ket_qua).
+    Giữ tên và tham số cũ (API công khai): file_path là file CSV kết quả, dòng được ghi vào kho SQLite
+    tương ứng (get_store_path(file_path)).
     Lưu ý: Đảm bảo dòng mới nhất NẰM Ở ĐẦU.
     """
     try:
-        # Chuẩn bị dòng dữ liệu mới (Mapping từ GUI input -> Cột CSV)
+        # Chuẩn bị dòng dữ liệu mới (Mapping từ GUI input -> cột của kho kết quả)
         new_row = {
             'Tiêu đề': f"Cảnh báo GUI: Giá {check_price:,.2f}tr cho {input_dict['Thương hiệu']} {input_dict['Dòng xe']}",
             'Giá': f"{check_price:,.2f} tr",  # Lưu giá người dùng nhập
@@ -215,30 +979,22 @@ def save_abnormal_to_csv(input_dict, check_price, predicted_price, reason, file_
             'Thời gian ghi nhận': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        new_df = pd.DataFrame([new_row])
+        # Thêm 1 dòng vào kho kết quả (O(1)), dòng mới nhất sẽ nằm ở đầu khi đọc
+        append_result(file_path, new_row)
 
-        # Logic Append: Đọc file cũ, nối dòng mới lên đầu, rồi ghi đè
-        if os.path.exists(file_path):
-            existing_df = pd.read_csv(file_path, encoding='utf-8-sig')
-            # Nối new_df lên trên existing_df
-            combined_df = pd.concat([new_df, existing_df], ignore_index=True)
-            combined_df.to_csv(file_path, mode='w', header=True, index=False, encoding='utf-8-sig')
-        else:
-            # File không tồn tại thì tạo mới
-            new_df.to_csv(file_path, mode='w', header=True, index=False, encoding='utf-8-sig')
-
-        return True, f"Đã lưu vào {file_path}"
+        return True, f"Đã lưu vào kho kết quả {get_store_path(file_path)}"
 
     except Exception as e:
-        return False, f"Lỗi lưu file: {str(e)}"
+        return False, f"Lỗi lưu kho kết quả: {str(e)}"
 
 # HÀM MỚI: LƯU DỮ LIỆU BÌNH THƯỜNG
 def save_normal_to_csv(input_dict, check_price, predicted_price, reason, file_path=OUTPUT_NORMAL_FILE):
     """
-    Nhận các thông tin từ GUI và lưu các trường hợp BÌNH THƯỜNG vào file CSV.
+    Nhận các thông tin từ GUI và lưu các trường hợp BÌNH THƯỜNG vào kho kết quả (xem kho_ket_qua).
+    Giữ tên và tham số cũ như save_abnormal_to_csv.
     """
     try:
-        # Chuẩn bị dòng dữ liệu mới (Mapping từ GUI input -> Cột CSV)
+        # Chuẩn bị dòng dữ liệu mới (Mapping từ GUI input -> cột của kho kết quả)
         new_row = {
             'Tiêu đề': f"Bài đăng hợp lệ: Giá {check_price:,.2f}tr cho {input_dict['Thương hiệu']} {input_dict['Dòng xe']}",
             'Giá': f"{check_price:,.2f} tr",  # Lưu giá người dùng nhập
@@ -258,24 +1014,25 @@ def save_normal_to_csv(input_dict, check_price, predicted_price, reason, file_pa
             'Thời gian ghi nhận': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        new_df = pd.DataFrame([new_row])
-
-        # Logic Append: Đọc file cũ, nối dòng mới lên đầu, rồi ghi đè
-        if os.path.exists(file_path):
-            existing_df = pd.read_csv(file_path, encoding='utf-8-sig')
-            # Nối new_df lên trên existing_df
-            combined_df = pd.concat([new_df, existing_df], ignore_index=True)
-            combined_df.to_csv(file_path, mode='w', header=True, index=False, encoding='utf-8-sig')
-        else:
-            # File không tồn tại thì tạo mới
-            new_df.to_csv(file_path, mode='w', header=True, index=False, encoding='utf-8-sig')
+        # Thêm 1 dòng vào kho kết quả (O(1)), dòng mới nhất sẽ nằm ở đầu khi đọc
+        append_result(file_path, new_row)
 
-        return True, f"Đã lưu vào {file_path}"
+        return True, f"Đã lưu vào kho kết quả {get_store_path(file_path)}"
 
     except Exception as e:
-        return False, f"Lỗi lưu file: {str(e)}"
+        return False, f"Lỗi lưu kho kết quả: {str(e)}"
 
 
 if __name__ == "__main__":
-    # Chạy thử batch process khi gọi file này
-    process_batch_anomalies(input_path=INPUT_DATA_FILE)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Chấm điểm bất thường cả file / fit bộ phát hiện kết hợp")
+    parser.add_argument('--input', default=INPUT_DATA_FILE)
+    parser.add_argument('--fit-detectors', action='store_true',
+                        help="Fit bộ phát hiện kết hợp trên --input và lưu vào model LATEST (không chạy batch)")
+    parser.add_argument('--incremental', action='store_true', help="Chỉ chấm tin mới/đã sửa so với lần chạy trước")
+    args = parser.parse_args()
+
+    if args.fit_detectors:
+        train_anomaly_detectors(args.input)
+    else:
+        # Chạy thử batch process khi gọi file này
+        process_batch_anomalies(input_path=args.input, incremental=args.incremental)
\ No newline at end of file
@@ -1,29 +1,87 @@
 import numpy as np
 import pandas as pd
 import pickle
+import hashlib
+import json
 import warnings
+import os
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from sklearn.model_selection import KFold
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from xgboost import XGBRegressor
 
+from luu_mo_hinh import save_artifact, load_artifact, read_manifest
+from kho_ket_qua import read_results
+from cache_dac_trung import source_hash, load_cached, save_cached, FEATURE_CACHE_DIR
+from chuan_hoa_van_ban import TextNormalizer, TEXT_NORMALIZATION_VERSION
+from do_hieu_nang import stage
+from nap_du_lieu import load_listings
+from dia_chi import extract_location, extract_province, resolve_locations, UNKNOWN_PROVINCE
+from nguong_bat_thuong import build_threshold_table
+
 warnings.filterwarnings('ignore')
 
-PRICE_MODEL_PATH = 'price_model.pkl'
+# Thư mục artifact model theo phiên bản (xem luu_mo_hinh)
+PRICE_MODEL_PATH = 'price_model'
+# File pickle cũ (chỉ dùng khi chưa có artifact)
+LEGACY_PRICE_MODEL_PATH = 'price_model.pkl'
 
+# Các cột phân loại (thứ tự khớp với features_list của model)
+CATEGORICAL_COLS = ['Thương hiệu', 'Dòng xe', 'Loại xe', 'Dung tích xe', 'Xuất xứ', 'khu_vuc', 'Tình trạng']
 
-def extract_location(address):
-    """Phân nhóm vùng miền từ địa chỉ"""
-    address = str(address).lower()
-    if 'hồ chí minh' in address or 'hcm' in address:
-        return 'TP.HCM'
-    elif 'hà nội' in address:
-        return 'Hà Nội'
-    elif 'đà nẵng' in address:
-        return 'Đà Nẵng'
-    elif 'bình dương' in address or 'đồng nai' in address:
-        return 'Miền Nam (Lân cận)'
-    else:
-        return 'Tỉnh thành khác'
+# Từ khóa nhận diện tính năng trong Tiêu đề + Mô tả
+TECH_KEYWORDS = {
+    'has_abs': ['abs'],
+    'has_smartkey': ['smartkey', 'smart key', 'khoá thông minh'],
+    'is_chinh_chu': ['chính chủ'],
+    'is_zin': ['zin', 'nguyên bản'],
+}
+
+# Năm hiện tại để tính tuổi xe
+CURRENT_YEAR = 2025
+
+# Tham số XGBoost khi train (train tăng cường dùng cùng learning_rate/max_depth)
+PRICE_MODEL_PARAMS = {'n_estimators': 300, 'learning_rate': 0.04, 'max_depth': 6, 'random_state': 42}
+
+# Danh sách Features dùng để train (đúng thứ tự cột của ma trận input)
+PRICE_FEATURES = [
+    'Số Km đã đi', 'tuoi_xe',
+    'has_abs', 'has_smartkey', 'is_chinh_chu',
+    'Thương hiệu_encoded', 'Dòng xe_encoded',
+    'Loại xe_encoded', 'Dung tích xe_encoded',
+    'Xuất xứ_encoded', 'khu_vuc_encoded',
+    'Tình trạng_encoded'
+]
+
+# Feature tỉnh/thành (chi tiết hơn khu_vuc, xem dia_chi): chỉ dùng khi train với use_province=True,
+# thêm vào cuối features_list. Model không có feature này thì bỏ qua.
+PROVINCE_COL = 'tinh_thanh'
+PROVINCE_FEATURE = f'{PROVINCE_COL}_encoded'
+
+# Tăng khi đổi cách tiền xử lý/encode: cache đặc trưng cũ (xem cache_dac_trung) sẽ không được dùng nữa
+FEATURE_CACHE_VERSION = 2
+
+# Train tăng cường: kho các tin đã được duyệt (du_bao_bat_thuong.OUTPUT_NORMAL_FILE) và số cây thêm mỗi lần
+APPROVED_LISTINGS_FILE = 'ket_qua_binh_thuong.csv'
+INCREMENTAL_N_TREES = 50
+
+# Ngưỡng bất thường theo phân khúc: số fold khi tính dự đoán out-of-fold trên dữ liệu train
+THRESHOLD_CV_FOLDS = 5
+
+# Các cột dữ liệu gốc mà tiền xử lý dùng (train chỉ đọc các cột này)
+PRICE_INPUT_COLUMNS = ['Giá', 'Thương hiệu', 'Dòng xe', 'Năm đăng ký', 'Số Km đã đi',
+                       'Loại xe', 'Dung tích xe', 'Xuất xứ', 'Địa chỉ', 'Tình trạng',
+                       'Tiêu đề', 'Mô tả chi tiết']
+
+# Mã cho giá trị chưa gặp khi train (= mã của classes_[0], giữ nguyên hành vi cũ của safe_encode)
+UNKNOWN_CATEGORY_CODE = 0
+
+# Các trường bắt buộc của input_dict (Địa chỉ, has_abs, has_smartkey, is_chinh_chu là tùy chọn)
+REQUIRED_INPUT_FIELDS = ['Thương hiệu', 'Dòng xe', 'Loại xe', 'Dung tích xe', 'Xuất xứ', 'nam', 'Số Km đã đi',
+                         'Tình trạng']
 
 
 def extract_tech_features(row):
@@ -31,49 +89,210 @@ def extract_tech_features(row):
     text = str(row.get('Tiêu đề', '')) + " " + str(row.get('Mô tả chi tiết', ''))
     text = text.lower()
 
-    features = {
-        'has_abs': 1 if 'abs' in text else 0,
-        'has_smartkey': 1 if any(x in text for x in ['smartkey', 'smart key', 'khoá thông minh']) else 0,
-        'is_chinh_chu': 1 if 'chính chủ' in text else 0,
-        'is_zin': 1 if 'zin' in text or 'nguyên bản' in text else 0
-    }
+    features = {name: 1 if any(x in text for x in keywords) else 0
+                for name, keywords in TECH_KEYWORDS.items()}
     return pd.Series(features)
 
 
-def preprocess_price_data(df):
-    """Tiền xử lý nâng cao"""
-    # 1. Chọn các cột cần thiết
-    cols = ['Giá', 'Thương hiệu', 'Dòng xe', 'Năm đăng ký', 'Số Km đã đi',
-            'Loại xe', 'Dung tích xe', 'Xuất xứ', 'Địa chỉ', 'Tình trạng',
-            'Tiêu đề', 'Mô tả chi tiết']
+@lru_cache(maxsize=1)
+def _tech_text_normalizer():
+    """Bộ chuẩn hóa văn bản cho TECH_KEYWORDS (các từ trong từ khóa không bị bỏ/dịch) + regex của từng cờ"""
+    normalizer = TextNormalizer(protected_words=[w for keywords in TECH_KEYWORDS.values()
+                                                 for keyword in keywords for w in keyword.split()])
+    patterns = {name: normalizer.keyword_pattern(keywords) for name, keywords in TECH_KEYWORDS.items()}
+    return normalizer, patterns
+
+
+def extract_tech_features_batch(df, flag_dtype='int64', normalize_text=False):
+    """
+    Trích xuất tính năng từ Tiêu đề và Mô tả cho cả DataFrame (vector hóa theo cột).
+    flag_dtype: kiểu của các cột cờ 0/1 ('int8' ở chế độ tiết kiệm bộ nhớ).
+    normalize_text=True: so khớp trên văn bản đã chuẩn hóa, không dấu (xem chuan_hoa_van_ban):
+    nhận ra cả 'khoá tm', 'chinh chu'...; False: tìm chuỗi con trên chữ thường như cũ.
+    """
+    def text_col(name, missing):
+        if name not in df.columns:
+            return pd.Series('', index=df.index, dtype=object)
+        values = df[name].astype(object)
+        return values.where(values.notna(), missing).astype(str)
+
+    features = {}
+    if normalize_text:
+        normalizer, patterns = _tech_text_normalizer()
+        text = normalizer.match_form_column(text_col('Tiêu đề', '') + " " + text_col('Mô tả chi tiết', ''))
+        for name, pattern in patterns.items():
+            features[name] = text.str.contains(pattern).astype(flag_dtype)
+        return pd.DataFrame(features, index=df.index)
+
+    text = (text_col('Tiêu đề', 'nan') + " " + text_col('Mô tả chi tiết', 'nan')).str.lower()
+    for name, keywords in TECH_KEYWORDS.items():
+        pattern = '|'.join(re.escape(x) for x in keywords)
+        features[name] = text.str.contains(pattern, regex=True).astype(flag_dtype)
+    return pd.DataFrame(features, index=df.index)
+
+
+def build_category_tables(encoders):
+    """Tạo bảng tra cứu {giá trị: mã} cho từng cột phân loại từ các LabelEncoder"""
+    return {col: {str(val): code for code, val in enumerate(le.classes_)}
+            for col, le in encoders.items()}
+
+
+def get_category_tables(resources):
+    """Lấy bảng tra cứu từ resources, tạo một lần nếu model cũ chưa có"""
+    if 'category_tables' not in resources:
+        resources['category_tables'] = build_category_tables(resources['encoders'])
+    return resources['category_tables']
+
+
+def model_categorical_cols(resources):
+    """Các cột phân loại model cần encode (thêm tỉnh/thành nếu model có feature này)"""
+    if PROVINCE_FEATURE in resources['features_list']:
+        return CATEGORICAL_COLS + [PROVINCE_COL]
+    return CATEGORICAL_COLS
+
+
+def load_price_model(path=PRICE_MODEL_PATH):
+    """
+    Load model: ưu tiên thư mục artifact (booster native + JSON, load lười),
+    nếu chưa có thì đọc file pickle cũ và chuẩn bị sẵn bảng tra cứu phân loại.
+    """
+    if os.path.isdir(path):
+        return load_artifact(path)
+    if path == PRICE_MODEL_PATH and not os.path.exists(path):
+        path = LEGACY_PRICE_MODEL_PATH
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    resources = pickle.loads(raw)
+    get_category_tables(resources)
+    resources['model_version'] = _pickle_model_version(raw)
+    return resources
+
+
+def _pickle_model_version(raw):
+    return 'pkl-' + hashlib.sha256(raw).hexdigest()[:12]
+
+
+def get_model_version(path=PRICE_MODEL_PATH):
+    """
+    Mã phiên bản của model đang được trỏ tới (đọc manifest, không load model).
+    Dùng làm khóa cache: đổi khi có artifact mới. None nếu chưa có model.
+    """
+    try:
+        if os.path.isdir(path):
+            return read_manifest(path)['model_version']
+        if path == PRICE_MODEL_PATH and not os.path.exists(path):
+            path = LEGACY_PRICE_MODEL_PATH
+        with open(path, 'rb') as f:
+            return _pickle_model_version(f.read())
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def export_price_artifact(resources, root=PRICE_MODEL_PATH, extra=None):
+    """Ghi resources (model vừa train hoặc pickle cũ) thành phiên bản artifact mới"""
+    scaler_mean = resources.get('scaler_mean')
+    scaler_scale = resources.get('scaler_scale')
+    if 'scaler' in resources:
+        scaler_mean, scaler_scale = resources['scaler'].mean_, resources['scaler'].scale_
+
+    return save_artifact(root, resources['model'], resources['features_list'], get_category_tables(resources),
+                         scaler_mean=scaler_mean, scaler_scale=scaler_scale,
+                         brand_models=resources.get('brand_models'),
+                         text_normalization=resources.get('text_normalization'),
+                         anomaly_thresholds=resources.get('anomaly_thresholds'), extra=extra)
+
+
+def convert_legacy_model(pkl_path=LEGACY_PRICE_MODEL_PATH, data_path=None, root=PRICE_MODEL_PATH):
+    """
+    Chuyển pickle cũ thành phiên bản artifact mới. Pickle không lưu cặp hãng - dòng xe:
+    data_path (dữ liệu đã dùng để train) có thì tính brand_models từ đó cho danh mục GUI.
+    """
+    resources = load_price_model(pkl_path)
+    if data_path:
+        resources['brand_models'] = load_training_features(data_path)['brand_models']
+    return export_price_artifact(resources, root)
+
+
+def scale_features(X, resources):
+    """Chuẩn hóa ma trận feature như StandardScaler.transform (nếu model có scaler)"""
+    if 'scaler_mean' in resources:
+        return (X - resources['scaler_mean']) / resources['scaler_scale']
+    if 'scaler' in resources:
+        return resources['scaler'].transform(X)
+    return X
+
+
+def build_brand_models(df):
+    """Các cặp Thương hiệu -> [Dòng xe] có trong dữ liệu (đã sắp xếp)"""
+    pairs = df[['Thương hiệu', 'Dòng xe']].fillna('Unknown').astype(str).drop_duplicates()
+    return {brand: sorted(group['Dòng xe']) for brand, group in pairs.groupby('Thương hiệu')}
 
-    df = df[[c for c in cols if c in df.columns]].copy()
+
+# Giá trị giữ chỗ trong bảng mã, không hiển thị cho người dùng chọn
+VOCABULARY_PLACEHOLDERS = {'Unknown', 'nan'}
+
+
+def build_vocabulary(resources):
+    """
+    Danh mục cho form nhập liệu, lấy từ bảng mã của model (chỉ các giá trị model đã học):
+    {cột: [giá trị đã sắp xếp]} và 'brand_models': {hãng: [dòng xe hợp lệ]}.
+    """
+    tables = get_category_tables(resources)
+    vocabulary = {col: sorted(v for v in tables[col] if v not in VOCABULARY_PLACEHOLDERS)
+                  for col in CATEGORICAL_COLS if col != 'khu_vuc'}
+
+    known_models = set(vocabulary['Dòng xe'])
+    brand_models = resources.get('brand_models')
+    if brand_models:
+        vocabulary['brand_models'] = {
+            brand: [m for m in models if m in known_models]
+            for brand, models in brand_models.items() if brand in vocabulary['Thương hiệu']
+        }
+    else:
+        # Model cũ không lưu cặp hãng - dòng xe: mọi dòng xe đều hợp lệ
+        vocabulary['brand_models'] = {brand: vocabulary['Dòng xe'] for brand in vocabulary['Thương hiệu']}
+    return vocabulary
+
+
+def preprocess_price_data(df, low_memory=False, normalize_text=True):
+    """
+    Tiền xử lý nâng cao.
+    low_memory=True: cột phân loại/địa chỉ dạng category, cờ 0/1 dạng int8 (kết quả encode không đổi).
+    normalize_text: chuẩn hóa Tiêu đề + Mô tả trước khi tìm từ khóa (xem extract_tech_features_batch).
+    """
+    # 1. Chọn các cột cần thiết (chọn theo danh sách cột đã tạo DataFrame mới, không cần copy thêm)
+    df = df[[c for c in PRICE_INPUT_COLUMNS if c in df.columns]]
+    if low_memory:
+        for col in CATEGORICAL_COLS + ['Địa chỉ']:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
 
     # 2. Xử lý Giá
-    if 'Giá' in df.columns and df['Giá'].dtype == 'object':
+    if 'Giá' in df.columns and not pd.api.types.is_numeric_dtype(df['Giá']):
         df['Giá'] = (df['Giá'].str.replace(" đ", "", regex=False)
                      .str.replace(".", "", regex=False)
                      .replace(",", ".", regex=False)
                      .astype(float)) / 1000000
 
     # 3. Xử lý Năm & Tuổi xe
-    current_year = 2025
     if 'Năm đăng ký' in df.columns:
         df['nam'] = pd.to_numeric(df['Năm đăng ký'], errors='coerce')
         df['nam'] = df['nam'].fillna(df['nam'].median())
         # Tạo feature Tuổi xe
-        df['tuoi_xe'] = current_year - df['nam']
+        df['tuoi_xe'] = CURRENT_YEAR - df['nam']
         df['tuoi_xe'] = df['tuoi_xe'].apply(lambda x: max(0, x))
 
     # 4. Feature Engineering từ Text (ABS, Smartkey...)
-    tech_feats = df.apply(extract_tech_features, axis=1)
+    tech_feats = extract_tech_features_batch(df, 'int8' if low_memory else 'int64', normalize_text)
     df = pd.concat([df, tech_feats], axis=1)
 
-    # 5. Xử lý Địa điểm
+    # 5. Xử lý Địa điểm (khu vực + tỉnh/thành, chỉ tính trên các địa chỉ khác nhau)
     if 'Địa chỉ' in df.columns:
-        df['khu_vuc'] = df['Địa chỉ'].apply(extract_location)
+        df['khu_vuc'], df[PROVINCE_COL] = resolve_locations(df['Địa chỉ'])
     else:
         df['khu_vuc'] = 'Tỉnh thành khác'
+        df[PROVINCE_COL] = UNKNOWN_PROVINCE
 
     # 6. Lọc rác & Outliers
     if len(df) > 1:
@@ -88,71 +307,286 @@ def preprocess_price_data(df):
         mean_log = df['log_gia'].mean()
         std_log = df['log_gia'].std()
         df = df[(df["log_gia"] < mean_log + 3 * std_log) &
-                (df["log_gia"] > mean_log - 3 * std_log)].copy()
+                (df["log_gia"] > mean_log - 3 * std_log)]
 
     return df
 
 
-def train_price_model(data_path):
-    print("--- [PRICE] Đang huấn luyện mô hình dự báo giá (Nâng cao)... ---")
-    try:
-        df_raw = pd.read_csv(data_path)
-    except:
-        df_raw = pd.read_excel(data_path)
+def read_listings(data_path, columns=None, filters=None):
+    """Đọc file dữ liệu tin đăng (.csv, Excel hoặc Parquet; file Excel đọc qua Parquet, xem nap_du_lieu)"""
+    return load_listings(data_path, columns, filters)
 
-    df = preprocess_price_data(df_raw)
 
-    # Label Encoding cho các cột phân loại
-    categorical_cols = ['Thương hiệu', 'Dòng xe', 'Loại xe', 'Dung tích xe', 'Xuất xứ', 'khu_vuc', 'Tình trạng']
-    encoders = {}
+def _fill_unknown(series):
+    """fillna('Unknown'), kể cả với cột category chưa có giá trị 'Unknown'"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and 'Unknown' not in series.cat.categories:
+        series = series.cat.add_categories('Unknown')
+    return series.fillna('Unknown')
 
-    for col in categorical_cols:
-        # Fill NA trước khi encode
-        df[col] = df[col].fillna('Unknown')
-        le = LabelEncoder()
-        df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
-        encoders[col] = le
-
-    # Danh sách Features dùng để train
-    features = [
-        'Số Km đã đi', 'tuoi_xe',
-        'has_abs', 'has_smartkey', 'is_chinh_chu',
-        'Thương hiệu_encoded', 'Dòng xe_encoded',
-        'Loại xe_encoded', 'Dung tích xe_encoded',
-        'Xuất xứ_encoded', 'khu_vuc_encoded',
-        'Tình trạng_encoded'
-    ]
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(df[features])
-    y = df['log_gia']
+def price_features(use_province=False):
+    """Danh sách feature khi train (use_province: thêm feature tỉnh/thành vào cuối)"""
+    return PRICE_FEATURES + [PROVINCE_FEATURE] if use_province else PRICE_FEATURES
 
-    # Tăng nhẹ complexity của model
-    model = XGBRegressor(n_estimators=300, learning_rate=0.04, max_depth=6, random_state=42)
-    model.fit(X_scaled, y)
 
-    resources = {
-        'model': model,
-        'scaler': scaler,
-        'encoders': encoders,
-        'features_list': features
-    }
+def build_training_features(df_raw, low_memory=False, use_province=False):
+    """
+    Tiền xử lý + Label Encoding dữ liệu thô.
+    Trả về dict: X (feature gốc theo price_features(use_province)), y (log giá), category_tables, brand_models.
+    low_memory: xem preprocess_price_data (kết quả giống hệt).
+    """
+    with stage('tien_xu_ly', rows=len(df_raw)):
+        df = preprocess_price_data(df_raw, low_memory)
 
-    with open(PRICE_MODEL_PATH, 'wb') as f:
-        pickle.dump(resources, f)
-    print(f"--- [PRICE] Đã lưu model với {len(features)} đặc trưng ---")
+    # Label Encoding cho các cột phân loại
+    encoders = {}
 
+    with stage('encode', rows=len(df)):
+        for col in CATEGORICAL_COLS + ([PROVINCE_COL] if use_province else []):
+            # Fill NA trước khi encode
+            df[col] = _fill_unknown(df[col])
+            le = LabelEncoder()
+            df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
+            encoders[col] = le
+
+        return {
+            'X': df[price_features(use_province)].to_numpy(dtype=float),
+            'y': df['log_gia'].to_numpy(dtype=float),
+            'category_tables': build_category_tables(encoders),
+            'brand_models': build_brand_models(df),
+        }
+
+
+def _feature_cache_salt(use_province=False):
+    """Cấu hình tiền xử lý đưa vào key cache: đổi cấu hình -> key mới"""
+    return json.dumps({'version': FEATURE_CACHE_VERSION, 'features': price_features(use_province),
+                       'categorical': CATEGORICAL_COLS, 'keywords': TECH_KEYWORDS,
+                       'text_normalization': TEXT_NORMALIZATION_VERSION},
+                      ensure_ascii=False, sort_keys=True)
+
+
+def load_training_features(data_path, use_cache=True, cache_dir=FEATURE_CACHE_DIR, low_memory=False,
+                           use_province=False):
+    """
+    build_training_features(data_path) có cache theo mã băm nội dung file:
+    lần sau cùng dữ liệu thì đọc X, y từ .npy (mmap), bỏ qua đọc file và tiền xử lý.
+    """
+    key = source_hash(data_path, _feature_cache_salt(use_province))
+    if use_cache:
+        with stage('doc_cache'):
+            cached = load_cached(key, cache_dir)
+        if cached is not None:
+            arrays, meta = cached
+            print(f"--- [PRICE] Dùng cache đặc trưng {key} ({len(arrays['y'])} dòng) ---")
+            return {
+                'X': arrays['X'],
+                'y': arrays['y'],
+                'category_tables': {col: {val: code for code, val in enumerate(values)}
+                                    for col, values in meta['category_tables'].items()},
+                'brand_models': meta['brand_models'],
+            }
+
+    with stage('doc_file'):
+        df_raw = read_listings(data_path, columns=PRICE_INPUT_COLUMNS)
+    features = build_training_features(df_raw, low_memory, use_province)
+    if use_cache:
+        meta = {
+            'source': os.path.basename(data_path),
+            'features_list': price_features(use_province),
+            'category_tables': {col: sorted(table, key=table.get)
+                                for col, table in features['category_tables'].items()},
+            'brand_models': features['brand_models'],
+        }
+        with stage('ghi_cache'):
+            save_cached(key, {'X': features['X'], 'y': features['y']}, meta, cache_dir)
+    return features
+
+
+def build_anomaly_thresholds(data, features, params=None, n_folds=THRESHOLD_CV_FOLDS, log_pred=None):
+    """
+    Bảng ngưỡng bất thường theo phân khúc (xem nguong_bat_thuong) từ sai số log(giá thực / giá dự đoán).
+    Giá dự đoán là out-of-fold (mỗi tin được dự đoán bởi model không train trên nó),
+    nên phân phối sai số giống với khi chấm tin mới.
+    log_pred: dự đoán out-of-fold (log1p giá) đã có sẵn, vd. từ tinh chỉnh -> không train thêm model.
+    Dòng có giá trị NaN (không thuộc fold kiểm tra nào) bị bỏ qua.
+    """
+    X, y = np.asarray(data['X']), np.asarray(data['y'])
+    if log_pred is None:
+        log_pred = np.empty_like(y)
+        for train_idx, val_idx in KFold(n_splits=n_folds, shuffle=True, random_state=42).split(X):
+            fold_model = XGBRegressor(**(params or PRICE_MODEL_PARAMS))
+            fold_model.fit(X[train_idx], y[train_idx])
+            log_pred[val_idx] = fold_model.predict(X[val_idx])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residuals = np.log(np.expm1(y)) - np.log(np.expm1(log_pred))
+
+    def decode(col):
+        table = data['category_tables'][col]
+        values = np.array(sorted(table, key=table.get), dtype=object)
+        return values[X[:, features.index(f'{col}_encoded')].astype(int)]
+
+    return build_threshold_table(decode('Thương hiệu'), decode('Dòng xe'), X[:, features.index('tuoi_xe')],
+                                 residuals)
+
+
+def train_price_model(data_path, use_scaler=True, use_cache=True, root=PRICE_MODEL_PATH, params=None, extra=None,
+                      low_memory=False, use_province=False, anomaly_thresholds=True):
+    """
+    Huấn luyện model giá và lưu thành phiên bản artifact mới. Trả về thư mục phiên bản.
+    use_scaler=False: train trực tiếp trên feature gốc (cây quyết định không cần chuẩn hóa),
+    khi dự đoán không phải chạy bước scale.
+    use_cache=False: luôn đọc lại file và tiền xử lý (không dùng/ghi cache đặc trưng).
+    params: tham số XGBoost (mặc định PRICE_MODEL_PARAMS), extra: thông tin thêm ghi vào manifest.
+    low_memory: tiền xử lý với kiểu dữ liệu tiết kiệm bộ nhớ (xem preprocess_price_data).
+    use_province: thêm feature tỉnh/thành (PROVINCE_FEATURE) bên cạnh khu_vuc.
+    anomaly_thresholds: tính và lưu kèm ngưỡng bất thường theo phân khúc (train thêm THRESHOLD_CV_FOLDS model);
+    truyền bảng ngưỡng đã tính sẵn (dict) để lưu luôn mà không train thêm.
+    """
+    print("--- [PRICE] Đang huấn luyện mô hình dự báo giá (Nâng cao)... ---")
+    with stage('dac_trung'):
+        data = load_training_features(data_path, use_cache, low_memory=low_memory, use_province=use_province)
+    features = price_features(use_province)
+
+    with stage('train', rows=len(data['y'])):
+        if use_scaler:
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(data['X'])
+        else:
+            X_scaled = data['X']
+        y = data['y']
+
+        # Tăng nhẹ complexity của model
+        model = XGBRegressor(**(params or PRICE_MODEL_PARAMS))
+        model.fit(X_scaled, y)
 
-def predict_price_value(input_dict, resources):
-    """Hàm dự đoán giá gọi từ UI (Cập nhật nhận input mới)"""
-    encoders = resources['encoders']
-    current_year = 2025
+    resources = {
+        'model': model,
+        'category_tables': data['category_tables'],
+        'brand_models': data['brand_models'],
+        'features_list': features,
+        'text_normalization': TEXT_NORMALIZATION_VERSION,
+    }
+    if use_scaler:
+        resources['scaler'] = scaler
+    if isinstance(anomaly_thresholds, dict):
+        resources['anomaly_thresholds'] = anomaly_thresholds
+    elif anomaly_thresholds:
+        with stage('nguong_bat_thuong'):
+            resources['anomaly_thresholds'] = build_anomaly_thresholds(data, features, params)
+
+    with stage('luu_artifact'):
+        version_dir = export_price_artifact(resources, root, extra)
+    print(f"--- [PRICE] Đã lưu model với {len(features)} đặc trưng tại {version_dir} ---")
+    return version_dir
+
+
+# =============================================================================
+# TRAIN TĂNG CƯỜNG (thêm cây mới trên dữ liệu mới, không train lại từ đầu)
+# =============================================================================
+
+def extend_category_tables(tables, df):
+    """
+    Thêm các giá trị chưa có vào CUỐI bảng mã (mã cũ giữ nguyên, cây cũ vẫn đúng).
+    Trả về (bảng mã mới, {cột: [giá trị mới]}).
+    """
+    extended, added = {}, {}
+    for col, table in tables.items():
+        new_values = sorted(set(df[col].astype(str)) - set(table))
+        extended[col] = {**table, **{val: len(table) + i for i, val in enumerate(new_values)}}
+        if new_values:
+            added[col] = new_values
+    return extended, added
+
+
+def load_approved_listings(file_path=APPROVED_LISTINGS_FILE, after_id=0):
+    """
+    Đọc các tin đã duyệt có ma_ban_ghi > after_id từ kho kết quả (cũ trước, mới sau).
+    Giá lấy từ cột Gia_Thuc_Te_Trieu (đã là triệu đồng). Trả về (DataFrame, ma_ban_ghi lớn nhất).
+    """
+    df = read_results(file_path).sort_index()
+    df = df[df.index > after_id]
+    if 'Gia_Thuc_Te_Trieu' in df.columns:
+        df['Giá'] = pd.to_numeric(df['Gia_Thuc_Te_Trieu'], errors='coerce')
+    last_id = int(df.index.max()) if len(df) else after_id
+    return df, last_id
+
+
+def update_price_model(df_new, root=PRICE_MODEL_PATH, n_new_trees=INCREMENTAL_N_TREES, extra=None):
+    """
+    Train tăng cường model hiện tại (phiên bản LATEST trong root) trên df_new (dữ liệu thô như data_motobikes):
+    mở rộng bảng mã, boost thêm n_new_trees cây từ booster cũ, ghi phiên bản artifact mới.
+    Trả về đường dẫn thư mục phiên bản mới.
+    """
+    resources = load_price_model(root)
+    # Tìm từ khóa giống lúc train model gốc (có/không chuẩn hóa văn bản)
+    df = preprocess_price_data(df_new, normalize_text=bool(resources.get('text_normalization')))
+    if len(df) < 2 or 'log_gia' not in df.columns:
+        raise ValueError(f"Cần ít nhất 2 tin mới hợp lệ để train tăng cường (có {len(df)})")
+
+    categorical_cols = model_categorical_cols(resources)
+    for col in categorical_cols:
+        df[col] = df[col].astype(object).fillna('Unknown').astype(str)
+    tables, added = extend_category_tables(get_category_tables(resources), df)
+    for col in categorical_cols:
+        df[f'{col}_encoded'] = df[col].map(tables[col])
+
+    features = resources['features_list']
+    # Scaler (nếu có) giữ nguyên như lúc train đầu: cây cũ đã học trên thang đo này
+    X = scale_features(df[features].to_numpy(dtype=float), resources)
+
+    params = {**PRICE_MODEL_PARAMS, 'n_estimators': n_new_trees}
+    model = XGBRegressor(**params)
+    model.fit(X, df['log_gia'], xgb_model=resources['model'].get_booster())
+
+    brand_models = resources.get('brand_models')
+    if brand_models is not None:
+        brand_models = dict(brand_models)
+        for brand, models in build_brand_models(df).items():
+            brand_models[brand] = sorted(set(brand_models.get(brand, [])) | set(models))
+
+    new_resources = {'model': model, 'features_list': features, 'category_tables': tables,
+                     'brand_models': brand_models}
+    for key in ['scaler', 'scaler_mean', 'scaler_scale', 'text_normalization', 'anomaly_thresholds']:
+        if key in resources:
+            new_resources[key] = resources[key]
+
+    info = {'parent_version': resources.get('artifact_version'), 'rows': len(df), 'new_trees': n_new_trees,
+            'new_categories': added, **(extra or {})}
+    return export_price_artifact(new_resources, root, extra={'incremental': info})
+
+
+def train_price_model_incremental(store_path=APPROVED_LISTINGS_FILE, root=PRICE_MODEL_PATH,
+                                  n_new_trees=INCREMENTAL_N_TREES):
+    """
+    Train tăng cường từ các tin đã duyệt trong kho (move_to_normal / save_normal_to_csv).
+    Chỉ dùng các tin thêm vào SAU lần train tăng cường trước (mốc ma_ban_ghi lưu trong manifest).
+    """
+    print("--- [PRICE] Đang train tăng cường từ các tin đã duyệt... ---")
+    previous = read_manifest(root).get('incremental') or {}
+    after_id = previous.get('last_id', 0) if previous.get('source') == store_path else 0
+
+    df_new, last_id = load_approved_listings(store_path, after_id)
+    if df_new.empty:
+        print("--- [PRICE] Không có tin mới kể từ lần train trước ---")
+        return None
+
+    version_dir = update_price_model(df_new, root, n_new_trees,
+                                     extra={'source': store_path, 'last_id': last_id})
+    print(f"--- [PRICE] Đã train thêm {n_new_trees} cây trên {len(df_new)} tin mới, lưu tại {version_dir} ---")
+    return version_dir
+
+
+def encode_input(input_dict, resources):
+    """Vector feature GỐC (chưa scale) của một input_dict, đúng thứ tự features_list"""
+    tables = get_category_tables(resources)
 
     # 1. Tính toán các feature dẫn xuất từ input
-    tuoi_xe = max(0, current_year - input_dict['nam'])
+    tuoi_xe = max(0, CURRENT_YEAR - input_dict['nam'])
 
     # Map địa chỉ sang khu vực
-    khu_vuc = extract_location(input_dict.get('Địa chỉ', ''))
+    address = input_dict.get('Địa chỉ', '')
+    khu_vuc = extract_location(address)
 
     # 2. Xây dựng vector input
 
@@ -169,11 +603,7 @@ def predict_price_value(input_dict, resources):
 
     # --- Nhóm Phân loại ---
     def safe_encode(col_name, val):
-        val = str(val)
-        try:
-            return encoders[col_name].transform([val])[0]
-        except:
-            return encoders[col_name].transform([encoders[col_name].classes_[0]])[0]
+        return tables[col_name].get(str(val), UNKNOWN_CATEGORY_CODE)
 
     encoded_input.append(safe_encode('Thương hiệu', input_dict['Thương hiệu']))
     encoded_input.append(safe_encode('Dòng xe', input_dict['Dòng xe']))
@@ -182,19 +612,327 @@ def predict_price_value(input_dict, resources):
     encoded_input.append(safe_encode('Xuất xứ', input_dict['Xuất xứ']))
     encoded_input.append(safe_encode('khu_vuc', khu_vuc))
     encoded_input.append(safe_encode('Tình trạng', input_dict['Tình trạng']))
+    if PROVINCE_FEATURE in resources['features_list']:
+        encoded_input.append(safe_encode(PROVINCE_COL, extract_province(address)))
+    return encoded_input
 
-    # 3. Predict
-    X_in = np.array(encoded_input).reshape(1, -1)
 
-    if 'scaler' in resources:
-        X_scaled = resources['scaler'].transform(X_in)
-    else:
-        X_scaled = X_in
+def predict_price_value(input_dict, resources):
+    """Hàm dự đoán giá gọi từ UI (Cập nhật nhận input mới)"""
+    X_in = np.array(encode_input(input_dict, resources)).reshape(1, -1)
+
+    X_scaled = scale_features(X_in, resources)
 
     log_price = resources['model'].predict(X_scaled)[0]
     return np.expm1(log_price)
 
 
+# =============================================================================
+# CACHE DỰ ĐOÁN (cho GUI: mỗi lần rerun không phải gọi lại model nếu input không đổi)
+# =============================================================================
+
+def normalize_input_key(input_dict):
+    """Khóa cache từ input_dict: các giá trị đã chuẩn hóa đúng như predict_price_value sử dụng"""
+    return (
+        str(input_dict['Thương hiệu']), str(input_dict['Dòng xe']), str(input_dict['Loại xe']),
+        str(input_dict['Dung tích xe']), str(input_dict['Xuất xứ']), str(input_dict['Tình trạng']),
+        float(input_dict['nam']), float(input_dict['Số Km đã đi']),
+        str(input_dict.get('Địa chỉ', '')).strip(),
+        int(input_dict.get('has_abs', 0)), int(input_dict.get('has_smartkey', 0)),
+        int(input_dict.get('is_chinh_chu', 0)),
+    )
+
+
+class PredictionCache:
+    """
+    LRU cache (giới hạn maxsize) cho predict_price_value, an toàn khi nhiều phiên dùng chung.
+    Tự xóa toàn bộ khi model_version của resources thay đổi.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._model_version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, input_dict, resources):
+        key = normalize_input_key(input_dict)
+        version = resources.get('model_version')
+
+        with self._lock:
+            if version != self._model_version:
+                self._data.clear()
+                self._model_version = version
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        price = predict_price_value(input_dict, resources)
+
+        with self._lock:
+            if version == self._model_version:
+                self._data[key] = price
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return price
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                    'maxsize': self.maxsize, 'hit_rate': self.hits / total if total else 0.0}
+
+
+def _as_str_values(series):
+    """Chuyển cột sang mảng chuỗi giống str(val) của từng dòng (NaN -> 'nan')"""
+    values = series.astype(object)
+    return values.where(values.notna(), 'nan').astype(str).to_numpy(dtype=object)
+
+
+def _encode_values(table, values):
+    """Encode cả mảng bằng bảng tra cứu, giá trị lạ nhận UNKNOWN_CATEGORY_CODE"""
+    codes = pd.Series(values).map(table)
+    return codes.fillna(UNKNOWN_CATEGORY_CODE).to_numpy(dtype=float)
+
+
+def _encode_column(table, series):
+    """Encode một cột; cột category chỉ tra cứu các giá trị khác nhau rồi lấy theo mã"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        category_codes = _encode_values(table, _as_str_values(pd.Series(series.cat.categories)))
+        # Mã -1 (NaN) lấy phần tử cuối: mã của 'nan' như str(NaN) khi encode từng dòng
+        category_codes = np.append(category_codes, table.get('nan', UNKNOWN_CATEGORY_CODE))
+        return category_codes[series.cat.codes.to_numpy()]
+    return _encode_values(table, _as_str_values(series))
+
+
+def build_feature_matrix(df_input, resources, dtype=float):
+    """
+    Tạo ma trận feature GỐC (chưa scale) theo đúng thứ tự features_list
+    từ DataFrame có các cột giống input_dict của predict_price_value.
+    dtype=np.float32: nửa bộ nhớ, dùng khi model không cần scale (XGBoost vốn đọc dữ liệu dạng float32).
+    """
+    tables = get_category_tables(resources)
+
+    def get_col(name, default):
+        if name in df_input.columns:
+            return df_input[name]
+        return pd.Series(default, index=df_input.index)
+
+    # 1. Feature dẫn xuất
+    nam = pd.to_numeric(get_col('nam', np.nan), errors='coerce').to_numpy(dtype=float)
+    tuoi_xe = np.fmax(0, CURRENT_YEAR - nam)  # fmax: NaN -> 0, giống max(0, nan)
+
+    # Khu vực + tỉnh/thành: mỗi địa chỉ khác nhau chỉ tra một lần
+    locations = dict(zip(['khu_vuc', PROVINCE_COL], resolve_locations(get_col('Địa chỉ', ''))))
+
+    # 2. Xây dựng ma trận input (đúng thứ tự features_list)
+    columns = [
+        pd.to_numeric(get_col('Số Km đã đi', 0), errors='coerce').to_numpy(dtype=float),
+        tuoi_xe,
+    ]
+    for flag in ['has_abs', 'has_smartkey', 'is_chinh_chu']:
+        columns.append(get_col(flag, 0).fillna(0).astype(int).to_numpy(dtype=float))
+
+    for col in model_categorical_cols(resources):
+        source = locations[col] if col in locations else get_col(col, 'Unknown')
+        columns.append(_encode_column(tables[col], source))
+
+    X = np.empty((len(df_input), len(columns)), dtype=dtype)
+    for j, values in enumerate(columns):
+        X[:, j] = values
+    return X
+
+
+def predict_price_rows(input_dicts, resources):
+    """
+    Dự đoán cho một danh sách input_dict bằng MỘT lần gọi model.
+    Encode từng dict bằng encode_input (như predict_price_value), không qua pandas:
+    nhanh hơn predict_price_batch với lô nhỏ (vài chục tin).
+    """
+    if len(input_dicts) == 0:
+        return np.array([], dtype=np.float32)
+
+    return predict_encoded_rows(np.array([encode_input(d, resources) for d in input_dicts]), resources)
+
+
+def predict_encoded_rows(X_in, resources):
+    """Dự đoán từ ma trận feature GỐC (mỗi dòng là kết quả encode_input), một lần gọi model"""
+    X_scaled = scale_features(X_in, resources)
+
+    log_price = resources['model'].predict(X_scaled)
+    return np.expm1(log_price)
+
+
+def predict_price_batch(df_input, resources):
+    """
+    Dự đoán giá cho cả DataFrame (mỗi dòng có các cột giống input_dict của predict_price_value).
+    Encode, scale và gọi model.predict MỘT lần cho cả ma trận.
+    Trả về mảng giá (triệu đồng) theo thứ tự dòng, khớp với gọi predict_price_value từng dòng.
+    """
+    if len(df_input) == 0:
+        return np.array([], dtype=np.float32)
+
+    # Không có scaler: tạo thẳng ma trận float32 (kết quả giống hệt, XGBoost cũng ép về float32)
+    needs_scaling = 'scaler_mean' in resources or 'scaler' in resources
+    with stage('encode', rows=len(df_input)):
+        X_raw = build_feature_matrix(df_input, resources, dtype=float if needs_scaling else np.float32)
+
+    with stage('model_predict', rows=len(df_input)):
+        X_scaled = scale_features(X_raw, resources)
+        log_price = resources['model'].predict(X_scaled)
+    return np.expm1(log_price)
+
+
+# =============================================================================
+# GỘP SCALER VÀO NGƯỠNG CỦA CÂY (bỏ bước scale khi dự đoán)
+# =============================================================================
+
+def _float32_to_key(v):
+    """Ánh xạ float32 sang số nguyên giữ nguyên thứ tự (để chia đôi theo từng ulp)"""
+    bits = v.astype(np.float32).view(np.int32).astype(np.int64)
+    return np.where(bits >= 0, bits, -(bits & 0x7FFFFFFF))
+
+
+def _key_to_float32(key):
+    bits = np.where(key >= 0, key, (-key) | 0x80000000).astype(np.uint32)
+    return bits.view(np.float32)
+
+
+def _fold_thresholds(thresholds, mean, scale):
+    """
+    Cây train trên x_scaled = (x - mean) / scale rẽ nhánh theo float32(x_scaled) < t.
+    Ngưỡng mới t' là giá trị float32 NHỎ NHẤT thỏa float32((t' - mean) / scale) >= t,
+    khi đó với mọi x biểu diễn được bằng float32: float32(x) < t'  <=>  float32(x_scaled) < t.
+    Tìm t' bằng chia đôi trên thứ tự các giá trị float32 (tối đa ~32 vòng).
+    """
+    t = thresholds.astype(np.float32)
+
+    def reaches(key):
+        v = _key_to_float32(key).astype(np.float64)
+        return ((v - mean) / scale).astype(np.float32) >= t
+
+    # -inf luôn chưa thỏa, +inf luôn thỏa
+    lo = np.full(len(t), _float32_to_key(np.array([-np.inf]))[0])
+    hi = np.full(len(t), _float32_to_key(np.array([np.inf]))[0])
+    while np.any(hi - lo > 1):
+        mid = (lo + hi) // 2
+        ok = reaches(mid)
+        hi = np.where(ok, mid, hi)
+        lo = np.where(ok, lo, mid)
+    return _key_to_float32(hi)
+
+
+def fold_scaler_into_model(resources):
+    """
+    Tạo resources mới có ngưỡng tách của các cây đã được quy đổi về thang feature gốc,
+    không còn scaler. Dự đoán giống hệt model cũ (kiểm tra bằng check_prediction_parity).
+    """
+    if 'scaler_mean' in resources:
+        mean, scale = resources['scaler_mean'], resources['scaler_scale']
+    elif 'scaler' in resources:
+        mean, scale = resources['scaler'].mean_, resources['scaler'].scale_
+    else:
+        return resources
+
+    model_json = json.loads(resources['model'].get_booster().save_raw('json'))
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        # Nút lá cũng dùng split_conditions để lưu giá trị lá -> chỉ sửa nút có nhánh con
+        is_split = np.array(tree['left_children']) != -1
+        if not is_split.any():
+            continue
+        feature_idx = np.array(tree['split_indices'])[is_split]
+        conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        conditions[is_split] = _fold_thresholds(conditions[is_split], mean[feature_idx], scale[feature_idx])
+        tree['split_conditions'] = [float(x) for x in conditions]
+
+    folded_model = XGBRegressor()
+    folded_model.load_model(bytearray(json.dumps(model_json).encode('utf-8')))
+
+    folded = {
+        'model': folded_model,
+        'category_tables': get_category_tables(resources),
+        'features_list': resources['features_list'],
+    }
+    for key in ['brand_models', 'text_normalization', 'anomaly_thresholds']:
+        if key in resources:
+            folded[key] = resources[key]
+    return folded
+
+
+def _boundary_probe_matrix(resources, X_base, n_base_rows=20, seed=0):
+    """
+    Ma trận kiểm tra: các dòng dữ liệu thật, thay từng feature bằng các giá trị nguyên
+    sát ngưỡng tách của cây (nơi dễ lệch nhất khi đổi ngưỡng).
+    """
+    model_json = json.loads(resources['model'].get_booster().save_raw('json'))
+    candidates = {}
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        for feat, cond, left in zip(tree['split_indices'], tree['split_conditions'], tree['left_children']):
+            if left != -1:
+                base = np.floor(cond)
+                candidates.setdefault(feat, set()).update([base - 1, base, base + 1, base + 2])
+
+    rng = np.random.default_rng(seed)
+    base_rows = X_base[rng.choice(len(X_base), min(n_base_rows, len(X_base)), replace=False)]
+    probes = []
+    for feat, values in candidates.items():
+        values = np.array(sorted(values))
+        block = np.repeat(base_rows, len(values), axis=0)
+        block[:, feat] = np.tile(values, len(base_rows))
+        probes.append(block)
+    return np.vstack(probes) if probes else X_base[:0]
+
+
+def check_prediction_parity(resources_a, resources_b, X_raw):
+    """So sánh dự đoán của 2 resources trên ma trận feature gốc. Trả về số dòng lệch."""
+    pred_a = resources_a['model'].predict(scale_features(X_raw, resources_a))
+    pred_b = resources_b['model'].predict(scale_features(X_raw, resources_b))
+    return int(np.sum(pred_a != pred_b))
+
+
+def export_folded_artifact(data_path, root=PRICE_MODEL_PATH):
+    """
+    Gộp scaler của model hiện tại vào ngưỡng cây và ghi thành phiên bản artifact mới.
+    Chỉ ghi khi dự đoán giống hệt model cũ trên dữ liệu data_path và các điểm sát ngưỡng.
+    """
+    resources = load_price_model(root)
+    folded = fold_scaler_into_model(resources)
+
+    df = preprocess_price_data(read_listings(data_path), normalize_text=bool(resources.get('text_normalization')))
+    X_data = build_feature_matrix(df, resources)
+    X_check = np.vstack([X_data, _boundary_probe_matrix(folded, X_data)])
+
+    mismatches = check_prediction_parity(resources, folded, X_check)
+    if mismatches:
+        raise ValueError(f"Model sau khi gộp scaler lệch {mismatches}/{len(X_check)} dự đoán, không lưu.")
+    print(f"Khớp 100% trên {len(X_check)} dòng kiểm tra.")
+    return export_price_artifact(folded, root)
+
+
 if __name__ == "__main__":
-    path = 'data_motobikes.xlsx'  # File csv
-    train_price_model(path)
\ No newline at end of file
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--convert':
+        # Chuyển file pickle cũ sang artifact: python du_bao_gia.py --convert [price_model.pkl] [data_motobikes.xlsx]
+        pkl_path = sys.argv[2] if len(sys.argv) > 2 else LEGACY_PRICE_MODEL_PATH
+        data_file = sys.argv[3] if len(sys.argv) > 3 else None
+        print(f"Đã tạo artifact: {convert_legacy_model(pkl_path, data_file)}")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--incremental':
+        # Train tăng cường từ tin đã duyệt: python du_bao_gia.py --incremental [ket_qua_binh_thuong.csv]
+        store_file = sys.argv[2] if len(sys.argv) > 2 else APPROVED_LISTINGS_FILE
+        train_price_model_incremental(store_file)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--fold-scaler':
+        # Gộp scaler vào model hiện tại: python du_bao_gia.py --fold-scaler [data_motobikes.xlsx]
+        data_file = sys.argv[2] if len(sys.argv) > 2 else 'data_motobikes.xlsx'
+        print(f"Đã tạo artifact: {export_folded_artifact(data_file)}")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--province':
+        # Train thêm feature tỉnh/thành: python du_bao_gia.py --province [data_motobikes.xlsx]
+        data_file = sys.argv[2] if len(sys.argv) > 2 else 'data_motobikes.xlsx'
+        train_price_model(data_file, use_province=True)
+    else:
+        path = 'data_motobikes.xlsx'  # File csv
+        train_price_model(path)
\ No newline at end of file
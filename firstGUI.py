@@ -1,135 +1,184 @@
 import matplotlib.pyplot as plt
 import streamlit as st
 import pandas as pd
-import pickle
 import os
 from datetime import datetime
 
 # Import các hàm xử lý logic từ file bên ngoài
-from du_bao_gia import predict_price_value, PRICE_MODEL_PATH
+from du_bao_gia import load_price_model, get_model_version, build_vocabulary, PredictionCache, PRICE_MODEL_PATH
 from du_bao_bat_thuong import detect_anomaly, save_abnormal_to_csv, OUTPUT_RESULT_FILE, save_normal_to_csv, \
-    OUTPUT_NORMAL_FILE
+    OUTPUT_NORMAL_FILE, listing_thresholds
+from kho_ket_qua import move_results, delete_results, query_results, count_results, result_ids, distinct_values, \
+    ID_COLUMN, BRAND_COLUMN
 
 
 # =============================================================================
 # 1. CẤU HÌNH & LOAD TÀI NGUYÊN
 # =============================================================================
 
+# Số kết quả dự đoán tối đa giữ trong cache (dùng chung cho mọi phiên)
+PREDICTION_CACHE_SIZE = 2048
+
+
 # Load model AI (sử dụng cache để không phải load lại mỗi lần f5)
+# model_version là khóa cache: khi có artifact mới, model được load lại
 @st.cache_resource
-def load_price_resources():
+def load_price_resources(model_version):
     try:
-        with open(PRICE_MODEL_PATH, 'rb') as f:
-            return pickle.load(f)
+        return load_price_model(PRICE_MODEL_PATH)
     except Exception as e:
         st.error(f"Lỗi load model: {e}")
         return None
 
 
+# Cache dự đoán dùng chung giữa các phiên, tạo mới khi model đổi phiên bản
+@st.cache_resource
+def get_prediction_cache(model_version):
+    return PredictionCache(maxsize=PREDICTION_CACHE_SIZE)
+
+
+# Danh mục cho Dropdown (lấy từ bảng mã của model), tạo một lần cho mỗi phiên bản model
+@st.cache_resource
+def load_vocabulary(model_version, _resources):
+    return build_vocabulary(_resources)
+
+
+KHU_VUC_LIST = ['TP.HCM', 'Hà Nội', 'Đà Nẵng', 'Miền Nam (Lân cận)', 'Tỉnh thành khác']
+# Lựa chọn mặc định của ô Tình trạng (danh mục lấy từ model, sắp xếp theo chữ cái)
+DEFAULT_TINH_TRANG = 'Đã sử dụng'
+
+# Bảng quản lý (bài đã đăng / tin bất thường) được phân trang: mỗi trang chỉ đọc các dòng hiển thị từ kho
+PAGE_SIZES = [25, 50, 100, 200]
+SORT_OPTIONS = {
+    'Mới nhất': (ID_COLUMN, True),
+    'Cũ nhất': (ID_COLUMN, False),
+    'Giá bán giảm dần': ('Gia_Thuc_Te_Trieu', True),
+    'Giá bán tăng dần': ('Gia_Thuc_Te_Trieu', False),
+    'Giá AI giảm dần': ('Gia_AI_Du_Doan_Trieu', True),
+    'Thương hiệu (A-Z)': (BRAND_COLUMN, False),
+}
+ALL_BRANDS = 'Tất cả'
+
+
 # =============================================================================
 # 2. CÁC HÀM HỖ TRỢ XỬ LÝ DỮ LIỆU (HELPER FUNCTIONS)
 # =============================================================================
 
-def load_data(file_path):
+def default_index(options, value):
+    """Vị trí của value trong options (để làm lựa chọn mặc định), 0 nếu không có"""
+    return options.index(value) if value in options else 0
+
+
+def load_data(file_path, **query):
     """
-    Đọc dữ liệu từ file CSV.
-    Nếu file không tồn tại hoặc lỗi, trả về DataFrame rỗng.
+    Đọc dữ liệu từ kho kết quả (mặc định toàn bộ, dòng mới nhất ở đầu);
+    query: bộ lọc/sắp xếp/phân trang của query_results (vd: limit=50, offset=100, brand='Honda').
+    Nếu kho trống hoặc lỗi, trả về DataFrame rỗng.
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8-sig')
-        # Reset index để đảm bảo checkbox chọn dòng hoạt động đúng
-        return df.reset_index(drop=True)
-    except FileNotFoundError:
-        return pd.DataFrame()
+        # Index là ma_ban_ghi của kho để checkbox chọn đúng dòng khi xóa/duyệt
+        return query_results(file_path, **query)
     except Exception as e:
-        st.error(f"Lỗi đọc file {file_path}: {e}")
+        st.error(f"Lỗi đọc dữ liệu {file_path}: {e}")
         return pd.DataFrame()
 
 
-def save_data(df, file_path):
-    """
-    Lưu DataFrame xuống file CSV (Ghi đè).
-    """
+def result_filters(file_path, key):
+    """Bộ lọc của bảng quản lý (hãng, lý do, khoảng ngày ghi nhận) -> tham số cho count_results/query_results"""
     try:
-        df.to_csv(file_path, index=False, encoding='utf-8-sig')
-        return True
+        brands = distinct_values(file_path, BRAND_COLUMN)
     except Exception as e:
-        st.error(f"Lỗi lưu file {file_path}: {e}")
-        return False
+        st.error(f"Lỗi đọc dữ liệu {file_path}: {e}")
+        brands = []
 
+    c1, c2, c3 = st.columns(3)
+    brand = c1.selectbox("Thương hiệu", [ALL_BRANDS] + brands, key=f'{key}_brand')
+    reason = c2.text_input("Lý do chứa", key=f'{key}_reason')
+    dates = c3.date_input("Ngày ghi nhận (từ - đến)", value=(), key=f'{key}_dates')
+    return {'brand': None if brand == ALL_BRANDS else brand,
+            'reason': reason.strip() or None,
+            'date_from': dates[0] if len(dates) > 0 else None,
+            'date_to': dates[1] if len(dates) > 1 else None}
 
-def move_to_normal(df_abnormal, indices_to_move):
+
+def load_page(file_path, key):
     """
-    Chức năng DUYỆT TIN:
-    Chuyển các dòng từ danh sách Bất thường (df_abnormal) -> sang danh sách Đã đăng (df_normal).
+    Bộ lọc + sắp xếp + phân trang của bảng quản lý; chỉ đọc từ kho các dòng của trang đang xem.
+    Trả về (DataFrame của trang, tổng số dòng khớp bộ lọc, bộ lọc, khóa của trang cho data_editor).
     """
-    if not indices_to_move:
-        return "Không có dòng nào được chọn.", 0
+    filters = result_filters(file_path, key)
+    c1, c2, c3 = st.columns(3)
+    sort_label = c1.selectbox("Sắp xếp", list(SORT_OPTIONS), key=f'{key}_sort')
+    page_size = c2.selectbox("Số dòng mỗi trang", PAGE_SIZES, key=f'{key}_page_size')
 
-    # Lấy ra các dòng cần di chuyển
-    rows_to_move = df_abnormal.loc[indices_to_move].copy()
+    try:
+        total = count_results(file_path, **filters)
+    except Exception as e:
+        st.error(f"Lỗi đọc dữ liệu {file_path}: {e}")
+        return pd.DataFrame(), 0, filters, key
 
-    # Cập nhật trạng thái thành 'Bình thường' (đã duyệt)
-    rows_to_move['Co_Bat_Thuong'] = 0
-    rows_to_move['Ly_Do_Chi_Tiet'] = 'Đã được Admin duyệt'
-    rows_to_move['Tiêu đề'] = rows_to_move['Tiêu đề'].str.replace('Cảnh báo GUI', 'Bài đăng đã duyệt', regex=False)
+    n_pages = max(1, -(-total // page_size))
+    # Đổi bộ lọc/sắp xếp -> ô chọn trang mới (về trang 1); trang vượt quá số trang (sau khi xóa) -> trang cuối
+    view_key = '|'.join(str(v) for v in [*filters.values(), sort_label, page_size])
+    page = c3.number_input(f"Trang (1 - {n_pages})", min_value=1, value=1, step=1, key=f'{key}_page_{view_key}')
+    page = min(int(page), n_pages)
 
-    # Dọn dẹp cột 'Chọn' (checkbox) trước khi gộp
-    if 'Chọn' in rows_to_move.columns:
-        rows_to_move = rows_to_move.drop(columns=['Chọn'])
+    order_by, descending = SORT_OPTIONS[sort_label]
+    df = load_data(file_path, order_by=order_by, descending=descending, limit=page_size,
+                   offset=(page - 1) * page_size, **filters)
+    return df, total, filters, f'{key}_{view_key}_{page}'
 
-    # Đọc danh sách bài đã đăng hiện tại
-    df_normal = load_data(OUTPUT_NORMAL_FILE)
-    if 'Chọn' in df_normal.columns:
-        df_normal = df_normal.drop(columns=['Chọn'])
 
-    # Gộp bài mới duyệt vào danh sách bài đã đăng
-    df_normal = pd.concat([rows_to_move, df_normal], ignore_index=True)
+def mark_approved(rows):
+    """Cập nhật trạng thái các dòng được duyệt thành 'Bình thường'"""
+    rows['Co_Bat_Thuong'] = 0
+    rows['Ly_Do_Chi_Tiet'] = 'Đã được Admin duyệt'
+    rows['Tiêu đề'] = rows['Tiêu đề'].str.replace('Cảnh báo GUI', 'Bài đăng đã duyệt', regex=False)
+    return rows
 
-    # Xóa bài đã duyệt khỏi danh sách bất thường
-    df_abnormal_updated = df_abnormal.drop(indices_to_move)
-    if 'Chọn' in df_abnormal_updated.columns:
-        df_abnormal_updated = df_abnormal_updated.drop(columns=['Chọn'])
 
-    # Lưu lại cả 2 file
-    save_success_abnormal = save_data(df_abnormal_updated, OUTPUT_RESULT_FILE)
-    save_success_normal = save_data(df_normal, OUTPUT_NORMAL_FILE)
+def move_to_normal(indices_to_move):
+    """
+    Chức năng DUYỆT TIN:
+    Chuyển các dòng (theo ma_ban_ghi) từ danh sách Bất thường -> sang danh sách Đã đăng.
+    """
+    if not indices_to_move:
+        return "Không có dòng nào được chọn.", 0
 
-    if save_success_abnormal and save_success_normal:
-        return "Duyệt thành công!", len(rows_to_move)
-    else:
+    try:
+        # Thêm vào đầu danh sách bài đã đăng và xóa khỏi danh sách bất thường trong cùng một transaction
+        moved = move_results(OUTPUT_RESULT_FILE, OUTPUT_NORMAL_FILE, indices_to_move, transform=mark_approved)
+    except Exception as e:
+        st.error(f"Lỗi lưu dữ liệu: {e}")
         return "Lỗi khi lưu dữ liệu.", 0
 
+    return "Duyệt thành công!", moved
+
 
 def delete_rows(df, file_path, indices_to_delete):
     """
     Chức năng XÓA TIN:
-    Xóa các dòng được chọn khỏi DataFrame và lưu lại file.
+    Xóa các dòng được chọn (theo ma_ban_ghi) khỏi kho kết quả.
     """
     if not indices_to_delete:
         return "Không có dòng nào được chọn.", 0
 
-    rows_deleted_count = len(indices_to_delete)
-
-    # Xóa dòng theo index
-    df_updated = df.drop(indices_to_delete)
-
-    # Dọn dẹp cột 'Chọn'
-    if 'Chọn' in df_updated.columns:
-        df_updated = df_updated.drop(columns=['Chọn'])
-
-    # Lưu file
-    if save_data(df_updated, file_path):
-        return "Xóa thành công!", rows_deleted_count
-    else:
+    try:
+        rows_deleted_count = delete_results(file_path, indices_to_delete)
+    except Exception as e:
+        st.error(f"Lỗi lưu dữ liệu {file_path}: {e}")
         return "Lỗi khi lưu dữ liệu.", 0
 
+    return "Xóa thành công!", rows_deleted_count
+
 
 # =============================================================================
 # 3. GIAO DIỆN CHÍNH (MAIN APP)
 # =============================================================================
 
-price_res = load_price_resources()
+model_version = get_model_version(PRICE_MODEL_PATH)
+price_res = load_price_resources(model_version)
+prediction_cache = get_prediction_cache(model_version)
 
 # Menu điều hướng bên trái
 menu = ["Home", "Chợ xe máy cũ và Mục tiêu của dự án", "Đánh giá và lựa chọn mô hình thích hợp", "Dự đoán giá xe cũ",
@@ -228,36 +277,23 @@ elif choice == 'Dự đoán giá xe cũ':
         st.error("⚠️ LỖI: Chưa tìm thấy file mô hình!")
         st.stop()
 
-    # 1. Load dữ liệu mẫu để tạo danh sách gợi ý cho Dropdown
-    try:
-        df_sample_raw = pd.read_csv("subset_100motobikes.csv")
-        THUONG_HIEU_LIST = sorted(df_sample_raw['Thương hiệu'].dropna().unique())
-        DONG_XE_LIST = sorted(df_sample_raw['Dòng xe'].dropna().unique())
-        LOAI_XE_LIST = sorted(df_sample_raw['Loại xe'].dropna().unique())
-        DUNG_TICH_LIST = sorted(df_sample_raw['Dung tích xe'].dropna().unique())
-        XUAT_XU_LIST = sorted(df_sample_raw['Xuất xứ'].dropna().unique())
-        KHU_VUC_LIST = ['TP.HCM', 'Hà Nội', 'Đà Nẵng', 'Miền Nam (Lân cận)', 'Tỉnh thành khác']
-    except:
-        # Fallback nếu không có file dữ liệu
-        THUONG_HIEU_LIST = ['Honda', 'Yamaha', 'Suzuki', 'Piaggio', 'SYM']
-        DONG_XE_LIST = ['SH', 'Vision', 'Air Blade', 'Exciter', 'Wave']
-        LOAI_XE_LIST = ['Tay ga', 'Xe số']
-        DUNG_TICH_LIST = ['100 - 175 cc']
-        XUAT_XU_LIST = ['Việt Nam']
-        KHU_VUC_LIST = ['TP.HCM']
+    # 1. Danh mục gợi ý cho Dropdown (chỉ các giá trị model đã học)
+    vocab = load_vocabulary(model_version, price_res)
 
     # 2. Form nhập liệu
     st.write("### I. Thông tin xe")
     col1, col2 = st.columns(2)
     with col1:
-        thuong_hieu = st.selectbox("Thương hiệu", THUONG_HIEU_LIST)
-        dong_xe = st.selectbox("Dòng xe", DONG_XE_LIST)
-        loai_xe = st.selectbox("Loại xe", LOAI_XE_LIST)
-        tinh_trang = st.selectbox("Tình trạng", ['Đã sử dụng', 'Mới'])
+        thuong_hieu = st.selectbox("Thương hiệu", vocab['Thương hiệu'])
+        # Chỉ hiện các dòng xe thuộc thương hiệu đã chọn
+        dong_xe = st.selectbox("Dòng xe", vocab['brand_models'].get(thuong_hieu) or vocab['Dòng xe'])
+        loai_xe = st.selectbox("Loại xe", vocab['Loại xe'])
+        tinh_trang = st.selectbox("Tình trạng", vocab['Tình trạng'],
+                                  index=default_index(vocab['Tình trạng'], DEFAULT_TINH_TRANG))
         khu_vuc_ui = st.selectbox("Khu vực bán", KHU_VUC_LIST)
     with col2:
-        dung_tich = st.selectbox("Dung tích", DUNG_TICH_LIST)
-        xuat_xu = st.selectbox("Xuất xứ", XUAT_XU_LIST)
+        dung_tich = st.selectbox("Dung tích", vocab['Dung tích xe'])
+        xuat_xu = st.selectbox("Xuất xứ", vocab['Xuất xứ'])
         nam = st.number_input("Năm đăng ký", 1990, 2025, 2020)
         km = st.number_input("Số Km đã đi", min_value=0, value=5000, step=1000)
 
@@ -269,7 +305,7 @@ elif choice == 'Dự đoán giá xe cũ':
     }
 
     # 4. Dự đoán
-    price = predict_price_value(input_dict, price_res)
+    price = prediction_cache.predict(input_dict, price_res)
 
     st.write("### II. Kết quả dự đoán")
     if st.button("💰 Dự đoán giá xe này"):
@@ -287,35 +323,22 @@ elif choice == 'Phát hiện bất thường':
         st.error("⚠️ LỖI: Chưa tìm thấy file mô hình!")
         st.stop()
 
-    # Load dữ liệu list (giống tab Dự đoán)
-    try:
-            df_sample_raw = pd.read_csv("subset_100motobikes.csv")
-            THUONG_HIEU_LIST = sorted(df_sample_raw['Thương hiệu'].dropna().unique())
-            DONG_XE_LIST = sorted(df_sample_raw['Dòng xe'].dropna().unique())
-            LOAI_XE_LIST = sorted(df_sample_raw['Loại xe'].dropna().unique())
-            DUNG_TICH_LIST = sorted(df_sample_raw['Dung tích xe'].dropna().unique())
-            XUAT_XU_LIST = sorted(df_sample_raw['Xuất xứ'].dropna().unique())
-            KHU_VUC_LIST = ['TP.HCM', 'Hà Nội', 'Đà Nẵng', 'Miền Nam (Lân cận)', 'Tỉnh thành khác']
-    except:
-        THUONG_HIEU_LIST = ['Honda', 'Yamaha']
-        DONG_XE_LIST = ['SH', 'Vision']
-        LOAI_XE_LIST = ['Tay ga']
-        DUNG_TICH_LIST = ['100 - 175 cc']
-        XUAT_XU_LIST = ['Việt Nam']
-        KHU_VUC_LIST = ['TP.HCM']
+    # Danh mục Dropdown (giống tab Dự đoán)
+    vocab = load_vocabulary(model_version, price_res)
 
     # --- NHẬP LIỆU ---
     st.write("### I. Nhập thông tin xe")
     col1, col2 = st.columns(2)
     with col1:
-        thuong_hieu = st.selectbox("Thương hiệu", THUONG_HIEU_LIST, key='bt_th')
-        dong_xe = st.selectbox("Dòng xe", DONG_XE_LIST, key='bt_dx')
-        loai_xe = st.selectbox("Loại xe", LOAI_XE_LIST, key='bt_lx')
-        tinh_trang = st.selectbox("Tình trạng", ['Đã sử dụng', 'Mới'], key='bt_tt')
+        thuong_hieu = st.selectbox("Thương hiệu", vocab['Thương hiệu'], key='bt_th')
+        dong_xe = st.selectbox("Dòng xe", vocab['brand_models'].get(thuong_hieu) or vocab['Dòng xe'], key='bt_dx')
+        loai_xe = st.selectbox("Loại xe", vocab['Loại xe'], key='bt_lx')
+        tinh_trang = st.selectbox("Tình trạng", vocab['Tình trạng'],
+                                  index=default_index(vocab['Tình trạng'], DEFAULT_TINH_TRANG), key='bt_tt')
         khu_vuc_ui = st.selectbox("Khu vực bán", KHU_VUC_LIST, key='bt_kv')
     with col2:
-        dung_tich = st.selectbox("Dung tích", DUNG_TICH_LIST, key='bt_dt')
-        xuat_xu = st.selectbox("Xuất xứ", XUAT_XU_LIST, key='bt_xx')
+        dung_tich = st.selectbox("Dung tích", vocab['Dung tích xe'], key='bt_dt')
+        xuat_xu = st.selectbox("Xuất xứ", vocab['Xuất xứ'], key='bt_xx')
         nam = st.number_input("Năm đăng ký", 1990, 2025, 2020, key='bt_nam')
         km = st.number_input("Số Km đã đi", min_value=0, value=5000, step=1000, key='bt_km')
 
@@ -326,7 +349,7 @@ elif choice == 'Phát hiện bất thường':
     }
 
     # Tính toán giá AI dự đoán
-    ai_price = predict_price_value(input_dict, price_res)
+    ai_price = prediction_cache.predict(input_dict, price_res)
 
     # --- KIỂM TRA & XỬ LÝ ---
     st.write("### II. Định giá bán")
@@ -346,7 +369,7 @@ elif choice == 'Phát hiện bất thường':
             st.session_state.confirm_abnormal = False
         else:
             # Kiểm tra bất thường
-            result = detect_anomaly(check_price, ai_price)
+            result = detect_anomaly(check_price, ai_price, listing_thresholds(price_res, input_dict))
 
             # TRƯỜNG HỢP 1: GIÁ HỢP LÝ -> ĐĂNG NGAY
             if result['isAbnormal'] == 0:
@@ -404,10 +427,10 @@ elif choice == 'Các Bài Đã Đăng':
     st.header("📝 Các Bài Đã Đăng")
     st.caption("Danh sách các tin đăng hợp lệ.")
 
-    df_normal = load_data(OUTPUT_NORMAL_FILE)
+    df_normal, total, filters, page_key = load_page(OUTPUT_NORMAL_FILE, 'normal')
 
     if df_normal.empty:
-        st.info("Chưa có bài đăng nào.")
+        st.info("Không có bài đăng nào khớp bộ lọc." if any(filters.values()) else "Chưa có bài đăng nào.")
     else:
         # Thêm cột Checkbox 'Chọn' vào đầu DataFrame để thao tác
         if 'Chọn' not in df_normal.columns:
@@ -415,7 +438,7 @@ elif choice == 'Các Bài Đã Đăng':
         else:
             df_normal['Chọn'] = False
 
-        st.write(f"Tổng số bài: {len(df_normal)}")
+        st.write(f"Tổng số bài: {total} (trang này: {len(df_normal)})")
 
         # Cấu hình hiển thị bảng
         column_config = {
@@ -432,7 +455,7 @@ elif choice == 'Các Bài Đã Đăng':
             disabled=[c for c in df_normal.columns if c != 'Chọn'],
             hide_index=True,
             use_container_width=True,
-            key='editor_normal'
+            key=f'editor_{page_key}'
         )
 
         # Lấy danh sách các dòng được chọn
@@ -450,9 +473,9 @@ elif choice == 'Các Bài Đã Đăng':
                 st.rerun()
 
         with c2:
-            if st.button("💥 Xóa TẤT CẢ"):
-                if len(df_normal) > 0:
-                    delete_rows(edited_df, OUTPUT_NORMAL_FILE, df_normal.index.tolist())
+            if st.button("💥 Xóa TẤT CẢ", help="Xóa toàn bộ bài khớp bộ lọc (mọi trang)"):
+                if total > 0:
+                    delete_rows(edited_df, OUTPUT_NORMAL_FILE, result_ids(OUTPUT_NORMAL_FILE, **filters))
                     st.success("Đã xóa toàn bộ dữ liệu.")
                     st.rerun()
 
@@ -463,10 +486,13 @@ elif choice == 'Quản lý tin bất thường':
     st.header("🕵️ Duyệt Tin Bất Thường")
     st.caption("Admin xem xét các tin giá lệch cao/thấp để quyết định đăng hay xóa.")
 
-    df_abnormal = load_data(OUTPUT_RESULT_FILE)
+    df_abnormal, total, filters, page_key = load_page(OUTPUT_RESULT_FILE, 'abnormal')
 
     if df_abnormal.empty:
-        st.success("Sạch sẽ! Không có tin bất thường nào.")
+        if any(filters.values()):
+            st.info("Không có tin bất thường nào khớp bộ lọc.")
+        else:
+            st.success("Sạch sẽ! Không có tin bất thường nào.")
     else:
         # Thêm cột Checkbox 'Chọn'
         if 'Chọn' not in df_abnormal.columns:
@@ -474,7 +500,7 @@ elif choice == 'Quản lý tin bất thường':
         else:
             df_abnormal['Chọn'] = False
 
-        st.error(f"Cảnh báo: Có {len(df_abnormal)} tin cần duyệt.")
+        st.error(f"Cảnh báo: Có {total} tin cần duyệt (trang này: {len(df_abnormal)}).")
 
         column_config = {
             "Chọn": st.column_config.CheckboxColumn("Duyệt/Xóa", help="Tick để thực hiện thao tác", width="small"),
@@ -489,7 +515,7 @@ elif choice == 'Quản lý tin bất thường':
             disabled=[c for c in df_abnormal.columns if c != 'Chọn'],
             hide_index=True,
             use_container_width=True,
-            key='editor_abnormal'
+            key=f'editor_{page_key}'
         )
 
         selected_indices = edited_df[edited_df['Chọn'] == True].index.tolist()
@@ -502,7 +528,7 @@ elif choice == 'Quản lý tin bất thường':
         with c1:
             if st.button(f"✅ Duyệt ({count_select})", type="primary", disabled=(count_select == 0),
                          help="Chuyển tin đã chọn sang mục Đã Đăng"):
-                msg, count = move_to_normal(edited_df, selected_indices)
+                msg, count = move_to_normal(selected_indices)
                 st.success(f"{msg}")
                 st.rerun()
 
@@ -513,16 +539,16 @@ elif choice == 'Quản lý tin bất thường':
                 st.rerun()
 
         with c3:
-            if st.button("✅ Duyệt TẤT CẢ", help="Chuyển TOÀN BỘ tin sang mục Đã Đăng"):
-                if len(df_abnormal) > 0:
-                    move_to_normal(edited_df, df_abnormal.index.tolist())
+            if st.button("✅ Duyệt TẤT CẢ", help="Chuyển TOÀN BỘ tin khớp bộ lọc (mọi trang) sang mục Đã Đăng"):
+                if total > 0:
+                    move_to_normal(result_ids(OUTPUT_RESULT_FILE, **filters))
                     st.success("Đã duyệt tất cả!")
                     st.rerun()
 
         with c4:
-            if st.button("💥 Xóa TẤT CẢ", help="Xóa sạch danh sách bất thường"):
-                if len(df_abnormal) > 0:
-                    delete_rows(edited_df, OUTPUT_RESULT_FILE, df_abnormal.index.tolist())
+            if st.button("💥 Xóa TẤT CẢ", help="Xóa toàn bộ tin bất thường khớp bộ lọc (mọi trang)"):
+                if total > 0:
+                    delete_rows(edited_df, OUTPUT_RESULT_FILE, result_ids(OUTPUT_RESULT_FILE, **filters))
                     st.success("Đã xóa sạch danh sách bất thường.")
                     st.rerun()
 
@@ -0,0 +1,160 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from du_bao_gia import encode_input, predict_encoded_rows, REQUIRED_INPUT_FIELDS
+
+# =============================================================================
+# GOM LÔ DỰ ĐOÁN (micro-batching)
+# Nhiều luồng cùng gửi từng input_dict -> gom thành một lô -> gọi model MỘT lần.
+# Một lô được dự đoán khi đủ max_batch_size tin HOẶC tin đầu tiên của lô đã chờ max_wait_ms.
+# Kết quả giống hệt gọi predict_price_value từng tin (cùng encode_input).
+# Mỗi tin được encode ngay khi submit: tin lỗi chỉ làm hỏng Future của chính nó, không ảnh hưởng cả lô.
+# =============================================================================
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+
+# Số độ trễ / kích thước lô gần nhất giữ lại để thống kê
+STATS_WINDOW = 4096
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Bộ gom lô chạy trên một thread nền.
+        batcher = MicroBatcher(resources, max_batch_size=64, max_wait_ms=2)
+        future = batcher.submit(input_dict)   # trả về ngay
+        price = future.result()               # hoặc batcher.predict(input_dict)
+        batcher.close()
+    """
+
+    def __init__(self, resources, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size phải >= 1")
+        self.resources = resources
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._latencies = deque(maxlen=STATS_WINDOW)
+        self._batch_sizes = deque(maxlen=STATS_WINDOW)
+        self._n_items = 0
+        self._n_batches = 0
+        self._n_full = 0
+        self._n_errors = 0
+
+        self._thread = threading.Thread(target=self._run, name='gom_lo_du_doan', daemon=True)
+        self._thread.start()
+
+    # --- API ---
+    def submit(self, input_dict):
+        """Gửi một input_dict, trả về Future chứa giá dự đoán (triệu đồng)"""
+        missing = [f for f in REQUIRED_INPUT_FIELDS if f not in input_dict]
+        if missing:
+            raise KeyError(f"Thiếu trường: {', '.join(missing)}")
+        future = Future()
+        try:
+            row = np.asarray(encode_input(input_dict, self.resources), dtype=float)
+        except Exception as e:  # vd: 'nam' không phải số
+            with self._lock:
+                self._n_errors += 1
+            future.set_exception(e)
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher đã đóng")
+            self._queue.put((row, future, time.perf_counter()))
+        return future
+
+    def predict(self, input_dict, timeout=None):
+        return self.submit(input_dict).result(timeout)
+
+    def close(self):
+        """Dự đoán nốt các tin đang chờ rồi dừng thread nền"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            lat_ms = np.array(self._latencies) * 1000
+            sizes = np.array(self._batch_sizes)
+            return {
+                'items': self._n_items,
+                'batches': self._n_batches,
+                'errors': self._n_errors,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'latency_ms_p50': float(np.percentile(lat_ms, 50)) if len(lat_ms) else None,
+                'latency_ms_p99': float(np.percentile(lat_ms, 99)) if len(lat_ms) else None,
+                'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+                # Tỉ lệ lấp đầy: kích thước lô trung bình / max_batch_size
+                'fill_rate': float(sizes.mean() / self.max_batch_size) if len(sizes) else None,
+                # Tỉ lệ lô được dự đoán vì đủ kích thước (còn lại là do hết thời gian chờ)
+                'full_batch_ratio': self._n_full / self._n_batches if self._n_batches else None,
+            }
+
+    # --- Thread nền ---
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = item[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    # Hết hạn chờ: vẫn lấy các tin đã nằm sẵn trong hàng đợi
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _predict_each(self, batch):
+        """Lô bị lỗi: dự đoán lại từng tin để lỗi chỉ trả về cho đúng tin gây lỗi"""
+        results = []
+        for row, _, _ in batch:
+            try:
+                results.append((predict_encoded_rows(row.reshape(1, -1), self.resources)[0], None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def _flush(self, batch):
+        try:
+            prices = predict_encoded_rows(np.vstack([row for row, _, _ in batch]), self.resources)
+            results = [(price, None) for price in prices]
+        except Exception:
+            results = self._predict_each(batch)
+
+        done = time.perf_counter()
+        with self._lock:
+            self._n_batches += 1
+            self._n_items += len(batch)
+            self._n_full += len(batch) == self.max_batch_size
+            self._batch_sizes.append(len(batch))
+            self._latencies.extend(done - submitted for _, _, submitted in batch)
+            self._n_errors += sum(error is not None for _, error in results)
+
+        for (_, future, _), (price, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(price)
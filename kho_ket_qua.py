@@ -0,0 +1,392 @@
+import os
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# KHO LƯU KẾT QUẢ (SQLite - WAL)
+# Mỗi file kết quả CSV (ket_qua_bat_thuong.csv, ket_qua_binh_thuong.csv) có một
+# file .db tương ứng. Lần đầu mở kho, dữ liệu CSV cũ được nhập vào một lần.
+# - Thêm dòng: INSERT O(1), không đọc/ghi lại cả file
+# - Đọc "mới nhất trước": ORDER BY ma_ban_ghi DESC
+# - Nhiều phiên ghi cùng lúc: WAL + khóa ghi của SQLite (BEGIN IMMEDIATE)
+# - Trang quản lý của GUI: lọc/sắp xếp/phân trang bằng SQL (LIMIT/OFFSET) trên các cột có index,
+#   mỗi trang chỉ đọc đúng các dòng hiển thị (query_results, count_results)
+# =============================================================================
+
+TABLE_NAME = 'ket_qua'
+ID_COLUMN = 'ma_ban_ghi'
+
+# Thời gian chờ khóa ghi (giây) khi nhiều phiên cùng ghi
+BUSY_TIMEOUT = 30
+
+TIME_COLUMN = 'Thời gian ghi nhận'
+BRAND_COLUMN = 'Thương hiệu'
+REASON_COLUMN = 'Ly_Do_Chi_Tiet'
+# Các cột được đánh index (lọc + sắp xếp trang quản lý); cột chưa có thì tạo index khi cột được thêm
+INDEXED_COLUMNS = [TIME_COLUMN, BRAND_COLUMN, 'Gia_Thuc_Te_Trieu', 'Gia_AI_Du_Doan_Trieu']
+
+
+def get_store_path(file_path):
+    """'ket_qua_bat_thuong.csv' -> 'ket_qua_bat_thuong.db'"""
+    return os.path.splitext(file_path)[0] + '.db'
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_sql_value(value):
+    """Chuyển giá trị pandas/numpy sang kiểu SQLite hiểu được (NaN -> NULL)"""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (int, float, str, bytes)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+def _table_columns(conn):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")]
+
+
+def _ensure_columns(conn, columns):
+    """Thêm các cột chưa có vào bảng (dữ liệu batch và GUI có bộ cột khác nhau)"""
+    existing = set(_table_columns(conn))
+    added = False
+    for col in columns:
+        if col not in existing and col != ID_COLUMN:
+            conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {_quote(col)}")
+            existing.add(col)
+            added = True
+    if added:
+        _ensure_indexes(conn)
+
+
+def _ensure_indexes(conn):
+    """Tạo index cho các cột INDEXED_COLUMNS đã có trong bảng mà chưa có index"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    columns = set(_table_columns(conn))
+    for col in INDEXED_COLUMNS:
+        name = f"idx_{TABLE_NAME}_{col}"
+        if col in columns and name not in existing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {TABLE_NAME} ({_quote(col)})")
+
+
+def _insert_frame(conn, df, newest_first=True):
+    """
+    Ghi các dòng của df vào bảng.
+    newest_first=True: df theo thứ tự HIỂN THỊ (mới nhất ở đầu), nên dòng cuối được ghi trước
+    để đọc lại đúng thứ tự. False: df theo thứ tự thời gian (dòng sau mới hơn).
+    """
+    if df.empty:
+        return 0
+    columns = [c for c in df.columns if c != ID_COLUMN]
+    _ensure_columns(conn, columns)
+
+    placeholders = ', '.join('?' * len(columns))
+    sql = f"INSERT INTO {TABLE_NAME} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})"
+    rows = df[columns].iloc[::-1] if newest_first else df[columns]
+    # Duyệt từng dòng (không tạo mảng object 2 chiều của cả DataFrame)
+    conn.executemany(sql, ([_to_sql_value(v) for v in row] for row in rows.itertuples(index=False, name=None)))
+    return len(df)
+
+
+def _init_store(conn, file_path):
+    """Tạo bảng nếu chưa có và nhập dữ liệu từ file CSV cũ (chỉ một lần)"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,)).fetchone()
+    if exists:
+        # Kho tạo từ phiên bản cũ: bổ sung index còn thiếu (không làm gì nếu đã đủ)
+        _ensure_indexes(conn)
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Kiểm tra lại trong transaction: phiên khác có thể vừa tạo xong
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,)).fetchone()
+        if not exists:
+            conn.execute(f"CREATE TABLE {TABLE_NAME} ({ID_COLUMN} INTEGER PRIMARY KEY AUTOINCREMENT)")
+            if os.path.exists(file_path):
+                _insert_frame(conn, pd.read_csv(file_path, encoding='utf-8-sig'))
+            _ensure_indexes(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def connect_store(file_path):
+    """Mở kết nối tới kho kết quả tương ứng với file_path"""
+    conn = sqlite3.connect(get_store_path(file_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _init_store(conn, file_path)
+    return conn
+
+
+def _write(file_path, action):
+    """Chạy action(conn) trong một transaction ghi (khóa ghi ngay từ đầu)"""
+    conn = connect_store(file_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = action(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+def append_result(file_path, row):
+    """Thêm MỘT dòng kết quả (dict) vào kho. Dòng mới sẽ nằm đầu khi đọc."""
+    return _write(file_path, lambda conn: _insert_frame(conn, pd.DataFrame([row])))
+
+
+def append_results(file_path, df, newest_first=True):
+    """
+    Thêm nhiều dòng. Mặc định df theo thứ tự hiển thị (dòng đầu là mới nhất);
+    newest_first=False khi df theo thứ tự thời gian (vd: ghi nối từng khối của batch).
+    """
+    return _write(file_path, lambda conn: _insert_frame(conn, df, newest_first))
+
+
+def replace_results(file_path, df):
+    """Thay TOÀN BỘ nội dung kho bằng df (dùng cho batch ghi đè)"""
+    def action(conn):
+        conn.execute(f"DELETE FROM {TABLE_NAME}")
+        return _insert_frame(conn, df)
+    return _write(file_path, action)
+
+
+def delete_results(file_path, ids):
+    """Xóa các dòng theo ma_ban_ghi"""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+
+    def action(conn):
+        cur = conn.executemany(f"DELETE FROM {TABLE_NAME} WHERE {ID_COLUMN} = ?", [(i,) for i in ids])
+        return cur.rowcount
+    return _write(file_path, action)
+
+
+def move_results(source_path, target_path, ids, transform=None):
+    """
+    Chuyển các dòng (theo ma_ban_ghi) từ kho source_path sang kho target_path trong MỘT transaction
+    (kho đích mở chính, kho nguồn ATTACH): lỗi ở bất kỳ bước nào -> không kho nào bị thay đổi.
+    transform(df) -> df: sửa các dòng trước khi ghi sang kho đích (vd: đổi trạng thái đã duyệt).
+    Trả về số dòng đã chuyển. Lưu ý: ở chế độ WAL, SQLite chỉ commit nguyên tử trên từng file,
+    nếu process bị tắt đúng lúc commit thì vẫn có thể lệch giữa hai kho.
+    """
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+    connect_store(source_path).close()  # tạo kho nguồn / nhập CSV cũ nếu chưa có
+    conn = connect_store(target_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS nguon", (get_store_path(source_path),))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ', '.join('?' * len(ids))
+            # Thứ tự hiển thị (mới nhất ở đầu) như read_results
+            df = pd.read_sql_query(f"SELECT * FROM nguon.{TABLE_NAME} WHERE {ID_COLUMN} IN ({placeholders}) "
+                                   f"ORDER BY {ID_COLUMN} DESC", conn, params=ids, index_col=ID_COLUMN)
+            df = df.dropna(axis=1, how='all')
+            if transform is not None:
+                df = transform(df)
+            _insert_frame(conn, df)
+            conn.execute(f"DELETE FROM nguon.{TABLE_NAME} WHERE {ID_COLUMN} IN ({placeholders})", ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return len(df)
+
+
+def last_result_id(file_path):
+    """ma_ban_ghi lớn nhất đã cấp (0 nếu chưa có), dùng làm mốc checkpoint"""
+    conn = connect_store(file_path)
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (TABLE_NAME,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def truncate_results(file_path, last_id):
+    """Xóa các dòng có ma_ban_ghi > last_id (bỏ phần ghi dở sau checkpoint)"""
+    return _write(file_path, lambda conn: conn.execute(
+        f"DELETE FROM {TABLE_NAME} WHERE {ID_COLUMN} > ?", (int(last_id),)).rowcount)
+
+
+def read_results(file_path):
+    """
+    Đọc toàn bộ kết quả, dòng mới nhất ở đầu.
+    Index của DataFrame là ma_ban_ghi (dùng để xóa/duyệt đúng dòng).
+    """
+    conn = connect_store(file_path)
+    try:
+        df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME} ORDER BY {ID_COLUMN} DESC", conn,
+                               index_col=ID_COLUMN)
+    finally:
+        conn.close()
+    # Bỏ các cột không có dữ liệu nào (vd: cột chỉ có ở dữ liệu batch cũ đã bị xóa)
+    return df.dropna(axis=1, how='all')
+
+
+def _where_clause(columns, brand=None, reason=None, date_from=None, date_to=None):
+    """
+    Điều kiện WHERE + tham số cho bộ lọc của trang quản lý (bỏ qua điều kiện trên cột kho chưa có).
+    reason: chuỗi con của Ly_Do_Chi_Tiet; date_from/date_to: 'YYYY-MM-DD' (tính cả hai ngày).
+    """
+    conditions, params = [], []
+    if brand is not None and BRAND_COLUMN in columns:
+        conditions.append(f"{_quote(BRAND_COLUMN)} = ?")
+        params.append(brand)
+    if reason and REASON_COLUMN in columns:
+        conditions.append(f"{_quote(REASON_COLUMN)} LIKE ?")
+        params.append(f"%{reason}%")
+    # Thời gian ghi nhận dạng 'YYYY-MM-DD HH:MM:SS': so sánh chuỗi đúng thứ tự thời gian
+    if date_from is not None and TIME_COLUMN in columns:
+        conditions.append(f"{_quote(TIME_COLUMN)} >= ?")
+        params.append(str(date_from))
+    if date_to is not None and TIME_COLUMN in columns:
+        conditions.append(f"{_quote(TIME_COLUMN)} <= ?")
+        params.append(f"{date_to} 23:59:59")
+    return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def count_results(file_path, **filters):
+    """Số dòng khớp bộ lọc (brand, reason, date_from, date_to như query_results)"""
+    conn = connect_store(file_path)
+    try:
+        where, params = _where_clause(set(_table_columns(conn)), **filters)
+        return conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}{where}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def query_results(file_path, order_by=ID_COLUMN, descending=True, limit=None, offset=0, **filters):
+    """
+    Đọc một trang kết quả: lọc (brand, reason, date_from, date_to), sắp xếp theo order_by
+    (cột không có trong kho -> theo ma_ban_ghi), lấy limit dòng từ vị trí offset (limit=None: tất cả).
+    Index của DataFrame là ma_ban_ghi như read_results.
+    """
+    conn = connect_store(file_path)
+    try:
+        columns = _table_columns(conn)
+        where, params = _where_clause(set(columns), **filters)
+        direction = 'DESC' if descending else 'ASC'
+        order = f"{ID_COLUMN} {direction}"
+        if order_by != ID_COLUMN and order_by in columns:
+            order = f"{_quote(order_by)} {direction}, {order}"
+        sql = f"SELECT * FROM {TABLE_NAME}{where} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [int(limit), int(offset)]
+        df = pd.read_sql_query(sql, conn, params=params, index_col=ID_COLUMN)
+    finally:
+        conn.close()
+    return df.dropna(axis=1, how='all')
+
+
+def result_ids(file_path, **filters):
+    """ma_ban_ghi của tất cả các dòng khớp bộ lọc (cho thao tác 'tất cả' trên trang quản lý)"""
+    conn = connect_store(file_path)
+    try:
+        where, params = _where_clause(set(_table_columns(conn)), **filters)
+        rows = conn.execute(f"SELECT {ID_COLUMN} FROM {TABLE_NAME}{where}", params).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+def distinct_values(file_path, column):
+    """Các giá trị khác nhau (đã sắp xếp, bỏ ô trống) của một cột, vd: danh sách hãng cho bộ lọc"""
+    conn = connect_store(file_path)
+    try:
+        if column not in _table_columns(conn):
+            return []
+        rows = conn.execute(f"SELECT DISTINCT {_quote(column)} FROM {TABLE_NAME} "
+                            f"WHERE {_quote(column)} IS NOT NULL ORDER BY 1").fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+# =============================================================================
+# CHỈ MỤC VÂN TAY TIN ĐĂNG (batch tăng dần)
+# Mỗi file kết quả có thêm file .van_tay.db: (mã tin, vân tay nội dung) -> kết quả chấm điểm,
+# kèm khóa model (model_version...) lúc chấm. Khóa model khác -> chỉ mục bị bỏ qua (chấm lại tất cả).
+# File được ghi lại toàn bộ (file tạm rồi đổi tên) sau mỗi lần chạy.
+# =============================================================================
+
+FINGERPRINT_TABLE = 'van_tay'
+FINGERPRINT_META_TABLE = 'thong_tin'
+FINGERPRINT_INDEX = ['ma_tin', 'van_tay']
+
+
+def get_fingerprint_path(file_path):
+    """'ket_qua_bat_thuong.csv' -> 'ket_qua_bat_thuong.van_tay.db'"""
+    return os.path.splitext(file_path)[0] + '.van_tay.db'
+
+
+def read_fingerprints(file_path, model_key):
+    """
+    Chỉ mục vân tay của file kết quả: DataFrame index (ma_tin, van_tay), các cột là kết quả đã chấm
+    (đúng kiểu dữ liệu lúc ghi). None nếu chưa có hoặc được chấm bằng model khác model_key.
+    """
+    path = get_fingerprint_path(file_path)
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        meta = dict(conn.execute(f"SELECT key, value FROM {FINGERPRINT_META_TABLE}").fetchall())
+        if meta.get('model_key') != model_key:
+            return None
+        df = pd.read_sql_query(f"SELECT * FROM {FINGERPRINT_TABLE}", conn, index_col=FINGERPRINT_INDEX)
+    except (sqlite3.DatabaseError, pd.errors.DatabaseError) as e:
+        print(f"⚠️ Chỉ mục vân tay '{path}' bị lỗi ({e}), sẽ chấm lại tất cả.")
+        return None
+    finally:
+        conn.close()
+    dtypes = json.loads(meta.get('dtypes', '{}'))
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+
+def write_fingerprints(file_path, model_key, df):
+    """Ghi đè chỉ mục vân tay bằng df (index (ma_tin, van_tay)), nguyên tử"""
+    path = get_fingerprint_path(file_path)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        df = df[~df.index.duplicated(keep='last')]
+        df.to_sql(FINGERPRINT_TABLE, conn, index=True, index_label=FINGERPRINT_INDEX)
+        conn.execute(f"CREATE UNIQUE INDEX idx_{FINGERPRINT_TABLE} ON {FINGERPRINT_TABLE} "
+                     f"({', '.join(FINGERPRINT_INDEX)})")
+        conn.execute(f"CREATE TABLE {FINGERPRINT_META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany(f"INSERT INTO {FINGERPRINT_META_TABLE} VALUES (?, ?)", [
+            ('model_key', model_key),
+            ('dtypes', json.dumps({col: str(dtype) for col, dtype in df.dtypes.items()})),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return len(df)
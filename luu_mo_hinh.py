@@ -0,0 +1,214 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import xgboost
+from xgboost import XGBRegressor
+
+# =============================================================================
+# ARTIFACT MÔ HÌNH THEO PHIÊN BẢN (thay cho một file pickle duy nhất)
+#
+# price_model/
+# ├── LATEST              # tên phiên bản đang dùng, vd: "v2"
+# ├── v1/
+# │   ├── manifest.json   # định dạng, model_version, danh sách feature, ...
+# │   ├── booster.ubj     # XGBoost native (UBJSON), không phụ thuộc pickle/sklearn
+# │   ├── preprocess.json # mean/scale của scaler, bảng mã các cột phân loại, cặp hãng -> dòng xe
+# │   └── detectors.npz   # (tùy chọn) trạng thái các bộ phát hiện bất thường, ghi sau khi train
+# └── v2/ ...
+# =============================================================================
+
+ARTIFACT_FORMAT_VERSION = 1
+LATEST_FILE = 'LATEST'
+MANIFEST_FILE = 'manifest.json'
+BOOSTER_FILE = 'booster.ubj'
+PREPROCESS_FILE = 'preprocess.json'
+DETECTORS_FILE = 'detectors.npz'
+
+
+class LazyResources(dict):
+    """
+    resources dạng dict, booster chỉ được load khi truy cập resources['model'] lần đầu
+    (mở GUI, lấy danh mục... không phải chờ load model).
+    """
+
+    def __init__(self, data, model_loader):
+        super().__init__(data)
+        self._model_loader = model_loader
+
+    def __missing__(self, key):
+        if key == 'model' and self._model_loader is not None:
+            self['model'] = self._model_loader()
+            self._model_loader = None
+            return self['model']
+        raise KeyError(key)
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _files_hash(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()[:12]
+
+
+def latest_version(root):
+    """Tên phiên bản đang dùng (nội dung file LATEST), None nếu chưa có artifact"""
+    try:
+        with open(os.path.join(root, LATEST_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_manifest(root, version=None):
+    version = version or latest_version(root)
+    return _read_json(os.path.join(root, version, MANIFEST_FILE))
+
+
+def _next_version(root):
+    numbers = [int(name[1:]) for name in os.listdir(root)
+               if name.startswith('v') and name[1:].isdigit()]
+    return f"v{max(numbers, default=0) + 1}"
+
+
+def save_artifact(root, model, features_list, category_tables, scaler_mean=None, scaler_scale=None,
+                  brand_models=None, text_normalization=None, anomaly_thresholds=None, extra=None):
+    """
+    Ghi một phiên bản artifact mới vào root rồi trỏ LATEST sang nó.
+    category_tables: {cột: {giá trị: mã}} với mã liên tục 0..n-1, lưu thành danh sách theo mã.
+    brand_models: {hãng: [dòng xe]} gặp trong dữ liệu train (dùng cho danh mục của GUI).
+    text_normalization: phiên bản chuẩn hóa văn bản lúc train (xem chuan_hoa_van_ban), None nếu không dùng.
+    anomaly_thresholds: bảng ngưỡng bất thường theo phân khúc (xem nguong_bat_thuong), None nếu không có.
+    extra: thông tin thêm ghi vào manifest (vd: phiên bản gốc khi train tăng cường).
+    Trả về đường dẫn thư mục phiên bản.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = _next_version(root)
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir)
+
+    booster_path = os.path.join(version_dir, BOOSTER_FILE)
+    model.get_booster().save_model(booster_path)
+
+    tables = {}
+    for col, table in category_tables.items():
+        values = sorted(table, key=table.get)
+        if [table[v] for v in values] != list(range(len(values))):
+            raise ValueError(f"Mã của cột '{col}' không liên tục 0..n-1")
+        tables[col] = values
+
+    preprocess = {
+        'scaler': None if scaler_mean is None else {
+            'mean': [float(x) for x in scaler_mean],
+            'scale': [float(x) for x in scaler_scale],
+        },
+        'category_tables': tables,
+        'brand_models': brand_models,
+    }
+    if text_normalization:
+        preprocess['text_normalization'] = text_normalization
+    if anomaly_thresholds:
+        preprocess['anomaly_thresholds'] = anomaly_thresholds
+    preprocess_path = os.path.join(version_dir, PREPROCESS_FILE)
+    _write_json(preprocess_path, preprocess)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        # Mã nội dung (booster + tiền xử lý): đổi khi model hoặc bảng mã thay đổi
+        'model_version': _files_hash([booster_path, preprocess_path]),
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'xgboost_version': xgboost.__version__,
+        'features_list': list(features_list),
+        'files': {'booster': BOOSTER_FILE, 'preprocess': PREPROCESS_FILE},
+        **(extra or {}),
+    }
+    _write_json(os.path.join(version_dir, MANIFEST_FILE), manifest)
+
+    # Đổi LATEST nguyên tử: tiến trình đang đọc không bao giờ thấy phiên bản ghi dở
+    tmp_path = os.path.join(root, LATEST_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, LATEST_FILE))
+    return version_dir
+
+
+def save_detectors(root, arrays, version=None):
+    """
+    Ghi trạng thái các bộ phát hiện bất thường (dict mảng numpy) vào phiên bản artifact (mặc định LATEST).
+    Không đổi model_version (dự đoán giá không đổi); manifest ghi thêm mã nội dung detectors_version.
+    Trả về đường dẫn file.
+    """
+    version = version or latest_version(root)
+    version_dir = os.path.join(root, version)
+    path = os.path.join(version_dir, DETECTORS_FILE)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+    manifest = _read_json(os.path.join(version_dir, MANIFEST_FILE))
+    manifest['files']['detectors'] = DETECTORS_FILE
+    manifest['detectors_version'] = _files_hash([path])
+    manifest['detectors_fitted_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    tmp_manifest = os.path.join(version_dir, MANIFEST_FILE + '.tmp')
+    _write_json(tmp_manifest, manifest)
+    os.replace(tmp_manifest, os.path.join(version_dir, MANIFEST_FILE))
+    return path
+
+
+def load_artifact(root, version=None):
+    """
+    Đọc artifact (mặc định phiên bản LATEST) thành dict resources:
+    model (load lười), scaler_mean/scaler_scale, category_tables, features_list, model_version.
+    """
+    version = version or latest_version(root)
+    if version is None:
+        raise FileNotFoundError(f"Không tìm thấy artifact model trong '{root}'")
+    version_dir = os.path.join(root, version)
+
+    manifest = _read_json(os.path.join(version_dir, MANIFEST_FILE))
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Định dạng artifact không hỗ trợ: {manifest.get('format_version')}")
+    preprocess = _read_json(os.path.join(version_dir, manifest['files']['preprocess']))
+
+    data = {
+        'features_list': manifest['features_list'],
+        'model_version': manifest['model_version'],
+        'artifact_version': version,
+        'artifact_dir': version_dir,
+        'category_tables': {col: {val: code for code, val in enumerate(values)}
+                            for col, values in preprocess['category_tables'].items()},
+    }
+    if preprocess.get('brand_models'):
+        data['brand_models'] = preprocess['brand_models']
+    for key in ['text_normalization', 'anomaly_thresholds']:
+        if preprocess.get(key):
+            data[key] = preprocess[key]
+    if manifest['files'].get('detectors'):
+        with np.load(os.path.join(version_dir, manifest['files']['detectors']), allow_pickle=False) as arrays:
+            data['anomaly_detectors'] = dict(arrays)
+        data['detectors_version'] = manifest.get('detectors_version')
+    if preprocess.get('scaler'):
+        data['scaler_mean'] = np.array(preprocess['scaler']['mean'], dtype=float)
+        data['scaler_scale'] = np.array(preprocess['scaler']['scale'], dtype=float)
+
+    def load_model():
+        model = XGBRegressor()
+        model.load_model(os.path.join(version_dir, manifest['files']['booster']))
+        return model
+
+    return LazyResources(data, load_model)
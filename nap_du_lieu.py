@@ -0,0 +1,176 @@
+import os
+import json
+import argparse
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Không có pyarrow: luôn đọc thẳng file Excel/CSV gốc
+    pa = pq = None
+
+# =============================================================================
+# NẠP DỮ LIỆU TIN ĐĂNG (Excel/CSV thô -> Parquet có kiểu dữ liệu)
+# Đọc Excel bằng openpyxl rất chậm (vài giây cho vài nghìn dòng). Chuyển MỘT lần sang Parquet
+# (data_motobikes.xlsx -> data_motobikes.parquet, cùng thư mục), các lần sau đọc dạng cột:
+# - chỉ đọc các cột cần (columns=...), lọc dòng ngay khi đọc (filters=[('Thương hiệu', '==', 'Honda')])
+# - file Parquet ghi kèm kích thước + thời điểm sửa của file gốc: file gốc đổi -> tự chuyển lại
+# Không có pyarrow thì đọc file gốc như cũ (filters được áp dụng sau khi đọc).
+#
+# Chạy: python nap_du_lieu.py data_motobikes.xlsx                 # -> data_motobikes.parquet
+#       python nap_du_lieu.py dump_1.csv dump_2.xlsx --output tin_dang.parquet
+# =============================================================================
+
+# Tăng khi đổi cách chuyển kiểu: các file Parquet cũ bị coi là hết hạn
+INGEST_FORMAT = 2
+DATASET_SUFFIX = '.parquet'
+# Khóa metadata của file Parquet chứa thông tin file gốc
+SOURCE_METADATA_KEY = b'nguon'
+
+_FILTER_OPS = {
+    '==': lambda s, v: s == v, '=': lambda s, v: s == v, '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v, '<=': lambda s, v: s <= v, '>': lambda s, v: s > v, '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(v), 'not in': lambda s, v: ~s.isin(v),
+}
+
+
+def dataset_path(source_path):
+    """'data_motobikes.xlsx' -> 'data_motobikes.parquet'"""
+    return os.path.splitext(source_path)[0] + DATASET_SUFFIX
+
+
+def _source_signature(paths):
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append({'file': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    return {'format': INGEST_FORMAT, 'sources': signature}
+
+
+def read_raw_listings(path, columns=None):
+    """Đọc file thô (.csv hoặc Excel); columns: chỉ đọc các cột này (bỏ qua cột không có trong file)"""
+    usecols = None if columns is None else (lambda col: col in columns)
+    if path.endswith(DATASET_SUFFIX):
+        return pd.read_parquet(path, columns=columns)
+    if path.endswith('.csv'):
+        return pd.read_csv(path, usecols=usecols)
+    return pd.read_excel(path, usecols=usecols)
+
+
+def type_listing_frame(df):
+    """
+    Chuẩn kiểu dữ liệu để ghi Parquet cho cột object lẫn nhiều kiểu:
+    - toàn giá trị dạng số (vd: int lẫn float) -> số (2019.0 vẫn là số, giống khi đọc Excel)
+    - lẫn số và chữ (vd: 'Năm đăng ký' có 2019 và 'trước năm 1980') -> chuỗi
+    Ô trống giữ nguyên. Cột số/chuỗi thuần giữ nguyên.
+    """
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col].dropna()
+            if values.map(type).nunique() > 1:
+                numeric = pd.to_numeric(df[col], errors='coerce')
+                if numeric[values.index].notna().all():
+                    df[col] = numeric
+                else:
+                    df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def ingest_listings(sources, output_path=None):
+    """
+    Chuyển một hoặc nhiều file thô (cùng schema) thành một file Parquet (mặc định cạnh file đầu tiên).
+    Trả về đường dẫn file Parquet.
+    """
+    if pq is None:
+        raise ImportError("Cần cài pyarrow (pip install pyarrow) để chuyển dữ liệu sang Parquet")
+    sources = [sources] if isinstance(sources, str) else list(sources)
+    output_path = output_path or dataset_path(sources[0])
+
+    df = pd.concat([read_raw_listings(path) for path in sources], ignore_index=True)
+    table = pa.Table.from_pandas(type_listing_frame(df), preserve_index=False)
+    metadata = {**(table.schema.metadata or {}),
+                SOURCE_METADATA_KEY: json.dumps(_source_signature(sources)).encode('utf-8')}
+
+    # Ghi file tạm rồi đổi tên: tiến trình khác không bao giờ đọc phải file ghi dở
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def fresh_dataset(source_path):
+    """File Parquet của source_path nếu còn khớp với file gốc (kích thước, thời điểm sửa), ngược lại None"""
+    if pq is None:
+        return None
+    if source_path.endswith(DATASET_SUFFIX):
+        return source_path
+    path = dataset_path(source_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        stored = json.loads(metadata[SOURCE_METADATA_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+    if stored != _source_signature([source_path]):
+        return None
+    return path
+
+
+def _apply_filters(df, filters):
+    """Lọc dòng theo filters dạng [(cột, phép so sánh, giá trị), ...] (AND), khi không đọc từ Parquet"""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        mask &= _FILTER_OPS[op](df[col], value)
+    return df[mask].reset_index(drop=True)
+
+
+def load_listings(path, columns=None, filters=None, ingest=True):
+    """
+    Đọc dữ liệu tin đăng: ưu tiên file Parquet còn hạn, chưa có thì đọc file gốc;
+    file Excel (ingest=True, có pyarrow) được chuyển sang Parquet cho các lần sau.
+    columns: chỉ đọc các cột này (bỏ qua cột không có); filters: [(cột, phép so sánh, giá trị)] lọc ngay khi đọc.
+    """
+    dataset = fresh_dataset(path)
+    if dataset is None and ingest and pq is not None and not path.endswith('.csv'):
+        try:
+            dataset = ingest_listings(path)
+        except OSError as e:  # vd: thư mục chỉ đọc -> đọc file gốc
+            print(f"⚠️ Không ghi được file Parquet ({e}), đọc file gốc.")
+    if dataset is not None:
+        if columns is not None:
+            names = set(pq.read_schema(dataset).names)
+            columns = [col for col in columns if col in names]
+        return pd.read_parquet(dataset, columns=columns, filters=filters)
+    return _apply_filters(read_raw_listings(path, columns), filters)
+
+
+def iter_dataset_chunks(path, chunksize, skip_rows=0, columns=None):
+    """Đọc file Parquet theo từng khối đúng chunksize dòng (bỏ qua skip_rows dòng đầu), bộ nhớ cố định"""
+    pending, n_pending = [], 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+        if skip_rows:
+            skipped = min(skip_rows, batch.num_rows)
+            batch, skip_rows = batch.slice(skipped), skip_rows - skipped
+        pending.append(batch)
+        n_pending += batch.num_rows
+        while n_pending >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunksize).to_pandas()
+            rest = table.slice(chunksize)
+            pending, n_pending = rest.to_batches(), rest.num_rows
+    if n_pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chuyển file tin đăng Excel/CSV sang Parquet")
+    parser.add_argument('sources', nargs='+', help="Các file .xlsx/.csv cùng schema")
+    parser.add_argument('--output', help="File Parquet (mặc định cạnh file đầu tiên)")
+    args = parser.parse_args()
+
+    path = ingest_listings(args.sources, args.output)
+    print(f"✅ Đã ghi {pq.ParquetFile(path).metadata.num_rows} dòng vào {path}")
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# NGƯỠNG BẤT THƯỜNG THEO PHÂN KHÚC (hãng x dòng xe x nhóm tuổi xe)
+# Tính MỘT lần lúc train từ phân phối sai số log(giá thực / giá dự đoán) (dự đoán out-of-fold),
+# lưu cùng artifact model dưới dạng bảng tra:
+#   {'segments': {'Honda': [thấp, cao], 'Honda|Vision': [...], 'Honda|Vision|1': [...]}, 'global': [...], ...}
+# thấp/cao là tỉ lệ lệch cho phép (0.3 = rẻ hơn/đắt hơn 30% so với giá dự đoán).
+# Tra ngưỡng: phân khúc chi tiết nhất có đủ dữ liệu -> hãng|dòng -> hãng -> toàn bộ (mỗi bước O(1)).
+# =============================================================================
+
+# Nhóm tuổi xe: 0-2, 3-5, 6-10, 11+ năm
+AGE_BUCKET_EDGES = [3, 6, 11]
+# Tỉ lệ tin bình thường chấp nhận bị báo nhầm là bất thường (chia đều hai đuôi: rẻ bất thường / đắt bất thường).
+# Mức cố định 25% cũ báo ~47% tin (sai số out-of-fold của dữ liệu này có đuôi rất dày).
+# 5%: phân vị 2.5/97.5, toàn bộ ~ -74%/+206%, Honda Vision ~ -47%/+66%; báo ~6% tin train
+ANOMALY_FALSE_POSITIVE_RATE = 0.05
+
+
+def quantiles_for_rate(false_positive_rate):
+    """Tỉ lệ báo nhầm mong muốn -> (phân vị dưới, phân vị trên) của sai số log"""
+    if not 0 < false_positive_rate < 1:
+        raise ValueError(f"false_positive_rate phải trong (0, 1), nhận {false_positive_rate}")
+    return (false_positive_rate / 2, 1 - false_positive_rate / 2)
+
+
+# Phân vị của sai số log làm ngưỡng dưới/trên
+THRESHOLD_QUANTILES = quantiles_for_rate(ANOMALY_FALSE_POSITIVE_RATE)
+# Phân khúc ít hơn số tin này thì dùng ngưỡng của phân khúc cha
+MIN_SEGMENT_ROWS = 30
+# Ngưỡng không bao giờ hẹp hơn mức này (tránh báo bất thường vì nhiễu ở phân khúc giá rất đều)
+MIN_THRESHOLD_PERCENT = 0.10
+
+SEGMENT_SEP = '|'
+# Hãng/dòng xe bị thiếu: giống giá trị điền khi train (fillna('Unknown'))
+MISSING_SEGMENT_VALUE = 'Unknown'
+
+
+def age_bucket(tuoi_xe):
+    """Nhóm tuổi xe (0..len(AGE_BUCKET_EDGES)), dùng được cho số hoặc mảng"""
+    return np.digitize(tuoi_xe, AGE_BUCKET_EDGES)
+
+
+def _segment_value(value):
+    return MISSING_SEGMENT_VALUE if pd.isna(value) else str(value)
+
+
+def _segment_column(values):
+    """Cột hãng/dòng xe -> mảng chuỗi, ô trống -> MISSING_SEGMENT_VALUE"""
+    return pd.Series(values, dtype=object).fillna(MISSING_SEGMENT_VALUE).astype(str).to_numpy(dtype=object)
+
+
+def segment_keys(brand, model, bucket):
+    """Các khóa tra cứu, từ chi tiết nhất đến chung nhất"""
+    brand, model = _segment_value(brand), _segment_value(model)
+    return [SEGMENT_SEP.join([brand, model, str(int(bucket))]), brand + SEGMENT_SEP + model, brand]
+
+
+def _to_thresholds(q_low, q_high):
+    """Phân vị sai số log -> [tỉ lệ rẻ hơn, tỉ lệ đắt hơn] cho phép"""
+    low = max(MIN_THRESHOLD_PERCENT, 1 - np.exp(q_low))
+    high = max(MIN_THRESHOLD_PERCENT, np.exp(q_high) - 1)
+    return [round(float(low), 4), round(float(high), 4)]
+
+
+def build_threshold_table(brands, models, tuoi_xe, log_residuals, quantiles=THRESHOLD_QUANTILES,
+                          min_rows=MIN_SEGMENT_ROWS):
+    """
+    Bảng ngưỡng theo phân khúc từ sai số log(giá thực / giá dự đoán) của từng tin train.
+    Chỉ giữ các phân khúc có ít nhất min_rows tin.
+    """
+    df = pd.DataFrame({'brand': _segment_column(brands),
+                       'model': _segment_column(models),
+                       'bucket': age_bucket(np.asarray(tuoi_xe, dtype=float)),
+                       'residual': np.asarray(log_residuals, dtype=float)})
+    df = df[np.isfinite(df['residual'])]
+
+    segments = {}
+    for level in [['brand'], ['brand', 'model'], ['brand', 'model', 'bucket']]:
+        grouped = df.groupby(level)['residual']
+        stats = pd.DataFrame({'count': grouped.size(), 'low': grouped.quantile(quantiles[0]),
+                              'high': grouped.quantile(quantiles[1])})
+        for key, row in stats[stats['count'] >= min_rows].iterrows():
+            key = key if isinstance(key, tuple) else (key,)
+            segments[SEGMENT_SEP.join(str(k) for k in key)] = _to_thresholds(row['low'], row['high'])
+
+    return {
+        'quantiles': list(quantiles),
+        'min_rows': min_rows,
+        'age_bucket_edges': AGE_BUCKET_EDGES,
+        'global': _to_thresholds(*np.quantile(df['residual'], quantiles)),
+        'segments': segments,
+    }
+
+
+def _resolve_segment(table, brand, model, bucket):
+    segments = table['segments']
+    for key in segment_keys(brand, model, bucket):
+        if key in segments:
+            return tuple(segments[key])
+    return tuple(table['global'])
+
+
+def resolve_threshold(table, brand, model, tuoi_xe):
+    """(tỉ lệ rẻ hơn, tỉ lệ đắt hơn) cho phép của một tin: phân khúc chi tiết nhất có trong bảng"""
+    return _resolve_segment(table, brand, model, age_bucket(tuoi_xe))
+
+
+def resolve_thresholds_batch(table, brands, models, tuoi_xe):
+    """
+    resolve_threshold cho cả cột, trả về (mảng tỉ lệ rẻ hơn, mảng tỉ lệ đắt hơn).
+    Mỗi tổ hợp (hãng, dòng xe, nhóm tuổi) khác nhau chỉ tra một lần.
+    """
+    combos = pd.MultiIndex.from_arrays([_segment_column(brands),
+                                        _segment_column(models),
+                                        age_bucket(np.asarray(tuoi_xe, dtype=float))])
+    codes, uniques = pd.factorize(combos)
+    resolved = np.array([_resolve_segment(table, *combo) for combo in uniques], dtype=float).reshape(-1, 2)
+    return resolved[codes, 0], resolved[codes, 1]
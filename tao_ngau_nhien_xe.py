@@ -1,8 +1,9 @@
 # từ tập tin data_motobikes.xlsx hãy lấy ra 100 xe máy ngẫu nhiên và đưa vào tập tin subset_100motobikes.csv
 import pandas as pd
 import random
-# Đọc dữ liệu từ file excel
-df = pd.read_excel('data_motobikes.xlsx', engine='openpyxl')
+from nap_du_lieu import load_listings
+# Đọc dữ liệu từ file excel (qua file Parquet nếu đã chuyển, xem nap_du_lieu)
+df = load_listings('data_motobikes.xlsx')
 
 # Lấy 100 xe máy ngẫu nhiên
 random_bikes = df.sample(n=100, random_state=42, replace=False)
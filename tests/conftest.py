@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Chạy pytest từ bất kỳ đâu: import được các module ở thư mục gốc của repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
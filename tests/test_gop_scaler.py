@@ -0,0 +1,80 @@
+"""
+Gộp StandardScaler vào ngưỡng cây (fold_scaler_into_model): model sau khi gộp phải dự đoán
+GIỐNG HỆT model có scaler, trên dòng dữ liệu thật và trên các giá trị nằm đúng tại / sát
+từng ngưỡng tách đã quy đổi (nơi sai số làm tròn float32 dễ đẩy dòng sang nhánh khác).
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBRegressor
+
+from du_bao_gia import load_training_features, fold_scaler_into_model, check_prediction_parity, \
+    price_features, PRICE_MODEL_PARAMS
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_motobikes.xlsx')
+N_TRAIN_ROWS = 2000
+N_BASE_ROWS = 5
+
+
+@pytest.fixture(scope='module')
+def scaled_and_folded(tmp_path_factory):
+    """Model nhỏ train trên feature đã scale (như train_price_model mặc định) và bản đã gộp scaler"""
+    data = load_training_features(DATA_FILE, cache_dir=str(tmp_path_factory.mktemp('cache')))
+    X, y = np.asarray(data['X'], dtype=float), np.asarray(data['y'])
+    scaler = StandardScaler().fit(X[:N_TRAIN_ROWS])
+    model = XGBRegressor(**{**PRICE_MODEL_PARAMS, 'n_estimators': 40})
+    model.fit(scaler.transform(X[:N_TRAIN_ROWS]), y[:N_TRAIN_ROWS])
+
+    resources = {'model': model, 'scaler_mean': scaler.mean_, 'scaler_scale': scaler.scale_,
+                 'features_list': price_features(), 'category_tables': data['category_tables']}
+    return resources, fold_scaler_into_model(resources), X
+
+
+def _split_conditions(model):
+    """(chỉ số feature, ngưỡng float32) của mọi nút tách trong model"""
+    model_json = json.loads(model.get_booster().save_raw('json'))
+    splits = []
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        for feat, cond, left in zip(tree['split_indices'], tree['split_conditions'], tree['left_children']):
+            if left != -1:
+                splits.append((feat, np.float32(cond)))
+    return splits
+
+
+def _threshold_probes(splits, base_rows):
+    """Mỗi dòng gốc, thay một feature bằng ngưỡng t và hai giá trị float32 liền kề t"""
+    probes = []
+    for feat, t in set(splits):
+        for value in [np.nextafter(t, np.float32(-np.inf)), t, np.nextafter(t, np.float32(np.inf))]:
+            block = base_rows.copy()
+            block[:, feat] = float(value)
+            probes.append(block)
+    return np.vstack(probes)
+
+
+def test_folded_model_has_no_scaler(scaled_and_folded):
+    _, folded, _ = scaled_and_folded
+    assert 'scaler_mean' not in folded and 'scaler' not in folded
+
+
+def test_parity_on_real_rows(scaled_and_folded):
+    resources, folded, X = scaled_and_folded
+    assert check_prediction_parity(resources, folded, X) == 0
+
+
+def test_parity_at_folded_thresholds(scaled_and_folded):
+    resources, folded, X = scaled_and_folded
+    probes = _threshold_probes(_split_conditions(folded['model']), X[:N_BASE_ROWS])
+    assert check_prediction_parity(resources, folded, probes) == 0
+
+
+def test_parity_at_original_thresholds(scaled_and_folded):
+    """Ngưỡng của model có scaler quy đổi ngược về thang gốc (t * scale + mean) và các giá trị liền kề"""
+    resources, folded, X = scaled_and_folded
+    mean, scale = resources['scaler_mean'], resources['scaler_scale']
+    splits = [(feat, np.float32(t * scale[feat] + mean[feat])) for feat, t in _split_conditions(resources['model'])]
+    probes = _threshold_probes(splits, X[:N_BASE_ROWS])
+    assert check_prediction_parity(resources, folded, probes) == 0
@@ -0,0 +1,209 @@
+import io
+import os
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from sklearn.model_selection import KFold, TimeSeriesSplit
+from sklearn.metrics import mean_absolute_error, r2_score
+from xgboost import XGBRegressor
+
+from du_bao_gia import (load_training_features, train_price_model, build_anomaly_thresholds, price_features,
+                        PRICE_MODEL_PARAMS, PRICE_MODEL_PATH)
+
+# =============================================================================
+# TINH CHỈNH THAM SỐ MODEL GIÁ (chạy song song, có giới hạn thời gian)
+# - Mọi lần thử dùng chung MỘT ma trận feature từ cache đặc trưng (mmap, không tiền xử lý lại)
+# - Đánh giá bằng K-fold hoặc chia theo thời gian (thứ tự dòng = thứ tự crawl), có early stopping
+# - Báo cáo MAE/R² (giá triệu đồng) theo thời gian chạy, lưu cấu hình tốt nhất thành artifact mới
+# - Ngưỡng bất thường của artifact lấy từ dự đoán out-of-fold của lần thử tốt nhất (không train thêm model)
+#
+# Chạy: python tinh_chinh_tham_so.py --data data_motobikes.xlsx --trials 30 --workers 4 --budget 3600
+# =============================================================================
+
+# Không gian tìm kiếm (lấy mẫu ngẫu nhiên các tổ hợp)
+SEARCH_SPACE = {
+    'max_depth': [4, 5, 6, 7, 8],
+    'learning_rate': [0.02, 0.04, 0.08, 0.12],
+    'min_child_weight': [1, 3, 5],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.7, 0.85, 1.0],
+    'reg_lambda': [0.5, 1.0, 2.0],
+}
+
+# n_estimators tối đa; số cây thực tế do early stopping quyết định
+MAX_N_ESTIMATORS = 2000
+EARLY_STOPPING_ROUNDS = 50
+RANDOM_STATE = 42
+
+# Dữ liệu train của mỗi worker, load MỘT lần trong initializer
+_WORKER_DATA = None
+
+
+def sample_configs(n_trials, seed=RANDOM_STATE):
+    """Lần thử đầu là cấu hình đang dùng (PRICE_MODEL_PARAMS), sau đó là các tổ hợp ngẫu nhiên không trùng"""
+    baseline = {'max_depth': PRICE_MODEL_PARAMS['max_depth'], 'learning_rate': PRICE_MODEL_PARAMS['learning_rate'],
+                'min_child_weight': 1, 'subsample': 1.0, 'colsample_bytree': 1.0, 'reg_lambda': 1.0}
+    configs = [baseline]
+    seen = {tuple(sorted(baseline.items()))}
+    rng = np.random.default_rng(seed)
+    n_combinations = int(np.prod([len(v) for v in SEARCH_SPACE.values()]))
+
+    while len(configs) < min(n_trials, n_combinations):
+        config = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+        key = tuple(sorted(config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def make_splits(n_rows, n_folds, cv='kfold'):
+    """cv='kfold': K-fold xáo trộn; cv='time': train trên phần đầu, kiểm tra trên phần sau (TimeSeriesSplit)"""
+    if cv == 'time':
+        splitter = TimeSeriesSplit(n_splits=n_folds)
+    else:
+        splitter = KFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+    return list(splitter.split(np.arange(n_rows)))
+
+
+def _init_tuning_worker(data_path):
+    global _WORKER_DATA
+    # Cache đã được tạo ở process chính -> chỉ mmap file .npy
+    with contextlib.redirect_stdout(io.StringIO()):
+        _WORKER_DATA = load_training_features(data_path)
+
+
+def evaluate_config(config, splits, n_jobs=1):
+    """
+    Đánh giá một cấu hình trên các fold, trả về MAE/R² (giá triệu đồng), số cây trung bình
+    và dự đoán out-of-fold 'oof_log_pred' (log1p giá, NaN ở dòng không thuộc fold kiểm tra nào).
+    """
+    X, y = _WORKER_DATA['X'], _WORKER_DATA['y']
+    start = time.perf_counter()
+    maes, r2s, n_trees = [], [], []
+    oof_log_pred = np.full(len(y), np.nan)
+
+    for train_idx, val_idx in splits:
+        model = XGBRegressor(**config, n_estimators=MAX_N_ESTIMATORS, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                             random_state=RANDOM_STATE, n_jobs=n_jobs)
+        model.fit(X[train_idx], y[train_idx], eval_set=[(X[val_idx], y[val_idx])], verbose=False)
+        oof_log_pred[val_idx] = model.predict(X[val_idx])
+        price_true = np.expm1(y[val_idx])
+        price_pred = np.expm1(oof_log_pred[val_idx])
+        maes.append(mean_absolute_error(price_true, price_pred))
+        r2s.append(r2_score(price_true, price_pred))
+        n_trees.append(model.best_iteration + 1)
+
+    return {
+        'params': config,
+        'mae': float(np.mean(maes)),
+        'mae_std': float(np.std(maes)),
+        'r2': float(np.mean(r2s)),
+        'n_estimators': int(round(np.mean(n_trees))),
+        'seconds': round(time.perf_counter() - start, 3),
+        'oof_log_pred': oof_log_pred,
+    }
+
+
+def run_trials(data_path, configs, splits, n_workers=1, budget_seconds=None):
+    """
+    Chạy các cấu hình (song song n_workers process), dừng giao việc mới khi hết budget_seconds.
+    Lần thử đang chạy dở vẫn được chạy xong. Trả về danh sách kết quả theo thứ tự hoàn thành.
+    """
+    start = time.perf_counter()
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+    results = []
+
+    def out_of_time():
+        return budget_seconds is not None and time.perf_counter() - start >= budget_seconds
+
+    def collect(trial, result):
+        result.update({'trial': trial, 'elapsed': round(time.perf_counter() - start, 3)})
+        results.append(result)
+        print(f"  #{trial:<3} MAE {result['mae']:8.3f} tr  R² {result['r2']:.4f}  {result['n_estimators']:>5} cây"
+              f"  {result['seconds']:7.1f}s  (tổng {result['elapsed']:.1f}s)  {result['params']}")
+
+    if n_workers <= 1:
+        _init_tuning_worker(data_path)
+        for trial, config in enumerate(configs):
+            if out_of_time():
+                break
+            collect(trial, evaluate_config(config, splits, n_jobs))
+        return results
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_tuning_worker,
+                             initargs=(data_path,)) as pool:
+        pending = {}
+        queue = list(enumerate(configs))
+        while queue or pending:
+            while queue and len(pending) < n_workers and not out_of_time():
+                trial, config = queue.pop(0)
+                pending[pool.submit(evaluate_config, config, splits, n_jobs)] = trial
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(pending.pop(future), future.result())
+            if out_of_time():
+                queue = []
+    return results
+
+
+def tune_price_model(data_path, n_trials=20, n_folds=5, cv='kfold', n_workers=1, budget_seconds=None,
+                     seed=RANDOM_STATE, root=PRICE_MODEL_PATH, save=True):
+    """
+    Tìm tham số tốt nhất (MAE nhỏ nhất) và (nếu save) train lại trên toàn bộ dữ liệu, lưu artifact mới.
+    Trả về báo cáo dạng dict.
+    """
+    # Tạo/đọc cache đặc trưng MỘT lần trước khi mở các worker
+    data = load_training_features(data_path)
+    splits = make_splits(len(data['y']), n_folds, cv)
+    configs = sample_configs(n_trials, seed)
+
+    print(f"--- [TUNING] {len(configs)} cấu hình, {n_folds} fold ({cv}), {n_workers} worker, "
+          f"{len(data['y'])} dòng ---")
+    results = run_trials(data_path, configs, splits, n_workers, budget_seconds)
+    if not results:
+        raise RuntimeError("Không có lần thử nào hoàn thành trong thời gian cho phép")
+
+    best = min(results, key=lambda r: r['mae'])
+    # Chỉ giữ dự đoán out-of-fold của lần thử tốt nhất (báo cáo không chứa mảng)
+    oof_log_pred = best['oof_log_pred']
+    for result in results:
+        del result['oof_log_pred']
+    report = {'data': data_path, 'cv': cv, 'folds': n_folds, 'workers': n_workers,
+              'budget_seconds': budget_seconds, 'trials': results, 'best': best}
+    print(f"--- [TUNING] Tốt nhất: #{best['trial']} MAE {best['mae']:.3f} tr, R² {best['r2']:.4f}, "
+          f"{best['n_estimators']} cây ---")
+
+    if save:
+        params = {**best['params'], 'n_estimators': best['n_estimators'], 'random_state': RANDOM_STATE}
+        tuning_info = {'cv': cv, 'folds': n_folds, 'trials': len(results), 'mae': best['mae'], 'r2': best['r2']}
+        thresholds = build_anomaly_thresholds(data, price_features(), log_pred=oof_log_pred)
+        report['artifact'] = train_price_model(data_path, use_scaler=False, root=root, params=params,
+                                               extra={'tuning': tuning_info}, anomaly_thresholds=thresholds)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tinh chỉnh tham số model dự đoán giá")
+    parser.add_argument('--data', default='data_motobikes.xlsx')
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--cv', choices=['kfold', 'time'], default='kfold')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--budget', type=float, help="Giới hạn thời gian (giây), không giao lần thử mới khi hết")
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE)
+    parser.add_argument('--no-save', action='store_true', help="Chỉ báo cáo, không lưu artifact")
+    parser.add_argument('--json', help="Ghi báo cáo ra file JSON")
+    args = parser.parse_args()
+
+    report = tune_price_model(args.data, args.trials, args.folds, args.cv, args.workers, args.budget,
+                              args.seed, save=not args.no_save)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)